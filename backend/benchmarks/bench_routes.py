@@ -0,0 +1,190 @@
+"""Benchmarks of each router in ``ref_backend.api.routes``."""
+
+import json
+from typing import Any
+
+import pytest
+from starlette.testclient import TestClient
+
+from ref_backend.testing import test_settings
+
+API = test_settings().API_V1_STR
+
+
+@pytest.fixture(scope="session")
+def heaviest_diagnostic(client: TestClient) -> dict[str, Any]:
+    """The diagnostic with the most execution groups, which has the most values to filter."""
+    diagnostics = client.get(f"{API}/diagnostics/").json()["data"]
+    return max(diagnostics, key=lambda d: d.get("execution_group_count", 0))
+
+
+@pytest.fixture(scope="session")
+def diagnostic_url(heaviest_diagnostic: dict[str, Any]) -> str:
+    return f"{API}/diagnostics/{heaviest_diagnostic['provider']['slug']}/{heaviest_diagnostic['slug']}"
+
+
+@pytest.fixture(scope="session")
+def execution_group(client: TestClient, diagnostic_url: str) -> dict[str, Any]:
+    """An execution group of the heaviest diagnostic whose latest execution has outputs."""
+    groups = client.get(f"{diagnostic_url}/execution_groups", params={"limit": 100}).json()["data"]
+    return next(g for g in groups if g["executions"] and g["executions"][-1]["outputs"])
+
+
+@pytest.fixture(scope="session")
+def dataset(client: TestClient) -> dict[str, Any]:
+    return client.get(f"{API}/datasets/", params={"limit": 1}).json()["data"][0]
+
+
+# aft
+
+
+def test_aft_list(benchmark):
+    benchmark(f"{API}/cmip7-aft-diagnostics")
+
+
+def test_aft_detail(benchmark, client):
+    aft = client.get(f"{API}/cmip7-aft-diagnostics").json()[0]
+    benchmark(f"{API}/cmip7-aft-diagnostics/{aft['id']}")
+
+
+# datasets
+
+
+def test_datasets_list(benchmark):
+    benchmark(f"{API}/datasets/?limit=100")
+
+
+def test_datasets_filtered(benchmark):
+    benchmark(f"{API}/datasets/?limit=100&dataset_type=cmip6&source_id=SYN-ESM01&variable_id=tas")
+
+
+def test_dataset_detail(benchmark, dataset):
+    benchmark(f"{API}/datasets/{dataset['slug']}")
+
+
+def test_dataset_executions(benchmark, dataset):
+    benchmark(f"{API}/datasets/{dataset['id']}/executions")
+
+
+# diagnostics
+
+
+def test_diagnostics_list(benchmark):
+    benchmark(f"{API}/diagnostics/")
+
+
+def test_diagnostics_facets(benchmark):
+    benchmark(f"{API}/diagnostics/facets")
+
+
+def test_diagnostic_detail(benchmark, diagnostic_url):
+    benchmark(diagnostic_url)
+
+
+def test_diagnostic_execution_groups(benchmark, diagnostic_url):
+    benchmark(f"{diagnostic_url}/execution_groups?limit=100")
+
+
+def test_diagnostic_execution_groups_latest(benchmark, diagnostic_url):
+    benchmark(f"{diagnostic_url}/execution_groups?include_history=false&include_outputs=false")
+
+
+def test_diagnostic_executions(benchmark, diagnostic_url):
+    benchmark(f"{diagnostic_url}/executions?limit=100&source_id=SYN-ESM01")
+
+
+def test_diagnostic_scalar_values(benchmark, diagnostic_url):
+    benchmark(f"{diagnostic_url}/values?value_type=scalar&limit=500")
+
+
+def test_diagnostic_series_values(benchmark, diagnostic_url):
+    benchmark(f"{diagnostic_url}/values?value_type=series&limit=100")
+
+
+def test_diagnostic_values_batch(benchmark, heaviest_diagnostic):
+    card = {
+        "provider_slug": heaviest_diagnostic["provider"]["slug"],
+        "diagnostic_slug": heaviest_diagnostic["slug"],
+    }
+    queries = [
+        {**card, "value_type": "scalar", "limit": 1},
+        {**card, "value_type": "scalar", "limit": 500},
+        {**card, "value_type": "series", "limit": 100},
+    ]
+    benchmark(f"{API}/diagnostics/values", params={"queries": json.dumps(queries)})
+
+
+# executions
+
+
+def test_executions_list(benchmark):
+    benchmark(f"{API}/executions/?limit=100")
+
+
+def test_executions_statistics(benchmark):
+    benchmark(f"{API}/executions/statistics")
+
+
+def test_execution_group_detail(benchmark, execution_group):
+    benchmark(f"{API}/executions/{execution_group['id']}")
+
+
+def test_execution_group_datasets(benchmark, execution_group):
+    benchmark(f"{API}/executions/{execution_group['id']}/datasets")
+
+
+def test_execution_group_values(benchmark, execution_group):
+    benchmark(f"{API}/executions/{execution_group['id']}/values?value_type=scalar")
+
+
+def test_execution_group_values_csv(benchmark, execution_group):
+    benchmark(f"{API}/executions/{execution_group['id']}/values?value_type=scalar&format=csv")
+
+
+def test_execution_group_metric_bundle(benchmark, execution_group):
+    benchmark(f"{API}/executions/{execution_group['id']}/metric_bundle")
+
+
+# explorer
+
+
+def test_explorer_collections(benchmark):
+    benchmark(f"{API}/explorer/collections/")
+
+
+def test_explorer_collection_detail(benchmark):
+    benchmark(f"{API}/explorer/collections/1.2")
+
+
+def test_explorer_collection_cards(benchmark):
+    benchmark(f"{API}/explorer/collections/1.2/cards")
+
+
+def test_explorer_themes(benchmark):
+    benchmark(f"{API}/explorer/themes/")
+
+
+def test_explorer_theme_detail(benchmark):
+    benchmark(f"{API}/explorer/themes/ocean")
+
+
+# results
+
+
+def test_result_file(benchmark, execution_group):
+    output = execution_group["executions"][-1]["outputs"][0]
+    benchmark(f"{API}/results/{output['id']}")
+
+
+# search
+
+
+def test_search_suggest(benchmark):
+    benchmark(f"{API}/search/suggest?q=SYN-ESM")
+
+
+# utils
+
+
+def test_health_check(benchmark):
+    benchmark(f"{API}/utils/health-check/")
@@ -0,0 +1,207 @@
+"""
+Benchmarks of the API against a synthetic database.
+
+Run with ``make benchmark``, or ``uv run pytest benchmarks`` from the backend directory.
+The database is generated by ``generate_database.py`` on the first run at each scale
+and reused afterwards, from ``benchmarks/.data/<scale>``.
+
+Environment variables:
+
+- ``REF_BENCHMARK_SCALE``: one of the scales in ``generate_database.SCALES`` (default: small)
+- ``REF_BENCHMARK_ROUNDS``: number of timed requests per benchmark (default: 20)
+
+The latency, query count and peak memory of each benchmark are appended to
+``benchmarks/.results/history.jsonl``, with the commit and scale they were measured at,
+and compared with the previous run at the same scale in the summary.
+"""
+
+import copy
+import json
+import os
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections.abc import Callable, Generator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from generate_database import SCALES, generate
+from starlette.testclient import TestClient
+
+from ref_backend.api import deps
+from ref_backend.builder import build_app
+from ref_backend.core.config import get_settings
+from ref_backend.core.ref import get_provider_registry
+from ref_backend.testing import test_ref_config, test_settings
+
+BENCHMARK_DIR = Path(__file__).parent
+HISTORY_FILE = BENCHMARK_DIR / ".results" / "history.jsonl"
+DB_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    url: str
+    rounds: int
+    median_ms: float
+    p95_ms: float
+    queries: int
+    peak_memory_bytes: int
+
+
+_results: list[BenchmarkResult] = []
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line("python_files", "bench_*.py")
+
+
+@pytest.fixture(scope="session")
+def scale() -> str:
+    name = os.environ.get("REF_BENCHMARK_SCALE", "small")
+    if name not in SCALES:
+        raise pytest.UsageError(f"REF_BENCHMARK_SCALE must be one of {', '.join(SCALES)}")
+    return name
+
+
+@pytest.fixture(scope="session")
+def synthetic_data(scale: str) -> Path:
+    """Generate the synthetic database for a scale, unless it was generated by a previous run."""
+    directory = BENCHMARK_DIR / ".data" / scale
+    marker = directory / "scale.json"
+    expected = asdict(SCALES[scale])
+    if not marker.exists() or json.loads(marker.read_text()) != expected:
+        generate(directory, SCALES[scale])
+        marker.write_text(json.dumps(expected))
+    return directory
+
+
+@pytest.fixture(scope="session")
+def client(synthetic_data: Path) -> Generator[TestClient, None, None]:
+    """Client of an app serving the synthetic database, with its caches disabled."""
+    settings = test_settings().model_copy(
+        update={
+            "REF_READ_ONLY_DATABASE": True,
+            "QUERY_CACHE_MAX_ENTRIES": 0,
+            "HTTP_CACHE_ENABLED": False,
+            "COMPRESSION_CACHE_MAX_ENTRIES": 0,
+            "SERVER_TIMING_ENABLED": True,
+        }
+    )
+    ref_config = copy.deepcopy(test_ref_config())
+    ref_config.paths.results = synthetic_data / "results"
+    ref_config.db.database_url = "sqlite:///" + str(synthetic_data / "db" / "climate_ref.db")
+
+    database = deps._get_database_dependency(settings, ref_config)
+    app = build_app(settings, ref_config, database)
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[deps._ref_config_dependency] = lambda: ref_config
+    # Load the providers up front, as main.py does, rather than in a request thread
+    provider_registry = get_provider_registry(ref_config, read_only=True)
+    app.dependency_overrides[deps._provider_registry_dependency] = lambda: provider_registry
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def benchmark(client: TestClient, request: pytest.FixtureRequest) -> Callable[..., Any]:
+    """
+    Time GET requests to a URL, returning the response.
+
+    The first request warms up the pool and page cache and is not timed.
+    Peak memory is measured on a separate request, as tracing allocations slows the request down.
+    """
+
+    def run(url: str, *, rounds: int | None = None, **kwargs: Any) -> Any:
+        rounds = rounds or int(os.environ.get("REF_BENCHMARK_ROUNDS", "20"))
+        response = client.get(url, **kwargs)
+        response.raise_for_status()
+        match = DB_QUERIES.search(response.headers.get("Server-Timing", ""))
+
+        durations = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            client.get(url, **kwargs).raise_for_status()
+            durations.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        try:
+            client.get(url, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        durations.sort()
+        _results.append(
+            BenchmarkResult(
+                name=request.node.name,
+                url=url,
+                rounds=rounds,
+                median_ms=round(statistics.median(durations), 2),
+                p95_ms=round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+                queries=int(match.group(1)) if match else 0,
+                peak_memory_bytes=peak,
+            )
+        )
+        return response
+
+    return run
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BENCHMARK_DIR,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _previous_results(scale: str) -> dict[str, dict[str, Any]]:
+    """Get the latest recorded result of each benchmark at a scale."""
+    previous: dict[str, dict[str, Any]] = {}
+    if HISTORY_FILE.exists():
+        for line in HISTORY_FILE.read_text().splitlines():
+            record = json.loads(line)
+            if record["scale"] == scale:
+                previous[record["name"]] = record
+    return previous
+
+
+def pytest_terminal_summary(terminalreporter: Any) -> None:
+    if not _results:
+        return
+    scale = os.environ.get("REF_BENCHMARK_SCALE", "small")
+    previous = _previous_results(scale)
+    commit = _git_commit()
+    timestamp = datetime.now(UTC).isoformat(timespec="seconds")
+
+    terminalreporter.section(f"benchmarks ({scale})")
+    terminalreporter.write_line(
+        f"{'benchmark':<45} {'median ms':>10} {'p95 ms':>10} {'queries':>8} {'peak MiB':>9} {'vs last':>8}"
+    )
+    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with HISTORY_FILE.open("a") as history:
+        for result in _results:
+            change = ""
+            if result.name in previous and previous[result.name]["median_ms"]:
+                ratio = result.median_ms / previous[result.name]["median_ms"] - 1
+                change = f"{ratio:+.0%}"
+            terminalreporter.write_line(
+                f"{result.name:<45} {result.median_ms:>10.1f} {result.p95_ms:>10.1f} "
+                f"{result.queries:>8} {result.peak_memory_bytes / 2**20:>9.1f} {change:>8}"
+            )
+            record = {"timestamp": timestamp, "commit": commit, "scale": scale, **asdict(result)}
+            history.write(json.dumps(record) + "\n")
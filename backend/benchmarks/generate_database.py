@@ -0,0 +1,420 @@
+"""
+Generate a synthetic REF database and results directory at a configurable scale.
+
+The decimated test data in ``tests/test-data`` is used as a template:
+its schema, providers, diagnostics and datasets are copied as is,
+and each diagnostic that has an execution in the template gets many synthetic execution groups,
+each with several executions whose metric values, outputs and result files are cloned from the template's.
+Synthetic CMIP6 datasets are added with new source and member ids,
+so filters and facets see realistic cardinalities.
+
+The output is a REF configuration directory, with a ``ref.toml`` pointing at its ``db/`` and ``results/``,
+so a backend can serve it with ``REF_CONFIGURATION=OUTPUT_DIR``.
+
+Usage:
+    cd backend && uv run python benchmarks/generate_database.py OUTPUT_DIR --scale medium
+
+Options:
+    --scale NAME             One of the presets in ``SCALES`` (default: small)
+    --groups-per-diagnostic  Override the number of execution groups per diagnostic
+    --scalar-values          Override the number of scalar values per execution
+    --no-output-files        Skip writing result files to disk
+    --seed N                 Seed for the random choices (default: 0)
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import dataclasses
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from ref_backend.testing import EXAMPLE_DIR, test_ref_config  # noqa: E402
+
+
+@dataclasses.dataclass(frozen=True)
+class Scale:
+    """Size of a synthetic database."""
+
+    groups_per_diagnostic: int
+    executions_per_group: int
+    datasets: int
+    datasets_per_execution: int
+    scalar_values_per_execution: int
+    series_values_per_execution: int
+    outputs_per_execution: int
+
+
+SCALES = {
+    # About 500 groups and 50k values: generated in a few seconds, for CI
+    "small": Scale(20, 2, 2_000, 4, 50, 2, 3),
+    # About 5k groups and 1M values
+    "medium": Scale(200, 2, 50_000, 4, 100, 2, 5),
+    # About 23k groups and 7M values
+    "large": Scale(1_000, 3, 200_000, 6, 100, 1, 5),
+}
+
+SOURCE_IDS = [f"SYN-ESM{i:02d}" for i in range(40)]
+"""Model names used for the synthetic datasets and execution groups."""
+
+BATCH_SIZE = 10_000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+START_TIME = datetime(2025, 1, 1)
+
+EXECUTION_COLUMNS = {
+    "output_fragment",
+    "dataset_hash",
+    "successful",
+    "path",
+    "retracted",
+    "provider_version",
+    "wall_seconds",
+    "cpu_seconds",
+    "peak_memory_bytes",
+    "memory_source",
+    "memory_limit_bytes",
+    "cpu_limit",
+    "resources_exclusive",
+    "queue_seconds",
+    "resource_context",
+}
+"""Columns of a template execution that are copied to its clones."""
+
+
+def _batches(rows: Iterable[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn: sqlite3.Connection, table: str, rows: Iterable[dict[str, Any]]) -> int:
+    """Insert rows, which must all have the same keys, in batches."""
+    count = 0
+    for batch in _batches(rows):
+        columns = list(batch[0])
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})',  # noqa: S608
+            [tuple(row[c] for c in columns) for row in batch],
+        )
+        count += len(batch)
+    return count
+
+
+def _next_id(conn: sqlite3.Connection, table: str) -> int:
+    return int(conn.execute(f'SELECT coalesce(max(id), 0) + 1 FROM "{table}"').fetchone()[0])  # noqa: S608
+
+
+def _rows(conn: sqlite3.Connection, query: str, *parameters: Any) -> list[dict[str, Any]]:
+    return [dict(row) for row in conn.execute(query, parameters)]
+
+
+def _add_datasets(conn: sqlite3.Connection, scale: Scale) -> dict[str, list[int]]:
+    """Add synthetic CMIP6 datasets cloned from the template's, returning their ids by source id."""
+    templates = _rows(
+        conn,
+        "SELECT d.*, c.* FROM dataset d JOIN cmip6_dataset c ON c.id = d.id",
+    )
+    dataset_columns = {row[1] for row in conn.execute("PRAGMA table_info(dataset)")}
+    next_id = _next_id(conn, "dataset")
+    by_source: dict[str, list[int]] = defaultdict(list)
+    datasets, cmip6_datasets = [], []
+    for i in range(scale.datasets):
+        template = templates[i % len(templates)]
+        source_id = SOURCE_IDS[i % len(SOURCE_IDS)]
+        member_id = f"r{i // len(SOURCE_IDS) + 1}i1p1f1"
+        instance_id = ".".join(
+            [
+                "CMIP6",
+                template["activity_id"],
+                template["institution_id"],
+                source_id,
+                template["experiment_id"],
+                member_id,
+                template["table_id"],
+                template["variable_id"],
+                template["grid_label"],
+                template["version"],
+            ]
+        )
+        created = (START_TIME + timedelta(seconds=i)).strftime(TIMESTAMP_FORMAT)
+        row = {
+            **template,
+            "id": next_id + i,
+            "source_id": source_id,
+            "member_id": member_id,
+            "variant_label": member_id,
+            "instance_id": instance_id,
+            "slug": instance_id,
+            "created_at": created,
+            "updated_at": created,
+        }
+        datasets.append({c: row[c] for c in template if c in dataset_columns})
+        cmip6_datasets.append({c: row[c] for c in template if c not in dataset_columns or c == "id"})
+        by_source[source_id].append(next_id + i)
+    _insert(conn, "dataset", datasets)
+    _insert(conn, "cmip6_dataset", cmip6_datasets)
+    return by_source
+
+
+def _clone_values(
+    templates: list[dict[str, Any]], count: int, execution_id: int, source_id: str, member_id: str
+) -> Iterator[dict[str, Any]]:
+    """Clone a template execution's values, distinguishing the repeats by their ``metric``."""
+    if not templates:
+        return
+    for i in range(count):
+        template = templates[i % len(templates)]
+        repeat = i // len(templates)
+        yield {
+            **template,
+            "execution_id": execution_id,
+            "source_id": source_id if template["source_id"] is not None else None,
+            "member_id": member_id if template["member_id"] is not None else None,
+            "metric": f"{template['metric']}-{repeat}"
+            if repeat and template["metric"]
+            else template["metric"],
+        }
+
+
+def _link_output_files(source: Path, destination: Path) -> None:
+    """Hard link, or copy, the files of a template execution into a synthetic execution's directory."""
+    destination.mkdir(parents=True, exist_ok=True)
+    for file in source.rglob("*"):
+        if not file.is_file():
+            continue
+        target = destination / file.relative_to(source)
+        if target.exists():
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(file, target)
+        except OSError:
+            shutil.copyfile(file, target)
+
+
+def generate(  # noqa: PLR0915
+    destination: Path,
+    scale: Scale,
+    *,
+    template: Path = EXAMPLE_DIR,
+    output_files: bool = True,
+    seed: int = 0,
+) -> dict[str, int]:
+    """
+    Generate a synthetic database, and optionally its result files, in ``destination``.
+
+    Any existing database in ``destination`` is replaced.
+
+    Returns
+    -------
+    :
+        Number of rows added to each table
+    """
+    destination = destination.resolve()
+    rng = random.Random(seed)  # noqa: S311
+    db_path = destination / "db" / "climate_ref.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db_path.unlink(missing_ok=True)
+    with sqlite3.connect(template / "db" / "climate_ref.db") as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    counts: dict[str, int] = {}
+    datasets_by_source = _add_datasets(conn, scale)
+    counts["dataset"] = scale.datasets
+
+    # The latest execution of each diagnostic in the template is cloned
+    template_executions = _rows(
+        conn,
+        """
+        SELECT e.*, g.diagnostic_id, g.selectors, p.slug AS provider_slug, d.slug AS diagnostic_slug
+        FROM execution e
+        JOIN execution_group g ON g.id = e.execution_group_id
+        JOIN diagnostic d ON d.id = g.diagnostic_id
+        JOIN provider p ON p.id = d.provider_id
+        WHERE e.id IN (SELECT max(e2.id) FROM execution e2 JOIN execution_group g2
+                       ON g2.id = e2.execution_group_id GROUP BY g2.diagnostic_id)
+        """,
+    )
+
+    group_id = _next_id(conn, "execution_group")
+    execution_id = _next_id(conn, "execution")
+    output_id = _next_id(conn, "execution_output")
+    groups, executions, links, outputs = [], [], [], []
+    values: list[dict[str, Any]] = []
+    counts.update(execution_group=0, execution=0, execution_dataset=0, execution_output=0, metric_value=0)
+    files: list[tuple[str, str]] = []
+
+    for template_execution in template_executions:
+        template_values = {
+            kind: _rows(
+                conn,
+                "SELECT * FROM metric_value WHERE execution_id = ? AND type = ? ORDER BY id",
+                template_execution["id"],
+                kind,
+            )
+            for kind in ("SCALAR", "SERIES")
+        }
+        for row in template_values["SCALAR"] + template_values["SERIES"]:
+            del row["id"]
+        template_outputs = _rows(
+            conn,
+            "SELECT * FROM execution_output WHERE execution_id = ? ORDER BY id",
+            template_execution["id"],
+        )
+
+        for g in range(scale.groups_per_diagnostic):
+            source_id = SOURCE_IDS[g % len(SOURCE_IDS)]
+            member_id = f"r{g // len(SOURCE_IDS) + 1}i1p1f1"
+            key = f"synthetic_{source_id}_{member_id}"
+            created = START_TIME + timedelta(minutes=group_id)
+            groups.append(
+                {
+                    "id": group_id,
+                    "diagnostic_id": template_execution["diagnostic_id"],
+                    "key": key,
+                    "dirty": False,
+                    "selectors": json.dumps({"cmip6": [["member_id", member_id], ["source_id", source_id]]}),
+                    "created_at": created.strftime(TIMESTAMP_FORMAT),
+                    "updated_at": created.strftime(TIMESTAMP_FORMAT),
+                    "diagnostic_version": 1,
+                }
+            )
+            for e in range(scale.executions_per_group):
+                latest = e == scale.executions_per_group - 1
+                # Most latest executions succeeded, some failed and a few are still running
+                outcome = rng.random()
+                successful = (outcome < 0.85) if not latest or outcome < 0.95 else None  # noqa: PLR2004
+                fragment = (
+                    f"{template_execution['provider_slug']}/{template_execution['diagnostic_slug']}/"
+                    f"{key}_g{group_id}/{execution_id}"
+                )
+                timestamp = (created + timedelta(hours=e)).strftime(TIMESTAMP_FORMAT)
+                executions.append(
+                    {
+                        **{k: v for k, v in template_execution.items() if k in EXECUTION_COLUMNS},
+                        "id": execution_id,
+                        "execution_group_id": group_id,
+                        "output_fragment": fragment,
+                        "dataset_hash": f"{rng.getrandbits(160):040x}",
+                        "successful": successful,
+                        "created_at": timestamp,
+                        "updated_at": timestamp,
+                    }
+                )
+                candidates = datasets_by_source[source_id]
+                for dataset_id in rng.sample(candidates, min(scale.datasets_per_execution, len(candidates))):
+                    links.append({"execution_id": execution_id, "dataset_id": dataset_id})
+                for i, output in enumerate(template_outputs[: scale.outputs_per_execution]):
+                    outputs.append(
+                        {**output, "id": output_id + i, "execution_id": execution_id, "source_id": source_id}
+                    )
+                output_id += min(len(template_outputs), scale.outputs_per_execution)
+                values.extend(
+                    _clone_values(
+                        template_values["SCALAR"],
+                        scale.scalar_values_per_execution,
+                        execution_id,
+                        source_id,
+                        member_id,
+                    )
+                )
+                values.extend(
+                    _clone_values(
+                        template_values["SERIES"],
+                        scale.series_values_per_execution,
+                        execution_id,
+                        source_id,
+                        member_id,
+                    )
+                )
+                if output_files:
+                    files.append((template_execution["output_fragment"], fragment))
+                execution_id += 1
+
+                # Flush as we go, so the largest scales do not have to fit in memory
+                if len(values) >= BATCH_SIZE:
+                    counts["metric_value"] += _insert(conn, "metric_value", values)
+                    values = []
+            group_id += 1
+
+    counts["execution_group"] += _insert(conn, "execution_group", groups)
+    counts["execution"] += _insert(conn, "execution", executions)
+    counts["execution_dataset"] += _insert(conn, "execution_dataset", links)
+    counts["execution_output"] += _insert(conn, "execution_output", outputs)
+    counts["metric_value"] += _insert(conn, "metric_value", values)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    if output_files:
+        _link_output_files(template / "results", destination / "results")
+    for template_fragment, fragment in files:
+        _link_output_files(template / "results" / template_fragment, destination / "results" / fragment)
+
+    _write_ref_config(destination)
+    return counts
+
+
+def _write_ref_config(destination: Path) -> None:
+    """Write the REF configuration of the test data, pointed at the synthetic database and results."""
+    config = copy.deepcopy(test_ref_config())
+    config.paths.results = destination / "results"
+    config.paths.log = destination / "log"
+    config.paths.scratch = destination / "scratch"
+    config.paths.software = destination / "software"
+    config.db.database_url = "sqlite:///" + str(destination / "db" / "climate_ref.db")
+    config.save(destination / "ref.toml")
+
+
+def main() -> None:
+    """Generate a synthetic database from the command line."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("output", type=Path, help="Directory to write the database and results to")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--groups-per-diagnostic", type=int)
+    parser.add_argument("--scalar-values", type=int)
+    parser.add_argument("--no-output-files", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    if args.groups_per_diagnostic is not None:
+        scale = dataclasses.replace(scale, groups_per_diagnostic=args.groups_per_diagnostic)
+    if args.scalar_values is not None:
+        scale = dataclasses.replace(scale, scalar_values_per_execution=args.scalar_values)
+
+    counts = generate(args.output, scale, output_files=not args.no_output_files, seed=args.seed)
+    for table, count in counts.items():
+        print(f"{table:<20} {count:>12,} rows added")
+
+
+if __name__ == "__main__":
+    main()
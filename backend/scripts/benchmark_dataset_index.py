@@ -0,0 +1,140 @@
+"""
+Benchmark the CMIP6 dataset facet index against SQL on a synthetic catalog.
+
+A catalog of random CMIP6-like datasets is generated in memory,
+indexed with `DatasetFacetIndex`, and the same random facet filters are resolved
+with the index and with an in-memory SQLite table that has an index on every facet.
+
+Usage:
+    cd backend && uv run python scripts/benchmark_dataset_index.py
+
+Options:
+    --datasets N    Number of datasets in the catalog (default: 1000000)
+    --queries N     Number of random filters to resolve (default: 200)
+    --no-sql        Skip the SQLite comparison, which takes a while to load
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from ref_backend.core.dataset_index import DatasetFacetIndex  # noqa: E402
+from ref_backend.core.execution_filters import INDEXED_FACETS  # noqa: E402
+
+FACET_CARDINALITY = {
+    "activity_id": 12,
+    "experiment_id": 80,
+    "grid_label": 6,
+    "institution_id": 45,
+    "member_id": 150,
+    "source_id": 120,
+    "table_id": 25,
+    "variable_id": 400,
+}
+"""Number of distinct values generated for each facet, roughly matching a CMIP6 replica."""
+
+
+def _value(rng: random.Random, facet: str) -> str:
+    # Skewed towards the first values, as real catalogs are dominated by a few models and tables
+    return f"{facet}-{int(rng.paretovariate(1.2)) % FACET_CARDINALITY[facet]}"
+
+
+def generate_catalog(n: int, seed: int) -> list[tuple[object, ...]]:
+    """Generate ``(id, *facet values)`` rows for a synthetic catalog."""
+    rng = random.Random(seed)  # noqa: S311
+    return [(i, *(_value(rng, facet) for facet in INDEXED_FACETS)) for i in range(1, n + 1)]
+
+
+def generate_queries(n: int, seed: int) -> list[dict[str, list[str]]]:
+    """Generate facet filters with one to three facets and one to three values each."""
+    rng = random.Random(seed)  # noqa: S311
+    queries = []
+    for _ in range(n):
+        facets = rng.sample(INDEXED_FACETS, rng.randint(1, 3))
+        queries.append(
+            {facet: sorted({_value(rng, facet) for _ in range(rng.randint(1, 3))}) for facet in facets}
+        )
+    return queries
+
+
+def _sql_query(connection: sqlite3.Connection, facets: dict[str, list[str]]) -> int:
+    clauses = " AND ".join(f"{facet} IN ({','.join('?' * len(values))})" for facet, values in facets.items())
+    params = [value for values in facets.values() for value in values]
+    return len(connection.execute(f"SELECT id FROM dataset WHERE {clauses}", params).fetchall())  # noqa: S608
+
+
+def _report(name: str, durations: list[float]) -> None:
+    durations = sorted(durations)
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(f"{name:<12} median {statistics.median(durations):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main() -> None:
+    """Print the build cost of the index and the latency of resolving random filters."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--datasets", type=int, default=1_000_000, help="Number of datasets")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random filters")
+    parser.add_argument("--no-sql", action="store_true", help="Skip the SQLite comparison")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rows = generate_catalog(args.datasets, args.seed)
+    queries = generate_queries(args.queries, args.seed + 1)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = DatasetFacetIndex.build(rows, latest_ids=range(1, args.datasets + 1))
+    build_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    dense = sum(posting.is_dense for postings in index.postings.values() for posting in postings.values())
+    total = sum(len(postings) for postings in index.postings.values())
+    print(f"Indexed {args.datasets} datasets in {build_seconds:.1f} s (peak {peak / 2**20:.0f} MiB)")
+    print(f"{total} postings, {dense} stored as bitmaps")
+
+    durations = []
+    matches = []
+    for facets in queries:
+        start = time.perf_counter()
+        ids = index.resolve(facets)
+        durations.append((time.perf_counter() - start) * 1000)
+        matches.append(len(ids) if ids is not None else 0)
+    print(f"Median filter matches {statistics.median(matches):.0f} datasets")
+    _report("index", durations)
+
+    if args.no_sql:
+        return
+
+    connection = sqlite3.connect(":memory:")
+    columns = ", ".join(f"{facet} TEXT" for facet in INDEXED_FACETS)
+    connection.execute(f"CREATE TABLE dataset (id INTEGER PRIMARY KEY, {columns})")
+    placeholders = ",".join("?" * (len(INDEXED_FACETS) + 1))
+    connection.executemany(f"INSERT INTO dataset VALUES ({placeholders})", rows)  # noqa: S608
+    for facet in INDEXED_FACETS:
+        connection.execute(f"CREATE INDEX ix_dataset_{facet} ON dataset ({facet})")
+    connection.execute("ANALYZE")
+
+    durations = []
+    for facets, expected in zip(queries, matches):
+        start = time.perf_counter()
+        count = _sql_query(connection, facets)
+        durations.append((time.perf_counter() - start) * 1000)
+        assert count == expected, facets
+    _report("sqlite", durations)
+
+
+if __name__ == "__main__":
+    main()
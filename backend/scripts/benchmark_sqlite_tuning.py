@@ -0,0 +1,146 @@
+"""
+Benchmark request latency against a read-only SQLite database, with and without the SQLite tuning.
+
+The app is built in-process once per configuration and the same requests are timed against each:
+
+- ``default``: SQLAlchemy's default pool size and SQLite's default pragmas
+- ``tuned``: the pool and ``SQLITE_*`` pragmas from the current settings
+- ``tuned+copy``: as ``tuned``, serving a copy of the database in ``--copy-dir``
+
+The query and HTTP caches are disabled, so every request reaches the database.
+
+Usage:
+    cd backend && uv run python scripts/benchmark_sqlite_tuning.py
+
+Options:
+    --test-data     Use the decimated test data included in the repository
+    --repeat N      Time N requests per endpoint and configuration (default: 20)
+    --copy-dir DIR  Directory for the copy of the database (default: /dev/shm, if it exists)
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from climate_ref.config import Config  # noqa: E402
+from ref_backend.api import deps  # noqa: E402
+from ref_backend.builder import build_app  # noqa: E402
+from ref_backend.core.config import Settings, get_settings  # noqa: E402
+from ref_backend.core.database import configure_database  # noqa: E402
+from ref_backend.core.ref import get_database, get_provider_registry, get_ref_config  # noqa: E402
+from ref_backend.testing import test_ref_config, test_settings  # noqa: E402
+
+DEFAULT_SETTINGS = {
+    # SQLAlchemy's defaults for a QueuePool
+    "DATABASE_POOL_SIZE": 5,
+    "DATABASE_MAX_OVERFLOW": 10,
+    "SQLITE_MMAP_SIZE": 0,
+    "SQLITE_CACHE_SIZE_KIB": 0,
+    "SQLITE_TEMP_STORE_MEMORY": False,
+    "SQLITE_COPY_DIR": None,
+}
+"""Settings that reproduce the setup before the SQLite tuning."""
+
+
+def _endpoints(client: TestClient, prefix: str) -> list[str]:
+    """Pick endpoints that query the database, using the diagnostic with the most execution groups."""
+    diagnostics = client.get(f"{prefix}/diagnostics/").json()["data"]
+    urls = [
+        f"{prefix}/diagnostics/",
+        f"{prefix}/executions/?limit=100",
+        f"{prefix}/executions/statistics",
+        f"{prefix}/datasets/?limit=100",
+    ]
+    if diagnostics:
+        heaviest = max(diagnostics, key=lambda d: d.get("execution_group_count", 0))
+        base = f"{prefix}/diagnostics/{heaviest['provider']['slug']}/{heaviest['slug']}"
+        urls += [
+            f"{base}/execution_groups",
+            f"{base}/values?value_type=scalar&limit=500",
+        ]
+    return urls
+
+
+def _time_requests(settings: Settings, ref_config: Config, repeat: int) -> dict[str, list[float]]:
+    """Time each endpoint against an app using its own database and pool for these settings."""
+    database = configure_database(get_database(ref_config, read_only=True), settings)
+    app = build_app(settings, ref_config, database)
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[deps._ref_config_dependency] = lambda: ref_config
+    app.dependency_overrides[deps._get_database_dependency] = lambda: database
+    # Load the providers up front, as main.py does, rather than in a request thread
+    provider_registry = get_provider_registry(ref_config, read_only=True)
+    app.dependency_overrides[deps._provider_registry_dependency] = lambda: provider_registry
+
+    durations: dict[str, list[float]] = {}
+    with TestClient(app) as client:
+        urls = _endpoints(client, settings.API_V1_STR)
+        for url in urls:
+            # Warm up the pool and the page cache, which is what a long-running worker sees
+            client.get(url)
+            durations[url] = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = client.get(url)
+                durations[url].append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+    database.close()
+    return durations
+
+
+def main() -> None:
+    """Print the median and 95th percentile latency of each endpoint for each configuration."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--test-data", action="store_true", help="Use the test data in the repository")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed requests per measurement")
+    parser.add_argument("--copy-dir", type=Path, help="Directory for the copy of the database")
+    args = parser.parse_args()
+
+    settings: Settings
+    if args.test_data:
+        settings, ref_config = test_settings(), test_ref_config()
+    else:
+        settings = get_settings()
+        ref_config = get_ref_config(settings)
+    # Every request must reach the database
+    settings = settings.model_copy(
+        update={
+            "REF_READ_ONLY_DATABASE": True,
+            "QUERY_CACHE_MAX_ENTRIES": 0,
+            "HTTP_CACHE_ENABLED": False,
+            "COMPRESSION_CACHE_MAX_ENTRIES": 0,
+        }
+    )
+    shm = Path("/dev/shm")  # noqa: S108
+    copy_dir = args.copy_dir or (shm if shm.is_dir() else Path(tempfile.gettempdir()))
+
+    configurations = {
+        "default": settings.model_copy(update=DEFAULT_SETTINGS),
+        "tuned": settings.model_copy(update={"SQLITE_COPY_DIR": None}),
+        "tuned+copy": settings.model_copy(update={"SQLITE_COPY_DIR": copy_dir / "ref-benchmark"}),
+    }
+    results = {name: _time_requests(s, ref_config, args.repeat) for name, s in configurations.items()}
+
+    print(f"{'endpoint':<70} {'configuration':<12} {'median ms':>10} {'p95 ms':>10}")
+    for url in results["default"]:
+        for name, durations in results.items():
+            timings = sorted(durations[url])
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            print(f"{url[-70:]:<70} {name:<12} {statistics.median(timings):>10.2f} {p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
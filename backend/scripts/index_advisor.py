@@ -0,0 +1,329 @@
+"""
+Report the API queries that scan whole tables, and manage an optional pack of API-specific indexes.
+
+The API's hot filters rely on the indexes defined by the climate-ref schema,
+which is designed for the workers that write results rather than for the API that reads them.
+This replays a representative set of API requests in-process, captures every SELECT they run,
+and reports which tables each query scans in full,
+from ``EXPLAIN QUERY PLAN`` on SQLite or ``EXPLAIN (FORMAT JSON)`` on PostgreSQL.
+
+The index pack adds composite and partial indexes for the API's access paths.
+It is intended for read replicas and databases the API does not share with the workers,
+as the climate-ref migrations do not know about these indexes.
+
+Usage:
+    cd backend && uv run python scripts/index_advisor.py
+
+Options:
+    --test-data     Use the decimated test data included in the repository
+    --emit          Print the DDL for the index pack rather than replaying the queries
+    --apply         Create any missing indexes from the pack, then replay the queries
+    --verbose       Print the SQL of each query that scans a table
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from sqlalchemy import Engine, Index, MetaData, event, inspect, text  # noqa: E402
+from sqlalchemy.schema import CreateIndex  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from climate_ref.models import Base  # noqa: E402
+from ref_backend.api import deps  # noqa: E402
+from ref_backend.builder import build_app  # noqa: E402
+from ref_backend.core.config import Settings, get_settings  # noqa: E402
+from ref_backend.core.ref import get_provider_registry, get_ref_config  # noqa: E402
+from ref_backend.testing import test_ref_config, test_settings  # noqa: E402
+
+
+def index_pack() -> list[Index]:
+    """
+    Build the API index pack.
+
+    The indexes are defined on copies of the climate-ref tables,
+    so the climate-ref metadata is left untouched.
+    """
+    metadata = MetaData()
+    tables = {
+        name: Base.metadata.tables[name].to_metadata(metadata)
+        for name in (
+            "dataset",
+            "cmip6_dataset",
+            "execution_group",
+            "execution",
+            "execution_dataset",
+            "metric_value",
+        )
+    }
+    execution = tables["execution"].c
+    execution_group = tables["execution_group"].c
+    cmip6 = tables["cmip6_dataset"].c
+    return [
+        # Latest execution of each group, as max(id) or the newest by created_at
+        Index("ix_api_execution_group_id_id", execution.execution_group_id, execution.id),
+        Index(
+            "ix_api_execution_group_id_created_at",
+            execution.execution_group_id,
+            execution.created_at,
+            execution.id,
+        ),
+        # Filtering groups on the success of their executions
+        Index(
+            "ix_api_execution_successful_group_id",
+            execution.execution_group_id,
+            execution.id,
+            sqlite_where=text("successful = 1"),
+            postgresql_where=text("successful"),
+        ),
+        # Paging a diagnostic's groups by id, and listing them by recency
+        Index("ix_api_execution_group_diagnostic_id_id", execution_group.diagnostic_id, execution_group.id),
+        Index(
+            "ix_api_execution_group_diagnostic_id_updated_at",
+            execution_group.diagnostic_id,
+            execution_group.updated_at,
+        ),
+        # Covering index for the dataset to execution semi-join
+        Index(
+            "ix_api_execution_dataset_dataset_id_execution_id",
+            tables["execution_dataset"].c.dataset_id,
+            tables["execution_dataset"].c.execution_id,
+        ),
+        # Scalar or series values of an execution
+        Index(
+            "ix_api_metric_value_execution_id_type",
+            tables["metric_value"].c.execution_id,
+            tables["metric_value"].c.type,
+        ),
+        # Dataset listings, newest first
+        Index(
+            "ix_api_dataset_type_updated_at", tables["dataset"].c.dataset_type, tables["dataset"].c.updated_at
+        ),
+        # The partition of the latest-version window over CMIP6 datasets
+        Index(
+            "ix_api_cmip6_dataset_partition",
+            cmip6.source_id,
+            cmip6.experiment_id,
+            cmip6.variable_id,
+            cmip6.table_id,
+            cmip6.member_id,
+            cmip6.grid_label,
+            cmip6.institution_id,
+            cmip6.activity_id,
+        ),
+    ]
+
+
+def index_ddl(engine: Engine) -> list[str]:
+    """Get the ``CREATE INDEX IF NOT EXISTS`` statements for the pack, for the engine's database."""
+    return [
+        str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)) for index in index_pack()
+    ]
+
+
+def missing_indexes(engine: Engine) -> list[Index]:
+    """Get the indexes from the pack that are not yet in the database."""
+    inspector = inspect(engine)
+    existing = {
+        index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)
+    }
+    return [index for index in index_pack() if index.name not in existing]
+
+
+@dataclass
+class CapturedQuery:
+    statement: str
+    parameters: Any
+    endpoints: set[str] = field(default_factory=set)
+
+
+def _requests(client: TestClient, prefix: str) -> list[str]:
+    """Pick requests covering the API's filters, using ids found in the database."""
+    urls = [
+        f"{prefix}/diagnostics/",
+        f"{prefix}/executions/?limit=10",
+        f"{prefix}/executions/?successful=true",
+        f"{prefix}/executions/?dirty=false&limit=50",
+        f"{prefix}/executions/statistics",
+        f"{prefix}/datasets/?limit=10",
+    ]
+
+    diagnostics = client.get(f"{prefix}/diagnostics/").json()["data"]
+    if diagnostics:
+        diagnostic = max(diagnostics, key=lambda d: d.get("execution_group_count", 0))
+        base = f"{prefix}/diagnostics/{diagnostic['provider']['slug']}/{diagnostic['slug']}"
+        urls += [
+            f"{base}/execution_groups?limit=50",
+            f"{base}/execution_groups?include_history=false",
+            f"{base}/executions?limit=50",
+            f"{base}/values?value_type=scalar&limit=100",
+            f"{prefix}/executions/?diagnostic_name_contains={diagnostic['name'][:4]}",
+        ]
+
+    groups = client.get(f"{prefix}/executions/?limit=1").json()["data"]
+    if groups:
+        urls += [
+            f"{prefix}/executions/{groups[0]['id']}",
+            f"{prefix}/executions/{groups[0]['id']}/datasets",
+            f"{prefix}/executions/{groups[0]['id']}/values?value_type=scalar",
+        ]
+
+    datasets = client.get(f"{prefix}/datasets/?limit=1").json()["data"]
+    if datasets:
+        dataset = datasets[0]
+        urls.append(f"{prefix}/datasets/{dataset['id']}/executions")
+        if dataset["metadata"]:
+            source_id = dataset["metadata"]["source_id"]
+            facets = json.dumps({"source_id": source_id})
+            urls += [
+                f"{prefix}/datasets/?facets={facets}",
+                f"{prefix}/datasets/?name_contains={source_id}",
+                f"{prefix}/executions/?source_id={source_id}",
+            ]
+    return urls
+
+
+def capture_queries(app: Any, prefix: str) -> dict[str, CapturedQuery]:
+    """Make each request and capture the SELECT statements it runs, keyed by SQL."""
+    captured: dict[str, CapturedQuery] = {}
+    current = {"url": ""}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: PLR0913, PLR0917
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        query = captured.setdefault(statement, CapturedQuery(statement, parameters))
+        query.endpoints.add(current["url"])
+
+    with TestClient(app) as client:
+        urls = _requests(client, prefix)
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            for url in urls:
+                current["url"] = url
+                response = client.get(url)
+                if response.status_code >= 400:  # noqa: PLR2004
+                    print(f"warning: {url} returned {response.status_code}")
+        finally:
+            event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _sqlite_scans(engine: Engine, query: CapturedQuery, tables: set[str]) -> list[str]:
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query.statement}", query.parameters).all()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        # "SCAN <table>" reads every row; "SCAN <table> USING [COVERING] INDEX" walks an index instead
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in tables and "USING" not in words:  # noqa: PLR2004
+            scans.append(words[1])
+    return scans
+
+
+def _postgres_scans(engine: Engine, query: CapturedQuery) -> list[str]:
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {query.statement}", query.parameters
+        ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def report(engine: Engine, captured: dict[str, CapturedQuery], verbose: bool) -> None:
+    """Print the tables scanned in full, with the queries and endpoints that scan them."""
+    tables = set(inspect(engine).get_table_names())
+    scans_by_table: dict[str, list[CapturedQuery]] = defaultdict(list)
+    for query in captured.values():
+        if engine.dialect.name == "postgresql":
+            scans = _postgres_scans(engine, query)
+        else:
+            scans = _sqlite_scans(engine, query, tables)
+        for table in sorted(set(scans)):
+            scans_by_table[table].append(query)
+
+    print(f"Replayed {len(captured)} distinct queries")
+    if not scans_by_table:
+        print("No query scans a whole table")
+        return
+
+    print(f"{'table':<30} {'queries':>8} {'endpoints':>10}")
+    for table, queries in sorted(scans_by_table.items(), key=lambda item: -len(item[1])):
+        endpoints = set().union(*(query.endpoints for query in queries))
+        print(f"{table:<30} {len(queries):>8} {len(endpoints):>10}")
+        if verbose:
+            for query in queries:
+                print(f"    {' '.join(query.statement.split())[:300]}")
+                print(f"        from {', '.join(sorted(query.endpoints))}")
+
+
+def main() -> None:
+    """Replay the API's queries against the configured database and report full table scans."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--test-data", action="store_true", help="Use the test data in the repository")
+    parser.add_argument("--emit", action="store_true", help="Print the DDL for the index pack")
+    parser.add_argument("--apply", action="store_true", help="Create the missing indexes from the pack")
+    parser.add_argument("--verbose", action="store_true", help="Print the queries that scan each table")
+    args = parser.parse_args()
+
+    settings: Settings
+    if args.test_data:
+        settings, ref_config = test_settings(), test_ref_config()
+    else:
+        settings = get_settings()
+        ref_config = get_ref_config(settings)
+    # Every request must reach the database for its queries to be captured
+    settings = settings.model_copy(update={"QUERY_CACHE_MAX_ENTRIES": 0, "HTTP_CACHE_ENABLED": False})
+
+    database = deps._get_database_dependency(settings, ref_config)
+    with database.session_scope() as session:
+        engine = session.get_bind().engine
+
+    if args.emit:
+        for statement in index_ddl(engine):
+            print(f"{statement};")
+        return
+
+    if args.apply:
+        if settings.REF_READ_ONLY_DATABASE:
+            parser.error("The database is opened read-only (REF_READ_ONLY_DATABASE)")
+        missing = missing_indexes(engine)
+        with engine.begin() as connection:
+            for index in missing:
+                print(f"Creating {index.name}")
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        print(f"Created {len(missing)} indexes")
+
+    app = build_app(settings, ref_config, database)
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[deps._ref_config_dependency] = lambda: ref_config
+    # Load the providers up front, as main.py does, rather than in a request thread
+    provider_registry = get_provider_registry(ref_config, read_only=settings.REF_READ_ONLY_DATABASE)
+    app.dependency_overrides[deps._provider_registry_dependency] = lambda: provider_registry
+
+    report(engine, capture_queries(app, settings.API_V1_STR), args.verbose)
+
+
+if __name__ == "__main__":
+    main()
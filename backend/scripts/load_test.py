@@ -0,0 +1,327 @@
+"""
+Load test the API with simulated explorer sessions.
+
+Each virtual user repeatedly browses the explorer the way the frontend does:
+
+1. open the list of themes, then one of the themes
+2. open one of the theme's collections
+3. load the values of each of the collection's cards, then change a filter control of a card
+4. download a figure of one of the cards' diagnostics
+5. occasionally, download the archive of that figure's execution
+
+The users are concurrent asyncio tasks, pausing for a random think time between requests.
+By default the backend is started for each ``--workers`` count,
+serving the synthetic database of ``benchmarks/generate_database.py``,
+and the throughput, latency percentiles and error rate of each endpoint are reported per worker count.
+
+Usage:
+    cd backend && uv run python scripts/load_test.py --workers 1 2 4 --users 50
+
+Options:
+    --url URL              Test a backend that is already running instead of starting one
+    --data DIR             Synthetic data to serve (default: benchmarks/.data/<scale>, generated if missing)
+    --scale NAME           Scale of the synthetic data (default: small)
+    --workers N [N ...]    Worker counts to start the backend with (default: 1)
+    --users N              Number of concurrent users (default: 20)
+    --duration SECONDS     Length of each test (default: 60)
+    --think-time SECONDS   Mean pause between a user's requests (default: 0.5)
+    --archive-fraction F   Fraction of sessions that download an archive (default: 0.1)
+    --json PATH            Also write the results to a JSON file
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+# Add the backend src and benchmarks to the path so we can import ref_backend and the generator
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+sys.path.insert(0, str(backend_dir / "benchmarks"))
+
+from generate_database import SCALES, generate  # noqa: E402
+
+API = "/api/v1"
+STARTUP_TIMEOUT_SECONDS = 300
+
+
+@dataclass
+class EndpointStats:
+    """Outcomes of the requests to an endpoint."""
+
+    durations_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    bytes: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.durations_ms)
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.durations_ms)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+class Session:
+    """A simulated visitor to the explorer, recording the outcome of each request by endpoint."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        stats: dict[str, EndpointStats],
+        rng: random.Random,
+        think_time: float,
+    ) -> None:
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+
+    async def get(self, endpoint: str, url: str, params: dict[str, Any] | None = None) -> Any:
+        """Request a URL, pausing first, returning the parsed JSON body if the request succeeded."""
+        await asyncio.sleep(self.rng.expovariate(1 / self.think_time) if self.think_time else 0)
+        stats = self.stats[endpoint]
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=params)
+            body = await response.aread()
+        except httpx.HTTPError:
+            stats.durations_ms.append((time.perf_counter() - start) * 1000)
+            stats.errors += 1
+            return None
+        stats.durations_ms.append((time.perf_counter() - start) * 1000)
+        stats.bytes += len(body)
+        if response.status_code >= 400:  # noqa: PLR2004
+            stats.errors += 1
+            return None
+        is_json = response.headers.get("content-type", "").startswith("application/json")
+        return response.json() if is_json else None
+
+    async def card_values(self, content: dict[str, Any]) -> None:
+        """Load a card's values as the frontend does, then change one of its filter controls."""
+        url = f"{API}/diagnostics/{content['provider']}/{content['diagnostic']}/values"
+        filters = dict(content.get("other_filters") or {})
+        controls = content.get("filter_controls") or []
+        for control in controls:
+            if control.get("default_value"):
+                filters[control["filter_key"]] = control["default_value"]
+
+        if content["type"] == "series-chart":
+            await self.get("card series values", url, {**filters, "value_type": "series", "limit": 500})
+        elif content["type"] != "figure-gallery":
+            await self.get(
+                "card scalar values",
+                url,
+                {**filters, "value_type": "scalar", "limit": 500, "detect_outliers": "iqr"},
+            )
+
+        if not controls:
+            return
+        # The options of a control are the facets of the values without its filter
+        control = self.rng.choice(controls)
+        unfiltered = {k: v for k, v in filters.items() if k != control["filter_key"]}
+        value_type = "series" if content["type"] == "series-chart" else "scalar"
+        facets = await self.get("card facets", url, {**unfiltered, "value_type": value_type, "limit": 1})
+        options = next(
+            (f["values"] for f in (facets or {}).get("facets", []) if f["key"] == control["filter_key"]), []
+        )
+        if options:
+            filters[control["filter_key"]] = self.rng.choice(options)
+            await self.get(
+                f"card {value_type} values", url, {**filters, "value_type": value_type, "limit": 500}
+            )
+
+    async def download_figure(self, content: dict[str, Any], archive_fraction: float) -> None:
+        """Download a figure of a card's diagnostic, and sometimes the archive of its execution."""
+        groups = await self.get(
+            "execution groups",
+            f"{API}/diagnostics/{content['provider']}/{content['diagnostic']}/execution_groups",
+            {"limit": 20, "include_history": "false"},
+        )
+        figures = [
+            (group, output)
+            for group in (groups or {}).get("data", [])
+            if group["latest_execution"]
+            for output in group["latest_execution"]["outputs"]
+            if output["output_type"] == "plot"
+        ]
+        if not figures:
+            return
+        group, figure = self.rng.choice(figures)
+        await self.get("figure", f"{API}/results/{figure['id']}")
+
+        if self.rng.random() < archive_fraction:
+            await self.get("archive", f"{API}/executions/{group['id']}/archive")
+
+    async def run(self, archive_fraction: float) -> None:
+        """Browse a random collection of a random theme."""
+        themes = await self.get("themes", f"{API}/explorer/themes/")
+        if not themes:
+            return
+        theme = await self.get("theme", f"{API}/explorer/themes/{self.rng.choice(themes)['slug']}")
+        if not theme or not theme["collections"]:
+            return
+        collection = await self.get(
+            "collection", f"{API}/explorer/collections/{self.rng.choice(theme['collections'])['id']}"
+        )
+        if not collection:
+            return
+
+        contents = [
+            content
+            for card in collection.get("explorer_cards", [])
+            for content in card["content"]
+            if not content.get("placeholder")
+        ]
+        # The frontend loads the cards of a collection concurrently
+        await asyncio.gather(*(self.card_values(content) for content in contents))
+        if contents:
+            await self.download_figure(self.rng.choice(contents), archive_fraction)
+
+
+async def _run_load(base_url: str, args: argparse.Namespace) -> tuple[dict[str, EndpointStats], float]:
+    """Run sessions for each user until the duration has passed."""
+    stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+    deadline = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.users * 4)
+
+    async def user(index: int) -> None:
+        rng = random.Random(index)  # noqa: S311
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            session = Session(client, stats, rng, args.think_time)
+            while time.monotonic() < deadline:
+                await session.run(args.archive_fraction)
+
+    start = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(args.users)))
+    return stats, time.monotonic() - start
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def _start_backend(data: Path, workers: int) -> tuple[subprocess.Popen[bytes], str]:
+    """Start the backend serving the synthetic data, and wait until it is healthy."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "REF_CONFIGURATION": str(data),
+        "REF_READ_ONLY_DATABASE": "true",
+        "LOG_LEVEL": "WARNING",
+    }
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "ref_backend.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=backend_dir,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The backend exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}{API}/utils/health-check/", timeout=1).status_code == 200:  # noqa: PLR2004
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("The backend did not become healthy in time")
+
+
+def _report(label: str, stats: dict[str, EndpointStats], elapsed: float) -> dict[str, Any]:
+    """Print the results of a test, returning them for the JSON output."""
+    total = sum(s.requests for s in stats.values())
+    errors = sum(s.errors for s in stats.values())
+    print(f"\n{label}: {total} requests in {elapsed:.0f} s, {total / elapsed:.1f} req/s, {errors} errors")
+    columns = ("requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors")
+    print(f"{'endpoint':<22} " + " ".join(f"{column:>8}" for column in columns))
+    endpoints = {}
+    for endpoint, s in sorted(stats.items()):
+        endpoints[endpoint] = {
+            "requests": s.requests,
+            "requests_per_second": round(s.requests / elapsed, 2),
+            "p50_ms": round(statistics.median(s.durations_ms), 1),
+            "p95_ms": round(s.percentile(0.95), 1),
+            "p99_ms": round(s.percentile(0.99), 1),
+            "error_rate": round(s.errors / s.requests, 4),
+            "bytes": s.bytes,
+        }
+        e = endpoints[endpoint]
+        print(
+            f"{endpoint:<22} {s.requests:>8} {e['requests_per_second']:>8.1f} {e['p50_ms']:>8.1f} "
+            f"{e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} {e['error_rate']:>8.1%}"
+        )
+    return {"requests": total, "errors": errors, "seconds": round(elapsed, 1), "endpoints": endpoints}
+
+
+def main() -> None:
+    """Run the load test for each worker count, or against a running backend."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="URL of a running backend, instead of starting one")
+    parser.add_argument("--data", type=Path, help="Synthetic data directory to serve")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Scale of the synthetic data")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Worker counts to test")
+    parser.add_argument("--users", type=int, default=20, help="Number of concurrent users")
+    parser.add_argument("--duration", type=float, default=60, help="Length of each test in seconds")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between requests")
+    parser.add_argument("--archive-fraction", type=float, default=0.1, help="Sessions downloading an archive")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {"users": args.users, "duration": args.duration, "runs": {}}
+    if args.url:
+        stats, elapsed = asyncio.run(_run_load(args.url, args))
+        results["runs"][args.url] = _report(args.url, stats, elapsed)
+    else:
+        data = args.data or backend_dir / "benchmarks" / ".data" / args.scale
+        if not (data / "ref.toml").exists():
+            print(f"Generating the {args.scale} synthetic database in {data}")
+            generate(data, SCALES[args.scale])
+        for workers in args.workers:
+            process, base_url = _start_backend(data.resolve(), workers)
+            try:
+                stats, elapsed = asyncio.run(_run_load(base_url, args))
+            finally:
+                process.terminate()
+                process.wait()
+            results["runs"][f"{workers} workers"] = _report(f"{workers} workers", stats, elapsed)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compute the data of the explorer cards into the shared query cache.
+
+Run after each batch of executions has been written, e.g. at the end of a solve job,
+so that the first visitors to the explorer do not wait for the cards to be computed.
+The cards are cached under the database generation, so they are served until the next batch.
+
+This needs a cache that is shared with the API workers,
+i.e. ``CACHE_BACKEND=sqlite`` on the same host or ``CACHE_BACKEND=redis``,
+and reads the same settings (environment or ``.env``) as the API.
+
+Usage:
+    cd backend && uv run python scripts/materialize_explorer_cards.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import dotenv
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from ref_backend.core.config import get_settings  # noqa: E402
+
+# Load the settings before climate-ref is imported, as main.py does,
+# to avoid climate-ref setting the `REF_CONFIGURATION` environment variable
+dotenv.load_dotenv(override=True)
+settings = get_settings()
+
+from climate_ref.results import Reader  # noqa: E402
+from ref_backend.api.deps import AppContext, _get_database_dependency  # noqa: E402
+from ref_backend.core.explorer_cards import materialize_explorer_cards  # noqa: E402
+from ref_backend.core.ref import get_provider_registry, get_ref_config  # noqa: E402
+
+
+def main() -> None:
+    """Compute the cards of every collection."""
+    if settings.CACHE_BACKEND == "memory":
+        print("CACHE_BACKEND is memory, so the API workers will not see the computed cards")
+
+    ref_config = get_ref_config(settings)
+    database = _get_database_dependency(settings, ref_config)
+    provider_registry = get_provider_registry(ref_config, read_only=settings.REF_READ_ONLY_DATABASE)
+
+    start = time.perf_counter()
+    with database.session_scope() as session:
+        app_context = AppContext(
+            session=session,
+            reader=Reader(database, results=ref_config.paths.results, session=session),
+            ref_config=ref_config,
+            settings=settings,
+            provider_registry=provider_registry,
+        )
+        collections = materialize_explorer_cards(app_context)
+    print(f"Computed the cards of {len(collections)} collections in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Measure the bytes on the wire for the heaviest API endpoints under each content encoding.
+
+Requests are made in-process against the app built from the current settings,
+so this measures the compression middleware rather than the network.
+
+Usage:
+    cd backend && uv run python scripts/measure_compression.py
+
+Options:
+    --test-data     Use the decimated test data included in the repository
+    --repeat N      Time N requests per endpoint and encoding (default: 5)
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the backend src to the path so we can import ref_backend
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir / "src"))
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from ref_backend.api import deps  # noqa: E402
+from ref_backend.builder import build_app  # noqa: E402
+from ref_backend.core.compression import available_encoders  # noqa: E402
+from ref_backend.core.config import Settings, get_settings  # noqa: E402
+from ref_backend.core.ref import get_provider_registry, get_ref_config  # noqa: E402
+from ref_backend.testing import test_ref_config, test_settings  # noqa: E402
+
+
+def _endpoints(client: TestClient, prefix: str) -> list[str]:
+    """Pick the heaviest endpoints, using the diagnostic with the most execution groups."""
+    diagnostics = client.get(f"{prefix}/diagnostics/").json()["data"]
+    if not diagnostics:
+        return [f"{prefix}/diagnostics/"]
+    heaviest = max(diagnostics, key=lambda d: d.get("execution_group_count", 0))
+    base = f"{prefix}/diagnostics/{heaviest['provider']['slug']}/{heaviest['slug']}"
+    return [
+        f"{prefix}/diagnostics/",
+        f"{prefix}/executions/?limit=100",
+        f"{prefix}/datasets/?limit=100",
+        f"{base}/execution_groups",
+        f"{base}/values?value_type=scalar&limit=1000",
+        f"{base}/values?value_type=scalar&format=csv",
+        f"{base}/values?value_type=series&limit=100",
+    ]
+
+
+def main() -> None:
+    """Print the response size and latency of each endpoint for each encoding."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--test-data", action="store_true", help="Use the test data in the repository")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed requests per measurement")
+    args = parser.parse_args()
+
+    settings: Settings
+    if args.test_data:
+        settings, ref_config = test_settings(), test_ref_config()
+    else:
+        settings = get_settings()
+        ref_config = get_ref_config(settings)
+    # Measure compression on its own, rather than the reuse of compressed responses
+    settings = settings.model_copy(update={"COMPRESSION_CACHE_MAX_ENTRIES": 0})
+
+    app = build_app(settings, ref_config, deps._get_database_dependency(settings, ref_config))
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[deps._ref_config_dependency] = lambda: ref_config
+    # Load the providers up front, as main.py does, rather than in a request thread
+    provider_registry = get_provider_registry(ref_config, read_only=settings.REF_READ_ONLY_DATABASE)
+    app.dependency_overrides[deps._provider_registry_dependency] = lambda: provider_registry
+
+    encodings = ["identity", *available_encoders(settings)]
+    print(f"{'endpoint':<90} {'encoding':<9} {'bytes':>10} {'ratio':>6} {'median ms':>10}")
+
+    with TestClient(app) as client:
+        for url in _endpoints(client, settings.API_V1_STR):
+            identity_size = None
+            for encoding in encodings:
+                durations = []
+                size = 0
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    with client.stream("GET", url, headers={"Accept-Encoding": encoding}) as response:
+                        size = sum(len(chunk) for chunk in response.iter_raw())
+                    durations.append((time.perf_counter() - start) * 1000)
+                if identity_size is None:
+                    identity_size = size
+                ratio = size / identity_size if identity_size else 1.0
+                print(
+                    f"{url:<90} {encoding:<9} {size:>10} {ratio:>6.2f} {statistics.median(durations):>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
+import itertools
 from collections.abc import Generator
 from dataclasses import dataclass
 from threading import Lock
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
 
 from climate_ref.config import Config
@@ -11,6 +12,8 @@ from climate_ref.database import Database
 from climate_ref.provider_registry import ProviderRegistry
 from climate_ref.results import Reader
 from ref_backend.core.config import Settings, get_settings
+from ref_backend.core.database import configure_database, open_read_replica
+from ref_backend.core.query_budget import set_budget_seconds
 from ref_backend.core.ref import get_database, get_provider_registry, get_ref_config
 
 SettingsDep = Annotated[Settings, Depends(get_settings)]
@@ -35,14 +38,68 @@ def _get_database_dependency(settings: SettingsDep, ref_config: REFConfigDep) ->
     key = (ref_config.db.database_url, settings.REF_READ_ONLY_DATABASE)
     with _database_cache_lock:
         if key not in _database_cache:
-            _database_cache[key] = get_database(ref_config, read_only=settings.REF_READ_ONLY_DATABASE)
+            _database_cache[key] = configure_database(
+                get_database(ref_config, read_only=settings.REF_READ_ONLY_DATABASE), settings
+            )
         return _database_cache[key]
 
 
 DatabaseDep = Annotated[Database, Depends(_get_database_dependency)]
 
 
-def get_database_session(database: DatabaseDep) -> Generator[Session, None, None]:
+_replica_cache: dict[str, Database] = {}
+_replica_counter = itertools.count()
+
+
+def get_read_replicas(settings: Settings) -> list[Database]:
+    """
+    Get the read replicas in ``DATABASE_READ_REPLICA_URLS``, opening them on first use.
+    """
+    with _database_cache_lock:
+        for url in settings.DATABASE_READ_REPLICA_URLS:
+            if url not in _replica_cache:
+                _replica_cache[url] = open_read_replica(url, settings)
+        return [_replica_cache[url] for url in settings.DATABASE_READ_REPLICA_URLS]
+
+
+def use_read_replica(request: Request) -> None:
+    """
+    Send the queries of a request to a read replica, if any are configured.
+
+    Add to the ``dependencies`` of the heavy read endpoints,
+    which FastAPI resolves before the session.
+    """
+    request.state.use_read_replica = True
+
+
+def apply_query_budget(request: Request, settings: SettingsDep) -> None:
+    """
+    Apply the query budget of the matched route to a request
+
+    Routes without an entry in ``QUERY_BUDGET_ROUTE_SECONDS`` keep the ``QUERY_BUDGET_SECONDS`` default.
+    """
+    route = request.scope.get("route")
+    path = getattr(route, "path", "").removeprefix(settings.API_V1_STR)
+    set_budget_seconds(settings.QUERY_BUDGET_ROUTE_SECONDS.get(path, settings.QUERY_BUDGET_SECONDS))
+
+
+def _request_database_dependency(request: Request, settings: SettingsDep, database: DatabaseDep) -> Database:
+    """
+    Get the database to query for a request
+
+    Requests to endpoints that use `use_read_replica` are spread over the replicas in turn.
+    """
+    if getattr(request.state, "use_read_replica", False):
+        replicas = get_read_replicas(settings)
+        if replicas:
+            return replicas[next(_replica_counter) % len(replicas)]
+    return database
+
+
+RequestDatabaseDep = Annotated[Database, Depends(_request_database_dependency)]
+
+
+def get_database_session(database: RequestDatabaseDep) -> Generator[Session, None, None]:
     """
     Provide a session that lives for the duration of a request
 
@@ -57,7 +114,9 @@ def get_database_session(database: DatabaseDep) -> Generator[Session, None, None
 SessionDep = Annotated[Session, Depends(get_database_session)]
 
 
-def _get_reader_dependency(database: DatabaseDep, ref_config: REFConfigDep, session: SessionDep) -> Reader:
+def _get_reader_dependency(
+    database: RequestDatabaseDep, ref_config: REFConfigDep, session: SessionDep
+) -> Reader:
     """
     Get the results reader
     """
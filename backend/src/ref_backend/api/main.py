@@ -1,12 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from ref_backend.api.routes import aft, datasets, diagnostics, executions, explorer, results, utils
+from ref_backend.api.deps import apply_query_budget
+from ref_backend.api.routes import aft, datasets, diagnostics, executions, explorer, results, search, utils
 
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(apply_query_budget)])
 api_router.include_router(aft.router)
 api_router.include_router(datasets.router)
 api_router.include_router(diagnostics.router)
 api_router.include_router(executions.router)
 api_router.include_router(explorer.router)
 api_router.include_router(results.router)
+api_router.include_router(search.router)
 api_router.include_router(utils.router)
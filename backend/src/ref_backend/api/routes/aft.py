@@ -2,9 +2,12 @@ from fastapi import APIRouter, HTTPException
 from loguru import logger
 
 from ref_backend.core.aft import get_aft_diagnostic_by_id, get_aft_diagnostics_index
+from ref_backend.core.telemetry import TimedRoute
 from ref_backend.models import AFTDiagnosticDetail, AFTDiagnosticSummary
 
-router = APIRouter(prefix="/cmip7-aft-diagnostics", tags=["CMIP7 Assessment Fast Track (AFT)"])
+router = APIRouter(
+    prefix="/cmip7-aft-diagnostics", tags=["CMIP7 Assessment Fast Track (AFT)"], route_class=TimedRoute
+)
 
 
 @router.get("/", response_model=list[AFTDiagnosticSummary])
@@ -1,22 +1,30 @@
 import json
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from climate_ref import models
 from climate_ref.datasets import get_dataset_adapter
+from climate_ref.models.dataset import CMIP6Dataset
+from climate_ref.models.execution import execution_datasets
 from climate_ref.results import DatasetFilter
 from climate_ref.results.datasets import DatasetView, select_datasets
 from climate_ref_core.datasets import SourceDatasetType
-from ref_backend.api.deps import AppContextDep, ReaderDep, SessionDep
+from ref_backend.api.deps import AppContextDep, ReaderDep, SessionDep, SettingsDep, use_read_replica
+from ref_backend.core.counting import count_rows
+from ref_backend.core.dataset_index import resolve_dataset_ids
+from ref_backend.core.filter_utils import build_id_clause
+from ref_backend.core.search_index import build_name_contains_clause
+from ref_backend.core.telemetry import TimedRoute
 from ref_backend.models import (
     Collection,
     Dataset,
     ExecutionGroup,
 )
 
-router = APIRouter(prefix="/datasets", tags=["datasets"])
+router = APIRouter(prefix="/datasets", tags=["datasets"], route_class=TimedRoute)
 
 
 def _parse_facets(facets: str) -> dict[str, Any]:
@@ -36,9 +44,10 @@ def _parse_source_type(dataset_type: str) -> SourceDatasetType:
         raise HTTPException(status_code=400, detail=f"Unknown dataset type {dataset_type!r}") from None
 
 
-@router.get("/", name="list")
+@router.get("/", name="list", dependencies=[Depends(use_read_replica)])
 async def _list(  # noqa: PLR0913, PLR0917
     session: SessionDep,
+    settings: SettingsDep,
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     name_contains: str = Query(None, description="Filter datasets by name"),
@@ -69,18 +78,35 @@ async def _list(  # noqa: PLR0913, PLR0917
         # Retracted datasets stay visible: this is an inspection view, not a solve-time query.
         include_retracted=True,
     )
-    try:
-        statement = select_datasets(dataset_filter, latest_group_by=adapter.dataset_id_metadata)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from None
+    dataset_ids = None
+    if source_type == SourceDatasetType.CMIP6 and dataset_filter.facets:
+        # The facets are partition columns, so they are the same for every version of a dataset
+        # and the latest versions of the matches are the matches among the latest versions
+        dataset_ids = resolve_dataset_ids(session, settings, dataset_filter.facets, latest_only=True)
+
+    if dataset_ids is not None:
+        statement = (
+            select(CMIP6Dataset)
+            .where(build_id_clause(CMIP6Dataset.id, dataset_ids))
+            .order_by(CMIP6Dataset.updated_at.desc())
+        )
+    else:
+        try:
+            statement = select_datasets(dataset_filter, latest_group_by=adapter.dataset_id_metadata)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from None
 
     if name_contains:
-        statement = statement.where(models.Dataset.slug.ilike(f"%{name_contains}%"))
+        statement = statement.where(build_name_contains_clause(session, settings, "datasets", name_contains))
 
-    total_count = session.execute(select(func.count()).select_from(statement.subquery())).scalar_one()
+    total_count = count_rows(session, settings, statement)
     datasets = session.execute(statement.offset(offset).limit(limit)).scalars().unique().all()
 
-    return Collection(data=[Dataset.build(ds) for ds in datasets], total_count=total_count)
+    return Collection(
+        data=[Dataset.build(ds) for ds in datasets],
+        total_count=total_count.value,
+        total_count_exact=total_count.exact,
+    )
 
 
 @router.get("/{slug}", name="get")
@@ -99,7 +125,7 @@ async def get(
     return Dataset.build_from_view(dataset)
 
 
-@router.get("/{dataset_id}/executions")
+@router.get("/{dataset_id}/executions", dependencies=[Depends(use_read_replica)])
 async def executions(
     app_context: AppContextDep,
     dataset_id: int,
@@ -107,19 +133,35 @@ async def executions(
     limit: int = Query(10, ge=1, le=100),
 ) -> Collection[ExecutionGroup]:
     """
-    List the currently registered diagnostics
+    List the execution groups with an execution that used a dataset
     """
-    execution_groups_query = (
-        app_context.session.query(models.ExecutionGroup)
-        .join(models.ExecutionGroup.executions)
-        .join(models.Execution.datasets)
-        .filter(models.Dataset.id == dataset_id)
-        .distinct()
+    session = app_context.session
+    # A semi-join on the (indexed) dataset link table, so each group is found once without DISTINCT
+    group_ids = (
+        select(models.Execution.execution_group_id)
+        .join(execution_datasets, execution_datasets.c.execution_id == models.Execution.id)
+        .where(execution_datasets.c.dataset_id == dataset_id)
+    )
+    statement = (
+        select(models.ExecutionGroup)
+        .where(models.ExecutionGroup.id.in_(group_ids))
+        .order_by(models.ExecutionGroup.id)
     )
-    total_count = execution_groups_query.count()
-    _execution_groups = execution_groups_query.offset(offset).limit(limit).all()
+    total_count = count_rows(session, app_context.settings, statement)
+
+    executions = selectinload(models.ExecutionGroup.executions)
+    execution_groups = session.scalars(
+        statement.offset(offset)
+        .limit(limit)
+        .options(
+            executions.selectinload(models.Execution.datasets),
+            executions.selectinload(models.Execution.outputs),
+            selectinload(models.ExecutionGroup.diagnostic).selectinload(models.Diagnostic.provider),
+        )
+    ).all()
 
     return Collection(
-        data=[ExecutionGroup.build(eg, app_context) for eg in _execution_groups],
-        total_count=total_count,
+        data=ExecutionGroup.build_many(execution_groups, app_context),
+        total_count=total_count.value,
+        total_count_exact=total_count.exact,
     )
@@ -1,45 +1,59 @@
+from collections.abc import Generator, Sequence
+from functools import partial
 from typing import Literal
 
-from fastapi import APIRouter, HTTPException, Query, Request
-from sqlalchemy import Integer, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import StreamingResponse
 
 from climate_ref import models
-from climate_ref.models.dataset import CMIP6Dataset
-from climate_ref.results import MetricValueFilter
-from ref_backend.api.deps import AppContextDep
-from ref_backend.core.filter_utils import build_filter_clause
+from climate_ref.models.execution import ResultOutputType
+from ref_backend.api.deps import AppContext, AppContextDep, use_read_replica
+from ref_backend.core.counting import count_rows
+from ref_backend.core.execution_filters import parse_dataset_filters, select_diagnostic_executions
+from ref_backend.core.filter_utils import build_id_clause
+from ref_backend.core.latest_executions import get_latest_execution_ids
 from ref_backend.core.metric_values import (
     MetricValueType,
     parse_id_list,
 )
+from ref_backend.core.output_catalog import MatchMode, get_output_catalog
 from ref_backend.core.reader_values import (
+    diagnostic_metric_filter,
+    fetch_metric_value_batch,
     fetch_metric_values,
+    is_diagnostic_hidden,
     parse_dimension_filters,
 )
+from ref_backend.core.telemetry import TimedRoute
 from ref_backend.models import (
     Collection,
+    CursorCollection,
+    DiagnosticOutput,
     DiagnosticSummary,
     Execution,
     ExecutionGroup,
+    MetricValueBatchResult,
     MetricValueCollection,
     MetricValueFacetSummary,
+    MetricValueQuery,
 )
 
-router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"], route_class=TimedRoute)
+
+# Number of execution groups loaded at a time when streaming
+EXECUTION_GROUP_STREAM_BATCH_SIZE = 100
 
 
 async def _get_diagnostic(
     app_context: AppContextDep, provider_slug: str, diagnostic_slug: str
 ) -> models.Diagnostic:
-    if app_context.settings.DIAGNOSTIC_PROVIDERS:
-        if provider_slug not in app_context.settings.DIAGNOSTIC_PROVIDERS:
-            raise HTTPException(status_code=404, detail="Diagnostic not found")
-
-    if app_context.settings.DIAGNOSTIC_EXCLUDE:
-        if diagnostic_slug in app_context.settings.DIAGNOSTIC_EXCLUDE:
-            raise HTTPException(status_code=404, detail="Diagnostic not found")
+    if is_diagnostic_hidden(app_context.settings, provider_slug, diagnostic_slug):
+        raise HTTPException(status_code=404, detail="Diagnostic not found")
 
     diagnostic = (
         app_context.session.query(models.Diagnostic)
@@ -55,7 +69,7 @@ async def _get_diagnostic(
     return diagnostic
 
 
-@router.get("/", name="list")
+@router.get("/", name="list", dependencies=[Depends(use_read_replica)])
 async def _list(app_context: AppContextDep) -> Collection[DiagnosticSummary]:
     """
     List the currently registered diagnostics
@@ -70,105 +84,12 @@ async def _list(app_context: AppContextDep) -> Collection[DiagnosticSummary]:
             models.Diagnostic.slug.notin_(app_context.settings.DIAGNOSTIC_EXCLUDE)
         )
 
-    diagnostics = diagnostics_query.all()
-
-    if not diagnostics:
-        return Collection(data=[])
-
-    # Batch fetch all diagnostic statistics to avoid N+1 queries
-    diagnostic_ids = [d.id for d in diagnostics]
-
-    # Check for scalar values existence
-    scalar_values_exist = (
-        app_context.session.query(models.ExecutionGroup.diagnostic_id)
-        .join(models.Execution)
-        .join(models.ScalarMetricValue)
-        .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
-        .distinct()
-        .all()
-    )
-    scalar_diagnostic_ids = {row[0] for row in scalar_values_exist}
-
-    # Check for series values existence
-    series_values_exist = (
-        app_context.session.query(models.ExecutionGroup.diagnostic_id)
-        .join(models.Execution)
-        .join(models.SeriesMetricValue)
-        .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
-        .distinct()
-        .all()
-    )
-    series_diagnostic_ids = {row[0] for row in series_values_exist}
-
-    # Count executions per diagnostic
-    execution_counts = (
-        app_context.session.query(
-            models.ExecutionGroup.diagnostic_id,
-            func.count(models.Execution.id).label("total_count"),
-            func.sum(func.cast(models.Execution.successful, Integer)).label("successful_count"),
-        )
-        .join(models.Execution)
-        .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
-        .group_by(models.ExecutionGroup.diagnostic_id)
-        .all()
-    )
-    execution_stats = {row[0]: {"total": row[1], "successful": row[2] or 0} for row in execution_counts}
-
-    # Count execution groups per diagnostic
-    execution_group_counts = (
-        app_context.session.query(
-            models.ExecutionGroup.diagnostic_id, func.count(models.ExecutionGroup.id).label("group_count")
-        )
-        .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
-        .group_by(models.ExecutionGroup.diagnostic_id)
-        .all()
-    )
-    group_counts = {row[0]: row[1] for row in execution_group_counts}
-
-    # Count successful execution groups (latest execution successful)
-    # Subquery: latest execution id per group
-    latest_exec_per_group = (
-        app_context.session.query(
-            models.Execution.execution_group_id.label("egid"),
-            func.max(models.Execution.id).label("latest_exec_id"),
-        )
-        .join(models.ExecutionGroup, models.Execution.execution_group_id == models.ExecutionGroup.id)
-        .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
-        .group_by(models.Execution.execution_group_id)
-        .subquery()
-    )
+    diagnostics = diagnostics_query.options(selectinload(models.Diagnostic.provider)).all()
 
-    # Join back to executions to check success of latest
-    successful_group_counts = (
-        app_context.session.query(
-            models.ExecutionGroup.diagnostic_id,
-            func.count(latest_exec_per_group.c.egid).label("successful_count"),
-        )
-        .join(models.Execution, models.Execution.id == latest_exec_per_group.c.latest_exec_id)
-        .join(models.ExecutionGroup, models.ExecutionGroup.id == latest_exec_per_group.c.egid)
-        .filter(models.Execution.successful.is_(True))
-        .group_by(models.ExecutionGroup.diagnostic_id)
-        .all()
-    )
-    successful_group_counts_dict = {row[0]: row[1] for row in successful_group_counts}
+    return Collection(data=DiagnosticSummary.build_many(diagnostics, app_context))
 
-    return Collection(
-        data=[
-            DiagnosticSummary.build_with_stats(
-                m,
-                app_context,
-                has_scalar_values=m.id in scalar_diagnostic_ids,
-                has_series_values=m.id in series_diagnostic_ids,
-                execution_stats=execution_stats.get(m.id, {"total": 0, "successful": 0}),
-                execution_group_count=group_counts.get(m.id, 0),
-                successful_execution_group_count=successful_group_counts_dict.get(m.id, 0),
-            )
-            for m in diagnostics
-        ]
-    )
 
-
-@router.get("/facets", name="facets")
+@router.get("/facets", name="facets", dependencies=[Depends(use_read_replica)])
 async def facets(app_context: AppContextDep) -> MetricValueFacetSummary:
     """
     Query the unique dimensions and metrics for all diagnostics (both scalar and series)
@@ -204,6 +125,65 @@ async def facets(app_context: AppContextDep) -> MetricValueFacetSummary:
     )
 
 
+_METRIC_VALUE_QUERIES = TypeAdapter(list[MetricValueQuery])
+
+
+def _fetch_batch(app_context: AppContext, queries: list[MetricValueQuery]) -> list[MetricValueBatchResult]:
+    if len(queries) > app_context.settings.VALUES_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {app_context.settings.VALUES_BATCH_MAX_QUERIES} queries can be batched",
+        )
+    return fetch_metric_value_batch(app_context, queries)
+
+
+@router.get(
+    "/values",
+    name="values_batch",
+    response_model=list[MetricValueBatchResult],
+    dependencies=[Depends(use_read_replica)],
+)
+async def list_metric_values_batch(
+    app_context: AppContextDep,
+    queries: str = Query(..., description="JSON list of metric value queries (see MetricValueQuery)"),
+) -> list[MetricValueBatchResult]:
+    """
+    Get the metric values of several diagnostics in one request
+
+    This serves all the cards of an explorer collection at once.
+    Each query takes the parameters of the diagnostic values endpoint,
+    and the results are returned in the order of the queries.
+    The diagnostics are looked up together, and queries that differ only in their paging,
+    such as the facet and values queries of a card, share a single read of the values.
+
+    A GET keeps ETag revalidation and the cache of compressed responses,
+    but many servers and proxies limit URLs to 8 KB:
+    larger batches can be sent in the body of a POST instead.
+    """
+    try:
+        parsed = _METRIC_VALUE_QUERIES.validate_json(queries)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False, include_context=False)) from None
+    return _fetch_batch(app_context, parsed)
+
+
+@router.post(
+    "/values",
+    name="values_batch_post",
+    response_model=list[MetricValueBatchResult],
+    dependencies=[Depends(use_read_replica)],
+)
+async def post_metric_values_batch(
+    app_context: AppContextDep, queries: list[MetricValueQuery]
+) -> list[MetricValueBatchResult]:
+    """
+    Get the metric values of several diagnostics in one request, with the queries in the body
+
+    This is the same as the GET, for batches too large to send in a URL.
+    """
+    return _fetch_batch(app_context, queries)
+
+
 @router.get("/{provider_slug}/{diagnostic_slug}")
 async def get(app_context: AppContextDep, provider_slug: str, diagnostic_slug: str) -> DiagnosticSummary:
     """
@@ -214,74 +194,258 @@ async def get(app_context: AppContextDep, provider_slug: str, diagnostic_slug: s
     return DiagnosticSummary.build(diagnostic, app_context)
 
 
-@router.get("/{provider_slug}/{diagnostic_slug}/execution_groups")
-async def list_execution_groups(
-    app_context: AppContextDep, provider_slug: str, diagnostic_slug: str
-) -> Collection[ExecutionGroup]:
+def _parse_cursor(cursor: str | None) -> int | None:
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor!r}") from None
+
+
+def _latest_executions(
+    app_context: AppContext, group_ids: Sequence[int], include_outputs: bool
+) -> dict[int, models.Execution]:
+    """Load the latest execution of each execution group, keyed by group id."""
+    execution_ids = get_latest_execution_ids(app_context.session, app_context.settings, group_ids)
+    if not execution_ids:
+        return {}
+    statement = (
+        select(models.Execution)
+        .where(build_id_clause(models.Execution.id, list(execution_ids.values())))
+        .options(selectinload(models.Execution.datasets))
+    )
+    if include_outputs:
+        statement = statement.options(selectinload(models.Execution.outputs))
+    return {execution.execution_group_id: execution for execution in app_context.session.scalars(statement)}
+
+
+def _load_execution_groups(  # noqa: PLR0913
+    app_context: AppContext,
+    diagnostic_id: int,
+    *,
+    after_id: int | None,
+    limit: int | None,
+    include_outputs: bool,
+    include_history: bool,
+) -> list[tuple[models.ExecutionGroup, list[models.Execution]]]:
     """
-    Fetch execution groups for a diagnostic.
+    Load a diagnostic's execution groups in id order, along with the executions to report for each.
+
+    Only the relationships needed for the requested projection are loaded.
+    """
+    session = app_context.session
+    statement = (
+        select(models.ExecutionGroup)
+        .where(models.ExecutionGroup.diagnostic_id == diagnostic_id)
+        .order_by(models.ExecutionGroup.id)
+    )
+    if after_id is not None:
+        statement = statement.where(models.ExecutionGroup.id > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    if include_history:
+        # Eager-load relationships to avoid per-item queries
+        executions = selectinload(models.ExecutionGroup.executions)
+        statement = statement.options(executions.selectinload(models.Execution.datasets))
+        if include_outputs:
+            statement = statement.options(executions.selectinload(models.Execution.outputs))
+        return [(group, list(group.executions)) for group in session.scalars(statement)]
+
+    groups = session.scalars(statement).all()
+    latest = _latest_executions(app_context, [group.id for group in groups], include_outputs)
+    return [(group, [latest[group.id]] if group.id in latest else []) for group in groups]
+
+
+@router.get(
+    "/{provider_slug}/{diagnostic_slug}/execution_groups",
+    response_model=CursorCollection[ExecutionGroup],
+    dependencies=[Depends(use_read_replica)],
+)
+async def list_execution_groups(  # noqa: PLR0913, PLR0917
+    app_context: AppContextDep,
+    provider_slug: str,
+    diagnostic_slug: str,
+    limit: int | None = Query(
+        None, ge=1, le=1000, description="Maximum number of execution groups to return (default all)"
+    ),
+    cursor: str | None = Query(None, description="`next_cursor` of the previous page"),
+    include_outputs: bool = Query(True, description="Include the outputs of each execution"),
+    include_history: bool = Query(
+        True, description="Include every execution of each group, rather than only the latest"
+    ),
+    format: Literal["json", "ndjson"] = Query("json", description="Return format"),
+) -> CursorCollection[ExecutionGroup] | StreamingResponse:
+    """
+    Fetch execution groups for a diagnostic, ordered by id.
+
+    - `limit`/`cursor`: Page through the groups by passing `next_cursor` back as `cursor`
+    - `include_outputs`/`include_history`: Omit the parts of each group that are not needed
+    - `format`: 'json' (default), or 'ndjson' to stream one group per line
+      (the `limit` and `cursor` apply to the stream as a whole)
     """
     diagnostic = await _get_diagnostic(app_context, provider_slug, diagnostic_slug)
+    after_id = _parse_cursor(cursor)
+    session = app_context.session
 
     # Precompute the diagnostic summary once (shared across all groups)
     diagnostic_summary = DiagnosticSummary.build(diagnostic, app_context)
 
-    # Eager-load relationships to avoid per-item queries
-    execution_groups = (
-        app_context.session.query(models.ExecutionGroup)
-        .options(
-            selectinload(models.ExecutionGroup.executions).selectinload(models.Execution.outputs),
-            selectinload(models.ExecutionGroup.executions).selectinload(models.Execution.datasets),
-            selectinload(models.ExecutionGroup.diagnostic),
+    def build(group: models.ExecutionGroup, executions: list[models.Execution]) -> ExecutionGroup:
+        return ExecutionGroup.build(
+            group,
+            app_context,
+            diagnostic_summary=diagnostic_summary,
+            executions=executions,
+            include_outputs=include_outputs,
         )
-        .filter(models.ExecutionGroup.diagnostic_id == diagnostic.id)
-        .all()
+
+    if format == "ndjson":
+
+        def generate_ndjson() -> Generator[str]:
+            last_id, remaining = after_id, limit
+            while remaining is None or remaining > 0:
+                batch_size = EXECUTION_GROUP_STREAM_BATCH_SIZE
+                if remaining is not None:
+                    batch_size = min(batch_size, remaining)
+                    remaining -= batch_size
+                page = _load_execution_groups(
+                    app_context,
+                    diagnostic.id,
+                    after_id=last_id,
+                    limit=batch_size,
+                    include_outputs=include_outputs,
+                    include_history=include_history,
+                )
+                if not page:
+                    return
+                yield "".join(build(group, executions).model_dump_json() + "\n" for group, executions in page)
+                last_id = page[-1][0].id
+                # Release the batch so memory stays bounded however many groups there are
+                session.expunge_all()
+
+        return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+    total_count = count_rows(
+        session,
+        app_context.settings,
+        select(models.ExecutionGroup.id).where(models.ExecutionGroup.diagnostic_id == diagnostic.id),
     )
+    page = _load_execution_groups(
+        app_context,
+        diagnostic.id,
+        after_id=after_id,
+        limit=limit,
+        include_outputs=include_outputs,
+        include_history=include_history,
+    )
+    next_cursor = str(page[-1][0].id) if limit is not None and len(page) == limit else None
 
-    return Collection(
-        data=[
-            ExecutionGroup.build(e, app_context, diagnostic_summary=diagnostic_summary)
-            for e in execution_groups
-        ]
+    return CursorCollection(
+        data=[build(group, executions) for group, executions in page],
+        total_count=total_count.value,
+        total_count_exact=total_count.exact,
+        next_cursor=next_cursor,
     )
 
 
 @router.get(
     "/{provider_slug}/{diagnostic_slug}/executions",
     response_model=Collection[Execution],
+    dependencies=[Depends(use_read_replica)],
 )
-async def list_executions(
+async def list_executions(  # noqa: PLR0913, PLR0917
     app_context: AppContextDep,
     provider_slug: str,
     diagnostic_slug: str,
     request: Request,
+    offset: int = Query(0, ge=0, description="Number of executions to skip"),
+    limit: int | None = Query(
+        None, ge=1, le=1000, description="Maximum number of executions to return (default all)"
+    ),
 ) -> Collection[Execution]:
     """
     Fetch executions for a specific diagnostic, with arbitrary filters on the dataset.
 
     e.g. `?source_id=MIROC6&experiment_id=ssp585`
+
+    An execution matches when each filter is matched by at least one of its datasets.
+    Executions are ordered by id and each is returned once.
     """
     diagnostic = await _get_diagnostic(app_context, provider_slug, diagnostic_slug)
+    session = app_context.session
 
-    executions_query = (
-        app_context.session.query(models.Execution)
-        .join(CMIP6Dataset, models.Execution.datasets)
-        .join(models.ExecutionGroup)
-        .filter(models.ExecutionGroup.diagnostic_id == diagnostic.id)
+    statement = select_diagnostic_executions(
+        app_context, diagnostic.id, parse_dataset_filters(request.query_params)
     )
+    total_count = count_rows(session, app_context.settings, statement)
 
-    query_params = request.query_params
-    for key, value in query_params.items():
-        if hasattr(CMIP6Dataset, key):
-            col = getattr(CMIP6Dataset, key)
-            executions_query = executions_query.filter(build_filter_clause(col, value))
+    page = statement.offset(offset).options(
+        selectinload(models.Execution.outputs), selectinload(models.Execution.datasets)
+    )
+    if limit is not None:
+        page = page.limit(limit)
+    executions = session.scalars(page).all()
 
-    executions = executions_query.all()
+    return Collection(
+        data=[Execution.build(e, app_context) for e in executions],
+        total_count=total_count.value,
+        total_count_exact=total_count.exact,
+    )
 
-    return Collection(data=[Execution.build(e, app_context) for e in executions])
 
+@router.get(
+    "/{provider_slug}/{diagnostic_slug}/outputs",
+    response_model=Collection[DiagnosticOutput],
+    dependencies=[Depends(use_read_replica)],
+)
+async def list_outputs(  # noqa: PLR0913, PLR0917
+    app_context: AppContextDep,
+    provider_slug: str,
+    diagnostic_slug: str,
+    filter: str | None = Query(None, description="Pattern matched against the filename and description"),
+    match: MatchMode = Query("regex", description="Whether the filter is a regular expression or a glob"),
+    output_type: ResultOutputType | None = Query(None, description="Only return outputs of this type"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+) -> Collection[DiagnosticOutput]:
+    """
+    List the outputs of the latest execution of each of the diagnostic's execution groups
 
-@router.get("/{provider_slug}/{diagnostic_slug}/values", response_model=MetricValueCollection)
+    Filters are case-insensitive.
+    A regular expression can match any part of the filename or description, as in the figure galleries,
+    while a glob, such as `*/plots/*.png`, must match all of it.
+    Regular expressions may repeat at most two wildcards and may not nest repetitions,
+    and a filter that takes too long to match is rejected.
+    """
+    diagnostic = await _get_diagnostic(app_context, provider_slug, diagnostic_slug)
+    catalog = get_output_catalog(app_context, diagnostic.id)
+    try:
+        # Match off the event loop, as a filter can take a while on a large catalog
+        entries = await run_in_threadpool(
+            partial(
+                catalog.match,
+                filter,
+                mode=match,
+                output_type=output_type,
+                time_budget_seconds=app_context.settings.OUTPUT_FILTER_TIME_BUDGET_SECONDS,
+            )
+        )
+    except (ValueError, TimeoutError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+
+    return Collection(
+        data=[DiagnosticOutput.build(entry, app_context) for entry in entries[offset : offset + limit]],
+        total_count=len(entries),
+    )
+
+
+@router.get(
+    "/{provider_slug}/{diagnostic_slug}/values",
+    response_model=MetricValueCollection,
+    dependencies=[Depends(use_read_replica)],
+)
 async def list_metric_values(  # noqa: PLR0913, PLR0917
     app_context: AppContextDep,
     provider_slug: str,
@@ -309,17 +473,12 @@ async def list_metric_values(  # noqa: PLR0913, PLR0917
     # Validates the provider/diagnostic exist and are not excluded (raises 404 otherwise).
     await _get_diagnostic(app_context, provider_slug, diagnostic_slug)
 
-    # Scope to this diagnostic/provider via exact-match slugs. ``promoted_only`` keeps only the
-    # promoted diagnostic version, so values from superseded versions are hidden. Exposing
-    # previous versions needs a separate design (TODO). Retracted executions are still included.
-    metric_filter = MetricValueFilter(
-        diagnostic_slug=diagnostic_slug,
-        provider_slug=provider_slug,
-        dimensions=parse_dimension_filters(request.query_params),
+    metric_filter = diagnostic_metric_filter(
+        provider_slug,
+        diagnostic_slug,
+        parse_dimension_filters(request.query_params),
         isolate_ids=parse_id_list(isolate_ids) if isolate_ids else None,
         exclude_ids=parse_id_list(exclude_ids) if exclude_ids else None,
-        promoted_only=True,
-        include_retracted=True,
     )
 
     return fetch_metric_values(
@@ -1,24 +1,29 @@
-import mimetypes
-import os
 import tarfile
 import tempfile
 from collections.abc import Generator
-from pathlib import Path
 from typing import Literal
 
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from loguru import logger
-from sqlalchemy import and_, exists, func, select
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, exists, select
+from sqlalchemy.orm import aliased, selectinload
 from starlette.responses import StreamingResponse
 
 from climate_ref import models
 from climate_ref.models.dataset import CMIP6Dataset, DatasetFile
+from climate_ref.models.execution import execution_datasets as execution_dataset_links
 from climate_ref.results import MetricValueFilter
 from climate_ref_core.pycmec.metric import CMECMetric
-from ref_backend.api.deps import AppContextDep
-from ref_backend.core.file_handling import file_iterator, resolve_artifact
-from ref_backend.core.filter_utils import build_filter_clause
+from ref_backend.api.deps import AppContext, AppContextDep, use_read_replica
+from ref_backend.core.counting import count_rows
+from ref_backend.core.dataset_index import resolve_dataset_ids
+from ref_backend.core.file_handling import file_iterator, get_file_metadata_cache, resolve_artifact
+from ref_backend.core.filter_utils import build_filter_clause, build_id_clause, parse_filter_values
+from ref_backend.core.latest_executions import (
+    build_latest_successful_clause,
+    count_successful_groups,
+    get_latest_execution_id,
+)
 from ref_backend.core.metric_values import (
     MetricValueType,
     parse_id_list,
@@ -27,6 +32,8 @@ from ref_backend.core.reader_values import (
     fetch_metric_values,
     parse_dimension_filters,
 )
+from ref_backend.core.search_index import build_name_contains_clause
+from ref_backend.core.telemetry import TimedRoute, timed
 from ref_backend.models import (
     Collection,
     Dataset,
@@ -36,7 +43,7 @@ from ref_backend.models import (
     MetricValueCollection,
 )
 
-router = APIRouter(prefix="/executions", tags=["executions"])
+router = APIRouter(prefix="/executions", tags=["executions"], route_class=TimedRoute)
 
 
 def _parse_int_id(value: str, resource: str) -> int:
@@ -46,7 +53,7 @@ def _parse_int_id(value: str, resource: str) -> int:
         raise HTTPException(status_code=404, detail=f"{resource} not found") from None
 
 
-@router.get("/statistics")
+@router.get("/statistics", dependencies=[Depends(use_read_replica)])
 async def get_execution_statistics(app_context: AppContextDep) -> ExecutionStats:
     """
     Get execution statistics for the dashboard.
@@ -60,28 +67,7 @@ async def get_execution_statistics(app_context: AppContextDep) -> ExecutionStats
     total_execution_groups = session.query(models.ExecutionGroup).count()
 
     # Successful execution groups (latest execution is successful)
-    latest_execution_subquery = (
-        session.query(
-            models.Execution.execution_group_id.label("egid"),
-            func.max(models.Execution.id).label("max_id"),
-        )
-        .group_by(models.Execution.execution_group_id)
-        .subquery()
-    )
-
-    successful_execution_groups = (
-        session.query(models.ExecutionGroup)
-        .join(
-            latest_execution_subquery,
-            models.ExecutionGroup.id == latest_execution_subquery.c.egid,
-        )
-        .join(
-            models.Execution,
-            models.Execution.id == latest_execution_subquery.c.max_id,
-        )
-        .filter(models.Execution.successful.is_(True))
-        .count()
-    )
+    successful_execution_groups = sum(count_successful_groups(session, app_context.settings).values())
 
     # Failed execution groups (total - successful)
     failed_execution_groups = total_execution_groups - successful_execution_groups
@@ -104,7 +90,7 @@ async def get_execution_statistics(app_context: AppContextDep) -> ExecutionStats
     )
 
 
-@router.get("/")
+@router.get("/", dependencies=[Depends(use_read_replica)])
 async def list_recent_execution_groups(  # noqa: PLR0913, PLR0917
     app_context: AppContextDep,
     limit: int = 10,
@@ -131,72 +117,73 @@ async def list_recent_execution_groups(  # noqa: PLR0913, PLR0917
     query = session.query(models.ExecutionGroup).join(models.ExecutionGroup.diagnostic)
 
     if diagnostic_name_contains:
-        query = query.filter(models.Diagnostic.name.ilike(f"%{diagnostic_name_contains}%"))
+        query = query.filter(
+            build_name_contains_clause(session, app_context.settings, "diagnostics", diagnostic_name_contains)
+        )
     if provider_name_contains:
         query = query.join(models.Diagnostic.provider).filter(
-            models.Provider.name.ilike(f"%{provider_name_contains}%")
+            build_name_contains_clause(session, app_context.settings, "providers", provider_name_contains)
         )
     if dirty is not None:
         query = query.filter(models.ExecutionGroup.dirty == dirty)
 
-    # Filter by latest execution successful flag (joins to a subquery of latest executions)
+    # Filter by latest execution successful flag
     if successful is not None:
-        latest_execution_subquery = (
-            session.query(
-                models.Execution.execution_group_id.label("egid"),
-                func.max(models.Execution.id).label("max_id"),
-            )
-            .group_by(models.Execution.execution_group_id)
-            .subquery()
-        )
-
-        query = (
-            query.join(
-                latest_execution_subquery,
-                models.ExecutionGroup.id == latest_execution_subquery.c.egid,
-            )
-            .join(
-                models.Execution,
-                models.Execution.id == latest_execution_subquery.c.max_id,
-            )
-            .filter(models.Execution.successful == successful)
-        )
+        query = query.filter(build_latest_successful_clause(session, app_context.settings, successful))
 
     # Filter by source_id using a correlated EXISTS to avoid DISTINCT across joins
     if source_id and CMIP6Dataset is not None:
-        EG = aliased(models.ExecutionGroup)
         E = aliased(models.Execution)
-        DS = aliased(CMIP6Dataset)
-
-        # Build a SQLAlchemy Core selectable for EXISTS (required by typing/runtime)
-        source_condition = build_filter_clause(DS.source_id, source_id)
-        exists_select = (
-            select(E.id)
-            .join(EG, E.execution_group_id == EG.id)
-            .join(DS, E.datasets)
-            .where(and_(EG.id == models.ExecutionGroup.id, source_condition))
+        dataset_ids = resolve_dataset_ids(
+            session, app_context.settings, {"source_id": parse_filter_values(source_id)}
         )
+
+        if dataset_ids is not None:
+            # The matching datasets are known, so only the link table needs to be probed
+            exists_select = (
+                select(E.id)
+                .join(execution_dataset_links, execution_dataset_links.c.execution_id == E.id)
+                .where(
+                    and_(
+                        E.execution_group_id == models.ExecutionGroup.id,
+                        build_id_clause(execution_dataset_links.c.dataset_id, dataset_ids),
+                    )
+                )
+            )
+        else:
+            EG = aliased(models.ExecutionGroup)
+            DS = aliased(CMIP6Dataset)
+
+            # Build a SQLAlchemy Core selectable for EXISTS (required by typing/runtime)
+            source_condition = build_filter_clause(DS.source_id, source_id)
+            exists_select = (
+                select(E.id)
+                .join(EG, E.execution_group_id == EG.id)
+                .join(DS, E.datasets)
+                .where(and_(EG.id == models.ExecutionGroup.id, source_condition))
+            )
         query = query.filter(exists(exists_select))
 
-    total_count = query.count()
+    total_count = count_rows(session, app_context.settings, query)
 
+    # Eager-load relationships to avoid per-group queries
+    executions = selectinload(models.ExecutionGroup.executions)
     execution_groups = (
-        query.order_by(models.ExecutionGroup.updated_at.desc()).limit(limit).offset(offset).all()
+        query.order_by(models.ExecutionGroup.updated_at.desc())
+        .limit(limit)
+        .offset(offset)
+        .options(
+            executions.selectinload(models.Execution.datasets),
+            executions.selectinload(models.Execution.outputs),
+            selectinload(models.ExecutionGroup.diagnostic).selectinload(models.Diagnostic.provider),
+        )
+        .all()
     )
 
-    data = []
-    for eg in execution_groups:
-        try:
-            # Eagerly load executions to avoid lazy loading during serialization
-            eg.executions
-            data.append(ExecutionGroup.build(eg, app_context))
-        except Exception as e:
-            logger.error(f"Error building execution group ID {eg.id}: {e}")
-            continue
-
     return Collection(
-        total_count=total_count,
-        data=data,
+        total_count=total_count.value,
+        total_count_exact=total_count.exact,
+        data=ExecutionGroup.build_many(execution_groups, app_context, skip_failures=True),
     )
 
 
@@ -214,22 +201,20 @@ async def get(app_context: AppContextDep, group_id: str) -> ExecutionGroup:
     return ExecutionGroup.build(execution_group, app_context)
 
 
-async def _get_execution(group_id: str, execution_id: str | None, session: Session) -> models.Execution:
+async def _get_execution(
+    group_id: str, execution_id: str | None, app_context: AppContext
+) -> models.Execution:
+    session = app_context.session
     group_id_int = _parse_int_id(group_id, "Execution group")
 
+    execution: models.Execution | None = None
     if execution_id is not None:
-        execution: models.Execution | None = session.query(models.Execution).get(
-            _parse_int_id(execution_id, "Execution")
-        )
+        execution = session.get(models.Execution, _parse_int_id(execution_id, "Execution"))
     else:
-        # Fetch only the latest execution for the group without loading the full collection
-        execution = (
-            session.query(models.Execution)
-            .filter(models.Execution.execution_group_id == group_id_int)
-            .order_by(models.Execution.id.desc())
-            .limit(1)
-            .one_or_none()
-        )
+        # Look up only the latest execution for the group without loading the full collection
+        latest_id = get_latest_execution_id(session, app_context.settings, group_id_int)
+        if latest_id is not None:
+            execution = session.get(models.Execution, latest_id)
 
     if not execution or not execution.execution_group_id == group_id_int:
         raise HTTPException(status_code=404, detail="Result not found")
@@ -247,7 +232,7 @@ async def execution(
 
     Gets the latest result if no execution_id is provided
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
 
     return Execution.build(execution, app_context)
 
@@ -259,7 +244,7 @@ async def execution_datasets(
     """
     Query the datasets that were used for a specific execution
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
 
     return Collection(data=[Dataset.build(dataset) for dataset in execution.datasets])
 
@@ -273,18 +258,20 @@ async def execution_logs(
     """
     Fetch the logs for an execution result
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
 
-    file_path = resolve_artifact(app_context.reader.artifacts.log_file, execution.output_fragment)
-    mime_type, _encoding = mimetypes.guess_type(file_path)
+    artifacts = app_context.reader.artifacts
+    output_directory = resolve_artifact(artifacts.output_directory, execution.output_fragment)
+    file_path = resolve_artifact(artifacts.log_file, execution.output_fragment)
+    file_info = get_file_metadata_cache(app_context.settings).stat(file_path, prefetch=output_directory)
 
-    if not file_path.exists():
+    if file_info is None:
         logger.warning(f"Log file not found: {file_path}")
         raise HTTPException(status_code=404, detail="Log file not found")
 
     return StreamingResponse(
         file_iterator(str(file_path)),
-        media_type=mime_type,
+        media_type=file_info.mime_type,
         headers={"Content-Disposition": f"attachment; filename=execution_result_{execution_id}.log"},
     )
 
@@ -298,20 +285,23 @@ async def metric_bundle(
     """
     Fetch a result using the slug
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
 
-    file_path = resolve_artifact(
-        app_context.reader.artifacts.output_file, execution.output_fragment, "diagnostic.json"
-    )
+    artifacts = app_context.reader.artifacts
+    output_directory = resolve_artifact(artifacts.output_directory, execution.output_fragment)
+    file_path = resolve_artifact(artifacts.output_file, execution.output_fragment, "diagnostic.json")
 
-    if not file_path.exists():
+    if get_file_metadata_cache(app_context.settings).stat(file_path, prefetch=output_directory) is None:
         logger.warning(f"Metric bundle not found: {file_path}")
         raise HTTPException(status_code=404, detail="Metrics bundle not found")
 
-    return CMECMetric.load_from_json(file_path)
+    with timed("file"):
+        return CMECMetric.load_from_json(file_path)
 
 
-@router.get("/{group_id}/values", response_model=MetricValueCollection)
+@router.get(
+    "/{group_id}/values", response_model=MetricValueCollection, dependencies=[Depends(use_read_replica)]
+)
 async def list_metric_values(  # noqa: PLR0913, PLR0917
     app_context: AppContextDep,
     request: Request,
@@ -336,7 +326,7 @@ async def list_metric_values(  # noqa: PLR0913, PLR0917
     - `offset`: Number of items to skip (default 0)
     - `limit`: Maximum number of items to return (default 50, max 500)
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
 
     # Restrict to the selected execution's values; ``_get_execution`` already resolves the
     # latest execution when no ``execution_id`` is supplied. ``promoted_only`` keeps only the
@@ -375,10 +365,11 @@ async def execution_archive(
 
     The archive is created on-the-fly and streamed directly to the client.
     """
-    execution = await _get_execution(group_id, execution_id, app_context.session)
+    execution = await _get_execution(group_id, execution_id, app_context)
     result_path = resolve_artifact(app_context.reader.artifacts.output_directory, execution.output_fragment)
+    files = get_file_metadata_cache(app_context.settings).listing(result_path)
 
-    if not result_path.exists():
+    if files is None:
         raise HTTPException(status_code=404, detail="Execution output not found")
 
     # This is an arbitrary value as a placeholder
@@ -389,11 +380,12 @@ async def execution_archive(
         with tempfile.NamedTemporaryFile(delete=True) as temp_tar:
             # Open the tar file in write mode with gzip compression
             with tarfile.open(temp_tar.name, mode="w:gz") as tar:
-                for root, _, files in os.walk(result_path):
-                    for file in files:
-                        file_path = Path(root) / file
-                        arcname = str(file_path.relative_to(result_path))
-                        tar.add(file_path, arcname=arcname)
+                for file in files:
+                    # The listing may be cached, so a file can have been removed since
+                    try:
+                        tar.add(file.path, arcname=str(file.path.relative_to(result_path)))
+                    except FileNotFoundError:
+                        logger.warning(f"Skipping {file.path} in the archive of execution {execution.id}")
 
             # Read and stream the tar file in chunks
             with open(temp_tar.name, "rb") as f:
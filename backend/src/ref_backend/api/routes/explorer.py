@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
+from ref_backend.api.deps import AppContextDep, use_read_replica
 from ref_backend.core.collections import (
     AFTCollectionDetail,
     AFTCollectionSummary,
@@ -10,8 +11,10 @@ from ref_backend.core.collections import (
     get_theme_by_slug,
     get_theme_summaries,
 )
+from ref_backend.core.explorer_cards import ExplorerCollectionCards, get_collection_cards
+from ref_backend.core.telemetry import TimedRoute
 
-router = APIRouter(prefix="/explorer", tags=["Explorer"])
+router = APIRouter(prefix="/explorer", tags=["Explorer"], route_class=TimedRoute)
 
 
 @router.get("/collections/", response_model=list[AFTCollectionSummary])
@@ -27,6 +30,26 @@ async def get_collection(collection_id: str) -> AFTCollectionDetail:
     return result
 
 
+@router.get(
+    "/collections/{collection_id}/cards",
+    response_model=ExplorerCollectionCards,
+    dependencies=[Depends(use_read_replica)],
+)
+async def get_collection_cards_data(
+    app_context: AppContextDep, collection_id: str
+) -> ExplorerCollectionCards:
+    """
+    Get the data shown by every card of a collection
+
+    The values, filter control options and figures of the cards are precomputed together,
+    and reused until new executions are written.
+    """
+    collection = get_collection_by_id(collection_id)
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Collection '{collection_id}' not found")
+    return get_collection_cards(app_context, collection)
+
+
 @router.get("/themes/", response_model=list[ThemeSummary])
 async def list_themes() -> list[ThemeSummary]:
     return get_theme_summaries()
@@ -1,17 +1,18 @@
-import mimetypes
-
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 
 from climate_ref.models import ExecutionOutput
-from ref_backend.api.deps import ReaderDep, SessionDep
-from ref_backend.core.file_handling import file_iterator, resolve_artifact
+from ref_backend.api.deps import ReaderDep, SessionDep, SettingsDep
+from ref_backend.core.file_handling import file_iterator, get_file_metadata_cache, resolve_artifact
+from ref_backend.core.telemetry import TimedRoute
 
-router = APIRouter(prefix="/results", tags=["results"])
+router = APIRouter(prefix="/results", tags=["results"], route_class=TimedRoute)
 
 
 @router.get("/{result_id}")
-async def get_result(session: SessionDep, reader: ReaderDep, result_id: int) -> StreamingResponse:
+async def get_result(
+    session: SessionDep, reader: ReaderDep, settings: SettingsDep, result_id: int
+) -> StreamingResponse:
     """
     Fetch a result
     """
@@ -19,16 +20,16 @@ async def get_result(session: SessionDep, reader: ReaderDep, result_id: int) ->
     if result is None:
         raise HTTPException(status_code=404, detail="Result not found")
 
-    file_path = resolve_artifact(
-        reader.artifacts.output_file, result.execution.output_fragment, result.filename
-    )
-    mime_type, _encoding = mimetypes.guess_type(file_path)
+    fragment = result.execution.output_fragment
+    output_directory = resolve_artifact(reader.artifacts.output_directory, fragment)
+    file_path = resolve_artifact(reader.artifacts.output_file, fragment, result.filename)
+    file_info = get_file_metadata_cache(settings).stat(file_path, prefetch=output_directory)
 
-    if not file_path.exists():
+    if file_info is None:
         raise HTTPException(status_code=404, detail="Result file not found")
 
     return StreamingResponse(
         file_iterator(str(file_path)),
-        media_type=mime_type,
+        media_type=file_info.mime_type,
         headers={"Content-Disposition": f"attachment; filename={result.filename}"},
     )
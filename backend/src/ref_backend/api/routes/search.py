@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query
+
+from ref_backend.api.deps import SessionDep, SettingsDep
+from ref_backend.core.search_index import SearchKind, suggest_names
+from ref_backend.core.telemetry import TimedRoute
+from ref_backend.models import Collection, SearchSuggestion
+
+router = APIRouter(prefix="/search", tags=["search"], route_class=TimedRoute)
+
+
+@router.get("/suggest")
+async def suggest(
+    session: SessionDep,
+    settings: SettingsDep,
+    q: str = Query(..., min_length=1, description="Text to complete"),
+    kind: SearchKind = Query("datasets", description="What to search the names of"),
+    limit: int = Query(10, ge=1, le=50),
+) -> Collection[SearchSuggestion]:
+    """
+    Suggest dataset slugs, diagnostic names or provider names that contain the query
+
+    Names that start with the query are listed first, then shorter names.
+    """
+    matches = suggest_names(session, settings, kind, q, limit)
+    return Collection(
+        data=[SearchSuggestion(kind=kind, id=match_id, name=name) for match_id, name in matches],
+    )
@@ -1,6 +1,16 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Annotated
 
-router = APIRouter(prefix="/utils", tags=["utils"])
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from ref_backend.api.deps import DatabaseDep, SettingsDep, get_read_replicas
+from ref_backend.core.database import pool_status
+from ref_backend.core.profiling import ProfilerBusy, StackSampler, token_matches
+from ref_backend.core.telemetry import TimedRoute
+from ref_backend.models import Collection, DatabasePoolStatus
+
+router = APIRouter(prefix="/utils", tags=["utils"], route_class=TimedRoute)
 
 
 @router.get("/health-check/")
@@ -8,6 +18,48 @@ async def health_check() -> bool:
     return True
 
 
+@router.get("/database-pools")
+async def database_pools(database: DatabaseDep, settings: SettingsDep) -> Collection[DatabasePoolStatus]:
+    """
+    Report the utilisation of the database connection pools of the worker that handles the request
+
+    Each worker process has its own pools, so repeated requests may be answered by different workers.
+    """
+    replicas = get_read_replicas(settings)
+    return Collection(
+        data=[
+            pool_status("primary", database._engine),
+            *(pool_status(f"replica-{i}", replica._engine) for i, replica in enumerate(replicas)),
+        ]
+    )
+
+
+@router.get("/profile", include_in_schema=False)
+async def profile_worker(
+    settings: SettingsDep,
+    seconds: Annotated[float, Query(gt=0)] = 10,
+    include_idle: bool = False,
+    x_profile_token: Annotated[str | None, Header()] = None,
+) -> PlainTextResponse:
+    """
+    Sample the stacks of the worker that handles the request for a number of seconds
+
+    Requires ``PROFILING_TOKEN`` to be set and sent in the ``X-Profile-Token`` header.
+    The profile is returned in the folded stack format used by flamegraph tools.
+    """
+    if settings.PROFILING_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(settings.PROFILING_TOKEN, x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+    try:
+        with StackSampler(settings.PROFILING_INTERVAL_MS / 1000, include_idle=include_idle) as sampler:
+            await asyncio.sleep(min(seconds, settings.PROFILING_MAX_SECONDS))
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return PlainTextResponse(sampler.folded(), headers={"Cache-Control": "no-store"})
+
+
 # @router.get("/cv")
 # async def list_cv(
 #     cv: CVDep,
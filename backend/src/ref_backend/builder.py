@@ -14,8 +14,15 @@ from starlette.types import Scope
 
 from climate_ref.config import Config
 from climate_ref.database import Database
+from ref_backend.api.deps import get_read_replicas
 from ref_backend.api.main import api_router
+from ref_backend.core.compression import CompressionMiddleware
 from ref_backend.core.config import Settings
+from ref_backend.core.http_cache import HTTPCacheMiddleware
+from ref_backend.core.metrics import MetricsExporter, MetricsMiddleware
+from ref_backend.core.profiling import RequestProfilerMiddleware
+from ref_backend.core.query_budget import EXCEPTION_HANDLERS, QueryBudgetMiddleware
+from ref_backend.core.telemetry import ServerTimingMiddleware
 
 description = """
 API for querying the results from the Climate Rapid Evaluation Framework (Climate REF).
@@ -101,15 +108,58 @@ def build_app(settings: Settings, ref_config: Config, database: Database) -> Fas
             "url": "https://www.apache.org/licenses/LICENSE-2.0.html",
         },
     )
-    app.add_middleware(
-        SQLAlchemyMonitor,
-        engine=database._engine,
-        actions=[
-            LogStatistics(),
-            WarnMaxTotalInvocation(max_invocations=10),
-            SlowQueryMonitor(threshold_ms=100),
-        ],
-    )
+    # Innermost, so the budget only covers the time spent in the route
+    app.add_middleware(QueryBudgetMiddleware, seconds=settings.QUERY_BUDGET_SECONDS)
+    for exception, handler in EXCEPTION_HANDLERS.items():
+        app.add_exception_handler(exception, handler)
+
+    # Inside the HTTP cache middleware, so compressed responses can be reused by ETag
+    app.add_middleware(CompressionMiddleware, settings=settings)
+    if settings.HTTP_CACHE_ENABLED:
+        app.add_middleware(
+            HTTPCacheMiddleware,
+            database=database,
+            settings=settings,
+            prefix=settings.API_V1_STR,
+        )
+
+    if settings.METRICS_ENABLED:
+        exporter = MetricsExporter(
+            engines=lambda: {
+                "primary": database._engine,
+                **{f"replica-{i}": r._engine for i, r in enumerate(get_read_replicas(settings))},
+            },
+            directory=settings.METRICS_DIR,
+        )
+        app.add_middleware(MetricsMiddleware, exporter=exporter)
+        app.add_route("/metrics", exporter.endpoint, include_in_schema=False)
+
+    query_monitor_enabled = settings.QUERY_MONITOR_ENABLED
+    if query_monitor_enabled is None:
+        query_monitor_enabled = settings.ENVIRONMENT == "local"
+    # Outside the compression and metrics: as a BaseHTTPMiddleware it sends every body in several messages,
+    # which they would take for a streamed response
+    if query_monitor_enabled:
+        app.add_middleware(
+            SQLAlchemyMonitor,
+            engine=database._engine,
+            actions=[
+                LogStatistics(),
+                WarnMaxTotalInvocation(max_invocations=10),
+                SlowQueryMonitor(threshold_ms=100),
+            ],
+        )
+
+    # Outside the caching and compression, so the total covers the whole response
+    if settings.SERVER_TIMING_ENABLED:
+        app.add_middleware(ServerTimingMiddleware, slow_request_ms=settings.SLOW_REQUEST_LOG_MS)
+
+    if settings.PROFILING_TOKEN is not None:
+        app.add_middleware(
+            RequestProfilerMiddleware,
+            token=settings.PROFILING_TOKEN,
+            interval_seconds=settings.PROFILING_INTERVAL_MS / 1000,
+        )
 
     # Set all CORS enabled origins
     if settings.all_cors_origins or settings.BACKEND_CORS_ORIGIN_REGEX:
@@ -118,7 +168,8 @@ def build_app(settings: Settings, ref_config: Config, database: Database) -> Fas
             allow_origins=settings.all_cors_origins,
             allow_origin_regex=settings.BACKEND_CORS_ORIGIN_REGEX,
             allow_credentials=False,
-            allow_methods=["GET"],
+            # POST is only routed for batches of metric value queries too large for a URL
+            allow_methods=["GET", "POST"],
             allow_headers=["*"],
         )
 
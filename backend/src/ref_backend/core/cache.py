@@ -0,0 +1,456 @@
+"""
+Caching of query results that are shared between requests.
+
+The REF database only changes when a worker writes new executions,
+so results are safe to reuse until the database moves on to a new generation.
+Each cache stores its entries under the generation they were computed against,
+so an entry from an older generation is never served,
+and drops the previous generation's entries as soon as a newer one is seen.
+
+Where entries are kept is pluggable (see `CacheBackend`):
+
+* ``memory`` keeps an LRU cache in each worker.
+* ``sqlite`` shares a single SQLite file between the workers of a pod,
+  in front of which each worker keeps a small in-memory LRU cache.
+* ``redis`` shares a Redis-compatible server between pods,
+  again fronted by a small in-memory LRU cache per worker.
+"""
+
+import math
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol, TypeVar
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from climate_ref import models
+from ref_backend.core.telemetry import record_cache
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how a cache has been used since it was created."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class CacheBackend(Protocol):
+    """
+    Storage for cached values, keyed by string.
+
+    A backend may drop any entry at any time, so callers must always be able to recompute a value.
+    """
+
+    stats: CacheStats
+
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def clear(self, prefix: str = "") -> None: ...
+
+
+class LRUCache:
+    """
+    A least-recently-used cache bounded by entry count and entry age, and optionally by size.
+
+    Safe to share between the threads of a worker.
+    An entry older than ``ttl_seconds`` is treated as missing,
+    and the least recently used entries are evicted once ``max_entries`` is reached,
+    or once the sizes of the entries, as given by ``sizeof``, add up to more than ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        *,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = len,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._clock = clock
+        self._sizeof = sizeof
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of the entries, when the cache is bounded by size."""
+        return self._total_bytes
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get an entry, or ``default`` if it is missing or has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+
+            stored_at, value, _ = entry
+            if self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.stats.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store an entry, evicting the least recently used entries if the cache is full."""
+        if self.max_entries <= 0:
+            return
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock(), value, size)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._total_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def clear(self, prefix: str = "") -> None:
+        """Remove every entry whose key starts with ``prefix``."""
+        with self._lock:
+            if not prefix:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+
+class SQLiteCacheBackend:
+    """
+    A cache stored in a SQLite file, shared by every worker process that opens the same path.
+
+    Values are pickled, so they must be plain data.
+    Entries are evicted least recently used first once ``max_entries`` is reached,
+    and expire after ``ttl_seconds``.
+    The file is only a cache and can be deleted at any time.
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl_seconds: float | None = None) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed_at ON cache_entry (accessed_at)"
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get an entry, or ``default`` if it is missing or has expired."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, stored_at FROM cache_entry WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+                self.stats.misses += 1
+                return default
+            self._connection.execute("UPDATE cache_entry SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats.hits += 1
+        return pickle.loads(row[0])  # noqa: S301
+
+    def set(self, key: str, value: Any) -> None:
+        """Store an entry, evicting the least recently used entries if the cache is full."""
+        if self.max_entries <= 0:
+            return
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            evicted = self._connection.execute(
+                "DELETE FROM cache_entry WHERE key IN ("
+                "SELECT key FROM cache_entry ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.stats.evictions += max(evicted, 0)
+
+    def clear(self, prefix: str = "") -> None:
+        """Remove every entry whose key starts with ``prefix``."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM cache_entry WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+
+
+class RedisCacheBackend:
+    """
+    A cache stored in a Redis-compatible server.
+
+    ``client`` only needs the ``get``, ``set``, ``scan_iter`` and ``delete`` methods of a
+    ``redis.Redis`` client, so any compatible stand-in can be used.
+    Eviction once the server is full is left to the server's ``maxmemory-policy``.
+    """
+
+    def __init__(self, client: Any, ttl_seconds: float | None = None) -> None:
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: float | None = None) -> "RedisCacheBackend":
+        """Connect to a server, which requires the optional ``redis`` package."""
+        try:
+            import redis  # type: ignore[import-not-found]  # noqa: PLC0415
+        except ImportError:
+            raise ValueError("The redis cache backend requires the `redis` package to be installed") from None
+        return cls(redis.Redis.from_url(url), ttl_seconds=ttl_seconds)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        payload = self.client.get(key)
+        if payload is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return pickle.loads(payload)  # noqa: S301
+
+    def set(self, key: str, value: Any) -> None:
+        # Redis expiries are whole seconds of at least 1, so a fraction of a second is rounded up
+        expiry = max(1, math.ceil(self.ttl_seconds)) if self.ttl_seconds else None
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=expiry)
+
+    def clear(self, prefix: str = "") -> None:
+        keys = list(self.client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class TieredCache:
+    """
+    A small per-worker cache in front of a shared backend.
+
+    Hits in the local cache avoid deserialising the shared entry,
+    and values found in the shared backend are copied into the local cache.
+    """
+
+    def __init__(self, local: LRUCache, shared: CacheBackend) -> None:
+        self.local = local
+        self.shared = shared
+        self.stats = CacheStats()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                self.stats.misses += 1
+                return default
+            self.local.set(key, value)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        self.shared.set(key, value)
+
+    def clear(self, prefix: str = "") -> None:
+        self.local.clear(prefix)
+        self.shared.clear(prefix)
+
+
+class GenerationalCache:
+    """
+    A cache whose entries are only valid for a single database generation.
+
+    Entries are stored under ``namespace`` and the generation they were computed against,
+    so several caches can share a backend,
+    and a worker that has not yet seen a new generation cannot hand stale entries to one that has.
+    The previous generation's entries are cleared when a newer generation is first seen.
+    """
+
+    def __init__(self, store: CacheBackend, namespace: str = "default") -> None:
+        self.store = store
+        self.namespace = namespace
+        self._generation: str | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.store.stats
+
+    def _check_generation(self, generation: str) -> None:
+        with self._lock:
+            previous = self._generation
+            if generation == previous:
+                return
+            self._generation = generation
+        if previous is not None:
+            self.store.clear(f"{self.namespace}:{previous}:")
+            self.store.stats.invalidations += 1
+
+    def get_or_compute(self, key: str, generation: str, compute: Callable[[], V]) -> V:
+        """
+        Get the cached result for ``key``, computing and storing it on a miss.
+
+        Parameters
+        ----------
+        key
+            Normalised description of the query that produced the result
+        generation
+            Current database generation, see `get_database_generation`
+        compute
+            Called to produce the result when it is not cached
+        """
+        self._check_generation(generation)
+
+        store_key = f"{self.namespace}:{generation}:{key}"
+        value = self.store.get(store_key, _MISSING)
+        record_cache(hit=value is not _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.store.set(store_key, value)
+        return value  # type: ignore[no-any-return]
+
+
+_generation_memo: dict[str, tuple[float, str]] = {}
+_generation_lock = threading.Lock()
+
+
+def get_database_generation(session: Session, max_age_seconds: float = 0.0) -> str:
+    """
+    Get a marker that changes whenever new results are written to the database.
+
+    Built from the newest execution, execution group and dataset,
+    which are all cheap index lookups: the ids are primary keys,
+    and ``updated_at`` is indexed on both execution tables (``ix_execution_updated_at``
+    and ``ix_execution_group_updated_at``).
+    The marker is reused for up to ``max_age_seconds`` per database,
+    so a busy worker does not run this query for every request.
+    """
+    url = str(session.get_bind().engine.url)
+    now = time.monotonic()
+    with _generation_lock:
+        memo = _generation_memo.get(url)
+        if memo is not None and now - memo[0] < max_age_seconds:
+            return memo[1]
+
+    row = session.execute(
+        select(
+            select(func.max(models.Execution.id)).scalar_subquery(),
+            select(func.max(models.Execution.updated_at)).scalar_subquery(),
+            select(func.max(models.ExecutionGroup.updated_at)).scalar_subquery(),
+            select(func.max(models.Dataset.id)).scalar_subquery(),
+        )
+    ).one()
+    generation = ":".join(str(part) for part in row)
+
+    with _generation_lock:
+        _generation_memo[url] = (now, generation)
+    return generation
+
+
+# Size of the per-worker cache that sits in front of a shared backend
+LOCAL_TIER_MAX_ENTRIES = 64
+
+_backend_cache: dict[tuple[Any, ...], CacheBackend] = {}
+_named_caches: dict[tuple[Any, ...], GenerationalCache] = {}
+_cache_lock = threading.Lock()
+
+
+def _build_backend(settings: "Settings") -> CacheBackend:
+    """Create the storage selected by ``CACHE_BACKEND``."""
+    max_entries = settings.QUERY_CACHE_MAX_ENTRIES
+    ttl_seconds = settings.QUERY_CACHE_TTL_SECONDS
+    local = LRUCache(max_entries=min(max_entries, LOCAL_TIER_MAX_ENTRIES), ttl_seconds=ttl_seconds)
+
+    if settings.CACHE_BACKEND == "sqlite":
+        path = settings.CACHE_SQLITE_PATH or Path(tempfile.gettempdir()) / "ref-backend-cache.sqlite"
+        logger.info(f"Sharing the query cache between workers through {path}")
+        return TieredCache(local, SQLiteCacheBackend(path, max_entries=max_entries, ttl_seconds=ttl_seconds))
+    if settings.CACHE_BACKEND == "redis":
+        if not settings.CACHE_REDIS_URL:
+            raise ValueError("CACHE_REDIS_URL must be set to use the redis cache backend")
+        return TieredCache(
+            local, RedisCacheBackend.from_url(settings.CACHE_REDIS_URL, ttl_seconds=ttl_seconds)
+        )
+    return LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+def get_cache(namespace: str, settings: "Settings") -> GenerationalCache:
+    """
+    Get the worker-wide cache for ``namespace``
+
+    Every namespace shares the storage selected by the settings,
+    so a shared backend is only opened once per worker.
+    """
+    backend_key = (
+        settings.CACHE_BACKEND,
+        settings.CACHE_SQLITE_PATH,
+        settings.CACHE_REDIS_URL,
+        settings.QUERY_CACHE_MAX_ENTRIES,
+        settings.QUERY_CACHE_TTL_SECONDS,
+    )
+    with _cache_lock:
+        if backend_key not in _backend_cache:
+            _backend_cache[backend_key] = _build_backend(settings)
+        cache_key = (namespace, *backend_key)
+        if cache_key not in _named_caches:
+            _named_caches[cache_key] = GenerationalCache(_backend_cache[backend_key], namespace=namespace)
+        return _named_caches[cache_key]
+
+
+def cache_statistics() -> dict[str, CacheStats]:
+    """Get the statistics of the query cache storage opened in this worker, by ``CACHE_BACKEND``."""
+    statistics: dict[str, CacheStats] = {}
+    with _cache_lock:
+        backends = list(_backend_cache.items())
+    for (backend_name, *_), backend in backends:
+        total = statistics.setdefault(f"query_{backend_name}", CacheStats())
+        total.hits += backend.stats.hits
+        total.misses += backend.stats.misses
+        total.evictions += backend.stats.evictions
+        total.invalidations += backend.stats.invalidations
+    return statistics
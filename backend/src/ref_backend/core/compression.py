@@ -0,0 +1,309 @@
+"""
+Negotiated compression of API responses.
+
+JSON and CSV payloads compress by an order of magnitude,
+which matters most for the unpaginated listings and CSV exports.
+gzip is always available.
+zstd (Python 3.14+) and brotli (the optional ``brotli`` package) are offered when installed,
+and are preferred because they are faster and smaller for the same payload.
+
+Streamed responses are compressed chunk by chunk and flushed after each chunk,
+so a client starts receiving a CSV export before it has been fully generated.
+"""
+
+import zlib
+from collections.abc import Callable
+from functools import partial
+from typing import Any, Protocol
+
+from loguru import logger
+from starlette import status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ref_backend.core.cache import LRUCache
+from ref_backend.core.config import Settings
+from ref_backend.core.http_cache import ETAG_STATE_KEY
+
+EXCLUDED_MEDIA_TYPES = (
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "application/x-tar",
+    "application/octet-stream",
+    "text/event-stream",
+)
+"""Media types that are already compressed, or are binary and unlikely to compress."""
+
+EXCLUDED_MEDIA_PREFIXES = ("image/", "video/", "audio/", "font/")
+
+PRECOMPRESSED_MAX_BODY_BYTES = 4 * 1024 * 1024
+"""Largest compressed response that is kept for reuse."""
+
+
+class Encoder(Protocol):
+    """Incremental compressor for a single response body."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk, flushing so the client can decode everything sent so far."""
+        ...
+
+    def finish(self, data: bytes) -> bytes:
+        """Compress the final chunk and end the stream."""
+        ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        import brotli  # type: ignore[import-not-found]  # noqa: PLC0415
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()  # type: ignore[no-any-return]
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()  # type: ignore[no-any-return]
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        from compression import zstd  # type: ignore[import-not-found,unused-ignore]  # noqa: PLC0415
+
+        self._zstd: Any = zstd
+        self._compressor: Any = zstd.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data, self._zstd.ZstdCompressor.FLUSH_BLOCK)  # type: ignore[no-any-return]
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data, self._zstd.ZstdCompressor.FLUSH_FRAME)  # type: ignore[no-any-return]
+
+
+def available_encoders(settings: Settings) -> dict[str, Callable[[], Encoder]]:
+    """
+    Get a factory for each encoding this server can produce, most preferred first.
+
+    Parameters
+    ----------
+    settings
+        Settings providing the compression levels
+    """
+    candidates: list[tuple[str, Callable[[], Encoder]]] = [
+        ("zstd", lambda: ZstdEncoder(settings.COMPRESSION_ZSTD_LEVEL)),
+        ("br", lambda: BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)),
+        ("gzip", lambda: GzipEncoder(settings.COMPRESSION_GZIP_LEVEL)),
+    ]
+    encoders: dict[str, Callable[[], Encoder]] = {}
+    for name, factory in candidates:
+        try:
+            factory()
+        except ImportError:
+            logger.debug(f"{name} compression is not available")
+            continue
+        encoders[name] = factory
+    return encoders
+
+
+def negotiate_encoding(accept_encoding: str, available: list[str]) -> str | None:
+    """
+    Choose the encoding for a response from an ``Accept-Encoding`` header.
+
+    The client's q-values are respected,
+    and ties are broken by the server's order of preference in ``available``.
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    best: tuple[float, int] | None = None
+    chosen = None
+    for preference, name in enumerate(available):
+        quality = accepted.get(name, wildcard)
+        if quality <= 0:
+            continue
+        if best is None or (quality, -preference) > best:
+            best = (quality, -preference)
+            chosen = name
+    return chosen
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type not in EXCLUDED_MEDIA_TYPES and not media_type.startswith(EXCLUDED_MEDIA_PREFIXES)
+
+
+async def _send_with_vary(send: Send, message: Message) -> None:
+    """
+    Send a response that is not compressed, marked as varying by ``Accept-Encoding``.
+
+    Shared caches then keep it apart from the compressed variants of the same content.
+    """
+    if message["type"] == "http.response.start" and _is_compressible(Headers(raw=message["headers"])):
+        MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+    await send(message)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts.
+
+    Bodies smaller than ``COMPRESSION_MINIMUM_SIZE``, partial responses and media types that are
+    already compressed are sent as-is.
+
+    Compressed responses that carry an ETag from `HTTPCacheMiddleware` are kept,
+    keyed by the ETag and encoding,
+    so repeat requests for the same content are answered without running the route or compressing again.
+    """
+
+    def __init__(self, app: ASGIApp, *, settings: Settings) -> None:
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE
+        self.encoders = available_encoders(settings)
+        # Keyed by ETag and encoding, holding the response start message and the compressed body
+        self.precompressed = LRUCache(
+            max_entries=settings.COMPRESSION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.COMPRESSION_CACHE_MAX_BYTES,
+            sizeof=lambda cached: len(cached[1]),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, partial(_send_with_vary, send))
+            return
+
+        etag = scope.get("state", {}).get(ETAG_STATE_KEY)
+        cache_key = f"{etag}:{encoding}" if etag and scope["method"] == "GET" else None
+        if cache_key is not None:
+            cached = self.precompressed.get(cache_key)
+            if cached is not None:
+                start, body = cached
+                # Outer middleware edit the headers in place, so each response gets its own copy
+                await send({**start, "headers": list(start["headers"])})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        responder = _CompressionResponder(
+            self.app,
+            encoding=encoding,
+            encoder_factory=self.encoders[encoding],
+            minimum_size=self.minimum_size,
+            on_complete=(lambda start, body: self._store(cache_key, start, body)) if cache_key else None,
+        )
+        await responder(scope, receive, send)
+
+    def _store(self, cache_key: str, start: Message, body: bytes) -> None:
+        if start["status"] == status.HTTP_200_OK and len(body) <= PRECOMPRESSED_MAX_BODY_BYTES:
+            self.precompressed.set(cache_key, (start, body))
+
+
+class _CompressionResponder:
+    """Compress the response to a single request."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        encoding: str,
+        encoder_factory: Callable[[], Encoder],
+        minimum_size: int,
+        on_complete: Callable[[Message, bytes], None] | None,
+    ) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.encoder_factory = encoder_factory
+        self.minimum_size = minimum_size
+        self.on_complete = on_complete
+        self.send: Send
+        self.start: Message = {}
+        self.encoder: Encoder | None = None
+        # None until the first body chunk decides whether the response is compressed
+        self.compressing: bool | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Hold the headers back until the first chunk shows whether the body will be compressed
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            if message["status"] == status.HTTP_206_PARTIAL_CONTENT or not _is_compressible(headers):
+                self.compressing = False
+                await self.send(message)
+            return
+
+        if message_type != "http.response.body":
+            if self.compressing is None:
+                # e.g. a file sent with the pathsend extension, which is not compressed
+                self.compressing = False
+                await self.send(self.start)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressing is False:
+            await self.send(message)
+            return
+
+        if self.compressing is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) < self.minimum_size and not more_body:
+                self.compressing = False
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            self.compressing = True
+            self.encoder = self.encoder_factory()
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["Content-Length"]
+
+            if not more_body:
+                # The whole body is available, so it can be sent with a length and reused
+                compressed = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                if self.on_complete is not None:
+                    self.on_complete({**self.start, "headers": list(self.start["headers"])}, compressed)
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            await self.send(self.start)
+
+        assert self.encoder is not None  # noqa: S101
+        chunk = self.encoder.compress(body) if more_body else self.encoder.finish(body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -76,6 +76,288 @@ class Settings(BaseSettings):
 
     Ignored for non-SQLite databases.
     """
+    DATABASE_POOL_SIZE: int = 10
+    """
+    Number of database connections each worker keeps open.
+    """
+    DATABASE_MAX_OVERFLOW: int = 20
+    """
+    Number of connections a worker may open beyond ``DATABASE_POOL_SIZE`` during a burst of requests.
+    """
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 10
+    """
+    How long, in seconds, a request waits for a free connection before failing.
+    """
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    """
+    Age, in seconds, after which a connection is replaced rather than reused.
+
+    Keeps connections from being dropped by a proxy or server idle timeout. Set to -1 to disable.
+    """
+    DATABASE_POOL_PRE_PING: bool = True
+    """
+    Check that a connection is alive before handing it to a request.
+    """
+    DATABASE_STATEMENT_TIMEOUT_MS: int = 0
+    """
+    Longest time, in milliseconds, the database spends on a single statement before cancelling it.
+
+    Only applies to PostgreSQL. Set to 0 to disable.
+    """
+    SQLITE_MMAP_SIZE: int = 1024 * 1024 * 1024
+    """
+    Bytes of a SQLite database that each connection memory-maps, rather than reading through its page cache.
+
+    Set to 0 to disable.
+    """
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+    """
+    Size, in KiB, of the page cache of each SQLite connection.
+
+    Set to 0 to keep SQLite's default of 2 MiB.
+    """
+    SQLITE_TEMP_STORE_MEMORY: bool = True
+    """
+    Keep the temporary tables and indexes SQLite builds for sorting and grouping in memory.
+    """
+    SQLITE_COPY_DIR: Path | None = None
+    """
+    Directory to copy a read-only SQLite database into at startup, e.g. ``/dev/shm``.
+
+    Only used with ``REF_READ_ONLY_DATABASE``.
+    The copy is served instead of the original, so a memory-backed filesystem avoids disk reads entirely.
+    The workers of a server share one copy, which the first worker to start makes.
+    An existing copy is reused unless the original is newer,
+    and the API has to be restarted to pick up a new database.
+    """
+    DATABASE_READ_REPLICA_URLS: list[str] = []
+    """
+    URLs of read replicas of the database, as a JSON list.
+
+    The heaviest read endpoints spread their queries across the replicas,
+    while every other request uses the primary database.
+    Results reach a replica after its replication lag,
+    so a listing served by a replica may briefly omit the newest executions.
+    """
+    QUERY_BUDGET_SECONDS: float = 30
+    """
+    Longest time, in seconds, a request may spend querying the database before it is answered with a 504.
+
+    Running queries are interrupted once the budget is spent,
+    and the queries of a request whose client disconnects are stopped.
+    Set to 0 to disable.
+    """
+    QUERY_BUDGET_ROUTE_SECONDS: dict[str, float] = {
+        "/diagnostics/{provider_slug}/{diagnostic_slug}/values": 10,
+        "/diagnostics/{provider_slug}/{diagnostic_slug}/execution_groups": 10,
+        "/executions/{group_id}/values": 10,
+    }
+    """
+    Query budgets, in seconds, for specific routes, as a JSON object keyed by the route path.
+
+    Paths are relative to ``API_V1_STR``, with the parameters as they appear in the OpenAPI schema.
+    """
+    SERVER_TIMING_ENABLED: bool = True
+    """
+    Measure the time each request spends in the database, the endpoint, serialization and file reads.
+
+    The measurements are reported in a ``Server-Timing`` response header
+    and as structured fields of a log record for each request.
+    """
+    SLOW_REQUEST_LOG_MS: float = 1000
+    """
+    Duration, in milliseconds, above which a request's timings are logged at ``INFO`` rather than ``DEBUG``.
+    """
+    QUERY_MONITOR_ENABLED: bool | None = None
+    """
+    Log the statistics of every query of every request, and warn about slow queries and requests
+    that run more than 10 queries.
+
+    Useful when developing locally, but too verbose for a deployment,
+    so by default it only runs when ``ENVIRONMENT`` is ``local``.
+    """
+    METRICS_ENABLED: bool = True
+    """
+    Serve metrics about requests, database queries, caches and connection pools at ``/metrics``,
+    in the OpenMetrics text format.
+    """
+    METRICS_DIR: Path | None = None
+    """
+    Directory the worker processes share their metrics through, e.g. ``/dev/shm/ref-metrics``.
+
+    Required to report every worker when the API runs with several workers,
+    as a scrape is only answered by one of them.
+    Use a directory on a local filesystem that is emptied when the API is restarted.
+    """
+    PROFILING_TOKEN: str | None = None
+    """
+    Secret that allows a client to profile the API, sent in the ``X-Profile-Token`` header.
+
+    Profiling is disabled, without any overhead, unless this is set.
+    See `ref_backend.core.profiling`.
+    """
+    PROFILING_INTERVAL_MS: float = 2
+    """
+    Interval, in milliseconds, between the stack samples of a profile.
+    """
+    PROFILING_MAX_SECONDS: float = 60
+    """
+    Longest time, in seconds, a worker can be sampled for.
+    """
+    QUERY_CACHE_MAX_ENTRIES: int = 256
+    """
+    Maximum number of query results kept in the cache.
+
+    Results are reused until new executions are written to the database.
+    Set to 0 to disable the cache.
+    """
+    CACHE_BACKEND: Literal["memory", "sqlite", "redis"] = "memory"
+    """
+    Where cached query results are stored.
+
+    ``memory`` keeps a separate cache in each worker process.
+    ``sqlite`` shares a cache file between the workers on a host (see ``CACHE_SQLITE_PATH``).
+    ``redis`` shares a cache between hosts (see ``CACHE_REDIS_URL``)
+    and requires the optional ``redis`` package.
+    """
+    CACHE_SQLITE_PATH: Path | None = None
+    """
+    Path to the shared cache file used by the ``sqlite`` cache backend.
+
+    Defaults to a file in the system temporary directory.
+    Use a path on a local (ideally memory-backed) filesystem that every worker can write to.
+    """
+    CACHE_REDIS_URL: str | None = None
+    """
+    URL of the server used by the ``redis`` cache backend, e.g. ``redis://cache:6379/0``.
+    """
+    QUERY_CACHE_TTL_SECONDS: float = 600
+    """
+    Maximum age of a cached query result, in seconds.
+    """
+    DATABASE_GENERATION_CHECK_SECONDS: float = 5
+    """
+    How long, in seconds, to reuse the check for new executions before querying the database again.
+
+    This bounds how stale a cached result can be after a worker writes new executions.
+    """
+    HTTP_CACHE_ENABLED: bool = True
+    """
+    Add ``ETag`` and ``Cache-Control`` headers to API responses.
+
+    Requests that revalidate an unchanged response are answered with ``304 Not Modified``
+    without querying the database beyond checking for new executions.
+    """
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    """
+    Smallest response body, in bytes, that is compressed.
+    """
+    COMPRESSION_GZIP_LEVEL: int = 6
+    """
+    gzip compression level (1-9).
+
+    Higher levels only shave a few percent off JSON payloads for a large increase in CPU time.
+    """
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    """
+    brotli compression quality (0-11), used when the optional ``brotli`` package is installed.
+    """
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    """
+    zstd compression level (1-22), used on Python 3.14 and later.
+    """
+    COMPRESSION_CACHE_MAX_ENTRIES: int = 128
+    """
+    Maximum number of compressed responses kept in each worker for reuse.
+
+    Only responses with an ETag are kept, so this requires ``HTTP_CACHE_ENABLED``.
+    Set to 0 to compress every response afresh.
+    """
+    COMPRESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    """
+    Maximum total size, in bytes, of the compressed responses kept in each worker for reuse.
+
+    The least recently used responses are dropped once the limit is reached,
+    and a single response larger than the limit is not kept.
+    """
+    DATASET_INDEX_ENABLED: bool = True
+    """
+    Resolve CMIP6 facet filters with an in-memory index of the dataset facets in each worker.
+
+    The index is refreshed with the datasets added since it was built whenever the database changes.
+    """
+    DATASET_INDEX_MAX_IDS: int = 10_000
+    """
+    Largest number of matching datasets that is passed to the database as a list of ids.
+
+    Broader filters are applied in SQL instead.
+    """
+    COUNT_ESTIMATE_MIN_ROWS: int = 100_000
+    """
+    Smallest listing, by the query planner's estimate, whose ``total_count`` is estimated rather than counted.
+
+    Only PostgreSQL provides estimates; on SQLite every count is exact.
+    Set to 0 to always count exactly.
+    """
+    SEARCH_INDEX_ENABLED: bool = True
+    """
+    Resolve the ``*_contains`` name filters and search suggestions with an in-memory trigram index
+    of dataset slugs and diagnostic and provider names in each worker.
+    """
+    SEARCH_INDEX_MAX_IDS: int = 10_000
+    """
+    Largest number of rows matching a ``*_contains`` filter that is passed to the database as a list of ids.
+
+    Broader filters are applied in SQL instead.
+    """
+    LATEST_EXECUTIONS_ENABLED: bool = True
+    """
+    Keep the latest execution of each execution group in memory in each worker.
+
+    Success filters and counts, and requests for the latest execution of a group,
+    are then answered without grouping the execution table.
+    """
+    LATEST_EXECUTIONS_MAX_IDS: int = 10_000
+    """
+    Largest number of execution groups matching a success filter that is passed to the database as ids.
+
+    Broader filters are applied in SQL instead.
+    """
+    OUTPUT_CATALOG_ENABLED: bool = True
+    """
+    Keep a catalog of the outputs of each diagnostic in memory in each worker.
+
+    Figure galleries and the diagnostic outputs endpoint then match filenames against the catalog,
+    which is reloaded when the database changes, rather than loading the outputs for every request.
+    """
+    OUTPUT_FILTER_TIME_BUDGET_SECONDS: float = 1.0
+    """
+    Longest time, in seconds, that matching a filter of the diagnostic outputs endpoint may take.
+
+    The request fails with a 400 once the budget is spent.
+    """
+    RESULTS_METADATA_CACHE_MAX_ENTRIES: int = 10_000
+    """
+    Maximum number of files and directories of the results directory whose metadata is kept in each worker.
+
+    Set to 0 to look up the results directory in every request.
+    """
+    RESULTS_METADATA_CACHE_TTL_SECONDS: float = 60
+    """
+    Maximum age, in seconds, of the cached metadata of the results directory.
+
+    Missing files are not cached, but a cached directory listing misses files added since it was made.
+    """
+    VALUES_BATCH_MAX_QUERIES: int = 100
+    """
+    Largest number of queries accepted in one request to the batch metric values endpoint.
+    """
+    EXPLORER_CARD_SERIES_MAX_POINTS: int = 200
+    """
+    Largest number of points of each series in the precomputed data of the explorer cards.
+
+    Longer series are thinned to evenly spaced points, which is more than a card's chart can show.
+    """
     STATIC_DIR: str | None = None
     USE_TEST_DATA: bool = False
     """
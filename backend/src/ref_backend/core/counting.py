@@ -0,0 +1,107 @@
+"""
+Total counts for paginated listings.
+
+An exact ``count(*)`` over a filtered listing costs about as much as fetching every page of it,
+so counts are cached per query until new results are written to the database.
+On PostgreSQL, listings that the query planner expects to be large
+report the planner's row estimate instead of being counted,
+and say so with ``total_count_exact=False``.
+SQLite keeps no row estimates, so its counts are always exact.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
+
+from loguru import logger
+from sqlalchemy import Select, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Query, Session
+
+from ref_backend.core.cache import get_cache, get_database_generation
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+
+@dataclass(frozen=True)
+class RowCount:
+    """The number of rows a listing matches."""
+
+    value: int
+    exact: bool
+    """False if ``value`` is the query planner's estimate"""
+
+
+def _count_key(session: Session, statement: Select[Any]) -> str:
+    # The SQL and its parameters identify the filters, whatever order they were applied in the route
+    compiled = statement.compile(
+        dialect=session.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = json.dumps(compiled.params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{compiled}\n{params}".encode()).hexdigest()
+
+
+def estimate_row_count(session: Session, statement: Select[Any]) -> int | None:
+    """
+    Get the query planner's estimate of the number of rows a statement returns.
+
+    Returns
+    -------
+    :
+        The estimate, or None if the database does not provide one
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+
+    compiled = statement.compile(dialect=bind.dialect, compile_kwargs={"render_postcompile": True})
+    try:
+        plan = (
+            session.connection()
+            .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+            .scalar_one()
+        )
+    except SQLAlchemyError as exc:
+        logger.warning(f"Could not estimate the row count: {exc}")
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count(session: Session, settings: "Settings", statement: Select[Any]) -> RowCount:
+    if settings.COUNT_ESTIMATE_MIN_ROWS > 0:
+        estimate = estimate_row_count(session, statement)
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            return RowCount(estimate, exact=False)
+
+    exact = session.execute(
+        select(func.count()).select_from(statement.order_by(None).subquery())
+    ).scalar_one()
+    return RowCount(exact, exact=True)
+
+
+def count_rows(session: Session, settings: "Settings", statement: "Select[Any] | Query[Any]") -> RowCount:
+    """
+    Count the rows a listing's statement matches, before any offset or limit.
+
+    Parameters
+    ----------
+    session
+        Database session
+    settings
+        Settings, providing the cache and ``COUNT_ESTIMATE_MIN_ROWS``
+    statement
+        The statement, or legacy ORM query, for the whole listing
+    """
+    if isinstance(statement, Query):
+        statement = cast(Select[Any], statement.statement)
+    if settings.QUERY_CACHE_MAX_ENTRIES <= 0:
+        return _count(session, settings, statement)
+
+    generation = get_database_generation(session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS)
+    return get_cache("row_counts", settings).get_or_compute(
+        _count_key(session, statement), generation, lambda: _count(session, settings, statement)
+    )
@@ -0,0 +1,243 @@
+"""
+Connection pools for the databases the API reads from.
+
+`climate_ref.database.Database` creates its engine with SQLAlchemy's default pool,
+which is sized for a command line tool rather than a web server handling bursts of requests.
+The API replaces that engine with one configured from the ``DATABASE_*`` settings,
+and can open read replicas of the database for the heaviest read endpoints.
+
+SQLite connections are kept open in the pool for the life of the worker
+and are tuned with the ``SQLITE_*`` settings: memory mapping, a larger page cache
+and in-memory temporary tables.
+A read-only SQLite database can also be copied to a memory-backed filesystem at startup.
+"""
+
+import contextlib
+import fcntl
+import os
+import sqlite3
+import tempfile
+import urllib.parse
+from collections.abc import Generator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from climate_ref.database import Database
+from ref_backend.core.query_budget import install_query_budget
+from ref_backend.core.telemetry import install_telemetry
+from ref_backend.models import DatabasePoolStatus
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+
+def engine_options(
+    url: str | URL, settings: "Settings", connect_args: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Get the keyword arguments to `sqlalchemy.create_engine` for a database URL.
+
+    The pool size, overflow and timeout only apply to pools that queue connections,
+    which excludes in-memory SQLite databases.
+    SQLite connections are local files that never go stale, so they are neither pinged nor recycled.
+    The statement timeout only applies to PostgreSQL.
+    """
+    parsed = make_url(url)
+    options: dict[str, Any] = {}
+    if parsed.get_backend_name() != "sqlite":
+        options |= {
+            "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+            "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+        }
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options |= {
+            "poolclass": QueuePool,
+            "pool_size": settings.DATABASE_POOL_SIZE,
+            "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+            "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        }
+
+    connect_args = dict(connect_args or {})
+    if parsed.get_backend_name() == "postgresql" and settings.DATABASE_STATEMENT_TIMEOUT_MS > 0:
+        timeout = f"-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT_MS}"
+        connect_args["options"] = (
+            f"{connect_args['options']} {timeout}" if "options" in connect_args else timeout
+        )
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def sqlite_pragmas(settings: "Settings") -> list[str]:
+    """Get the ``PRAGMA`` statements run on each new SQLite connection."""
+    pragmas = []
+    if settings.SQLITE_MMAP_SIZE > 0:
+        pragmas.append(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+    if settings.SQLITE_CACHE_SIZE_KIB > 0:
+        # A negative cache size is in KiB rather than pages
+        pragmas.append(f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KIB}")
+    if settings.SQLITE_TEMP_STORE_MEMORY:
+        pragmas.append("PRAGMA temp_store = MEMORY")
+    return pragmas
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path: Path) -> Generator[None]:
+    """Hold an exclusive lock on a file, waiting for other processes to release it."""
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_up_to_date(copy: Path, source: Path) -> bool:
+    return copy.exists() and copy.stat().st_mtime >= source.stat().st_mtime
+
+
+def copy_sqlite_database(source: Path, directory: Path) -> Path:
+    """
+    Copy a SQLite database into a directory, unless an up-to-date copy is already there.
+
+    The workers of a server start at once, so the copy is made under a lock file in ``directory``:
+    the first worker makes the copy while the others wait, then reuse it,
+    so the database is only read and stored once.
+    The copy is made with SQLite's backup API into a temporary file that is then renamed,
+    so a process that does not take the lock never opens a partial copy.
+
+    Returns
+    -------
+    :
+        Path to the copy
+    """
+    destination = directory / source.name
+    if _is_up_to_date(destination, source):
+        return destination
+
+    directory.mkdir(parents=True, exist_ok=True)
+    with _exclusive_lock(directory / f"{source.name}.lock"):
+        if _is_up_to_date(destination, source):
+            return destination
+
+        logger.info(f"Copying the database to {destination}")
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as partial:
+            partial_path = Path(partial.name)
+        try:
+            with (
+                sqlite3.connect(f"{source.as_uri()}?mode=ro", uri=True) as src,
+                sqlite3.connect(partial_path) as dst,
+            ):
+                src.backup(dst)
+            os.replace(partial_path, destination)
+        finally:
+            partial_path.unlink(missing_ok=True)
+    return destination
+
+
+def _read_only_sqlite_path(url: URL) -> Path | None:
+    """Get the path of a SQLite database opened in the read-only URI form, or None for any other URL."""
+    if url.get_backend_name() != "sqlite" or url.query.get("mode") != "ro" or not url.database:
+        return None
+    # The database of a URI is percent-encoded, which SQLite decodes when opening it
+    return Path(urllib.parse.unquote(url.database.removeprefix("file:")))
+
+
+def configure_database(database: Database, settings: "Settings") -> Database:
+    """
+    Replace the engine of a database with one using the API's pool settings.
+
+    The URL is kept as is, including the read-only form used by ``REF_READ_ONLY_DATABASE``,
+    unless a read-only SQLite database is copied to ``SQLITE_COPY_DIR``.
+    Queries on the new engine are limited by the query budget of the request running them,
+    and their durations are added to the request's telemetry.
+    """
+    previous = database._engine
+    url = previous.url
+    source = _read_only_sqlite_path(url)
+    if source is not None and settings.SQLITE_COPY_DIR is not None:
+        copy = copy_sqlite_database(source, settings.SQLITE_COPY_DIR)
+        url = url.set(database=f"file:{urllib.parse.quote(str(copy))}")
+
+    # The driver arguments the previous engine derived from its URL, such as opening a SQLite URI,
+    # are carried over, so a copied database is opened the same way
+    _, previous_args = previous.dialect.create_connect_args(previous.url)
+    connect_args = {"uri": True} if previous_args.get("uri") else None
+    engine = create_engine(url, **engine_options(url, settings, connect_args))
+    if url.get_backend_name() == "sqlite":
+        _add_sqlite_pragmas(engine, sqlite_pragmas(settings))
+    install_query_budget(engine)
+    install_telemetry(engine)
+
+    _replace_engine(database, engine)
+    previous.dispose()
+    return database
+
+
+def _replace_engine(database: Database, engine: Engine) -> None:
+    """
+    Point a database, and the sessions it creates, at a new engine.
+
+    `climate_ref.database.Database` has no way to change its engine,
+    so this is the one place that sets its private ``_engine`` and ``_session_factory``,
+    and must follow any change to how its ``__init__`` sets them.
+    The current session is closed; the caller disposes of the previous engine.
+    """
+    database.session.close()
+    database._engine = engine
+    database._session_factory = sessionmaker(bind=engine)
+    database.session = Session(engine)
+
+
+def _add_sqlite_pragmas(engine: Engine, pragmas: list[str]) -> None:
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def open_read_replica(url: str, settings: "Settings") -> Database:
+    """
+    Open a read replica of the database.
+
+    The replica is expected to be at the same migration revision as the primary database,
+    so it is neither checked nor migrated.
+    """
+    return configure_database(Database(url), settings)
+
+
+def pool_status(name: str, engine: Engine) -> DatabasePoolStatus:
+    """Get the utilisation of the connection pool of an engine."""
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        return DatabasePoolStatus(
+            name=name,
+            pid=os.getpid(),
+            pool_class=type(pool).__name__,
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return DatabasePoolStatus(
+        name=name,
+        pid=os.getpid(),
+        pool_class=type(pool).__name__,
+        size=None,
+        checked_out=None,
+        checked_in=None,
+        overflow=None,
+    )
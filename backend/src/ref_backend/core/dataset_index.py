@@ -0,0 +1,423 @@
+"""
+In-memory inverted index over the facets of the CMIP6 datasets.
+
+Listing datasets by facet, or execution groups by ``source_id``,
+otherwise scans the dataset table for every request.
+The index maps each value of each CMIP6 partition facet to the set of dataset ids with that value,
+so any AND/OR combination of facets is resolved with set intersections and unions,
+and the resulting ids are fed into the SQL query as a primary key filter.
+
+Id sets use a hybrid representation:
+small postings are frozensets,
+while postings covering a sizable fraction of the catalog are bitmaps held in a Python ``int``,
+so that common values such as ``table_id=Amon`` stay compact
+and are intersected a machine word at a time.
+
+The index is built once per worker and refreshed incrementally:
+when the database generation changes only the rows added since the last refresh are read,
+and the latest versions are only recomputed for the datasets that share facet values with them.
+Requests keep using the previous index while a refresh is loading.
+"""
+
+import threading
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from climate_ref.datasets import get_dataset_adapter
+from climate_ref.models.dataset import CMIP6Dataset
+from climate_ref.results import DatasetFilter
+from climate_ref.results.datasets import select_datasets
+from climate_ref_core.datasets import SourceDatasetType
+from ref_backend.core.cache import get_database_generation
+from ref_backend.core.execution_filters import INDEXED_FACETS
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+DENSE_FRACTION = 64
+"""A posting is stored as a bitmap once it covers more than 1 in ``DENSE_FRACTION`` of the id range."""
+
+LOAD_BATCH_SIZE = 10_000
+"""Number of dataset rows fetched from the database at a time while building the index."""
+
+
+def _to_bitmap(ids: Iterable[int]) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _facet_values(rows: Iterable[Sequence[Any]]) -> dict[str, set[str]]:
+    values: dict[str, set[str]] = {facet: set() for facet in INDEXED_FACETS}
+    for _, *row_values in rows:
+        for facet, value in zip(INDEXED_FACETS, row_values):
+            if value is not None:
+                values[facet].add(value)
+    return values
+
+
+class IdSet:
+    """
+    Immutable set of dataset ids.
+
+    Stored as a frozenset when sparse and as an ``int`` bitmap when dense (see `IdSet.from_ids`).
+    Iterating yields the ids in ascending order.
+    """
+
+    __slots__ = ("_bitmap", "_bytes", "_ids")
+
+    def __init__(self, ids: frozenset[int] | None = None, bitmap: int | None = None) -> None:
+        self._ids = ids
+        self._bitmap = bitmap
+        self._bytes: bytes | None = None
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int], universe: int) -> "IdSet":
+        """
+        Build a set using the representation suited to its density.
+
+        Parameters
+        ----------
+        ids
+            Ids in the set
+        universe
+            Size of the id range, i.e. one more than the largest id in the catalog
+        """
+        frozen = frozenset(ids)
+        if len(frozen) * DENSE_FRACTION > universe:
+            return cls(bitmap=_to_bitmap(frozen))
+        return cls(ids=frozen)
+
+    @classmethod
+    def from_bitmap(cls, bitmap: int, universe: int) -> "IdSet":
+        """Build a set from an ``int`` bitmap, using the representation suited to its density."""
+        if bitmap.bit_count() * DENSE_FRACTION > universe:
+            return cls(bitmap=bitmap)
+        return cls(ids=frozenset(cls(bitmap=bitmap)))
+
+    @property
+    def is_dense(self) -> bool:
+        """Whether the set is stored as a bitmap."""
+        return self._bitmap is not None
+
+    def _bitmap_bytes(self) -> bytes:
+        # A byte view of the bitmap gives constant time membership tests
+        if self._bytes is None:
+            bitmap = self._bitmap or 0
+            self._bytes = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+        return self._bytes
+
+    def as_bitmap(self) -> int:
+        """Get the set as an ``int`` bitmap."""
+        if self._bitmap is not None:
+            return self._bitmap
+        return _to_bitmap(self._ids or ())
+
+    def __len__(self) -> int:
+        if self._bitmap is not None:
+            return self._bitmap.bit_count()
+        return len(self._ids or ())
+
+    def __contains__(self, item: object) -> bool:
+        if not isinstance(item, int) or item < 0:
+            return False
+        if self._bitmap is None:
+            return item in (self._ids or ())
+        data = self._bitmap_bytes()
+        return item >> 3 < len(data) and bool(data[item >> 3] >> (item & 7) & 1)
+
+    def __iter__(self) -> Iterator[int]:
+        if self._bitmap is None:
+            yield from sorted(self._ids or ())
+            return
+        for offset, byte in enumerate(self._bitmap_bytes()):
+            if byte:
+                base = offset << 3
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield base + bit
+
+    def __and__(self, other: "IdSet") -> "IdSet":
+        if self._bitmap is not None and other._bitmap is not None:
+            return IdSet(bitmap=self._bitmap & other._bitmap)
+        # Probe the larger set with the members of the sparse one
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        if large._bitmap is None:
+            return IdSet(ids=(small._ids or frozenset()) & (large._ids or frozenset()))
+        return IdSet(ids=frozenset(i for i in small if i in large))
+
+    def __or__(self, other: "IdSet") -> "IdSet":
+        if self._bitmap is None and other._bitmap is None:
+            return IdSet(ids=(self._ids or frozenset()) | (other._ids or frozenset()))
+        return IdSet(bitmap=self.as_bitmap() | other.as_bitmap())
+
+    def __repr__(self) -> str:
+        return f"IdSet(len={len(self)}, dense={self.is_dense})"
+
+
+class DatasetFacetIndex:
+    """
+    Dataset ids for each value of each CMIP6 partition facet.
+
+    ``latest`` holds the ids of the latest version of each dataset.
+
+    Instances are not modified once built, so they can be shared between threads;
+    `DatasetFacetIndex.extend` returns a new index.
+    """
+
+    def __init__(
+        self,
+        postings: dict[str, dict[str, IdSet]],
+        latest: IdSet,
+        max_id: int,
+        count: int,
+    ) -> None:
+        self.postings = postings
+        self.latest = latest
+        self.max_id = max_id
+        self.count = count
+
+    @classmethod
+    def build(cls, rows: Iterable[Sequence[Any]], latest_ids: Iterable[int]) -> "DatasetFacetIndex":
+        """
+        Build an index from dataset rows.
+
+        Parameters
+        ----------
+        rows
+            ``(id, *values)`` for each dataset, with values in the order of `INDEXED_FACETS`
+        latest_ids
+            Ids of the latest version of each dataset
+        """
+        empty = cls({facet: {} for facet in INDEXED_FACETS}, IdSet(ids=frozenset()), max_id=0, count=0)
+        return empty.extend(rows, latest_ids)
+
+    def extend(self, rows: Iterable[Sequence[Any]], latest_ids: Iterable[int]) -> "DatasetFacetIndex":
+        """
+        Get a copy of this index with additional dataset rows.
+
+        Only the postings of values that appear in ``rows`` are rebuilt.
+        The latest versions are only replaced for the datasets matching those values,
+        which include every dataset that a new row can supersede.
+
+        Parameters
+        ----------
+        rows
+            ``(id, *values)`` for each new dataset, with values in the order of `INDEXED_FACETS`
+        latest_ids
+            Ids of the latest version of each dataset matching the values of ``rows``
+            (see `_latest_dataset_ids`)
+        """
+        additions: dict[str, dict[str, list[int]]] = {facet: {} for facet in INDEXED_FACETS}
+        max_id = self.max_id
+        count = self.count
+        for dataset_id, *values in rows:
+            max_id = max(max_id, dataset_id)
+            count += 1
+            for facet, value in zip(INDEXED_FACETS, values):
+                if value is not None:
+                    additions[facet].setdefault(value, []).append(dataset_id)
+
+        universe = max_id + 1
+        postings = {facet: dict(facet_postings) for facet, facet_postings in self.postings.items()}
+        for facet, added in additions.items():
+            for value, ids in added.items():
+                posting = IdSet.from_ids(ids, universe)
+                existing = postings[facet].get(value)
+                if existing is not None:
+                    posting = existing | posting
+                    if not posting.is_dense and len(posting) * DENSE_FRACTION > universe:
+                        posting = IdSet(bitmap=posting.as_bitmap())
+                postings[facet][value] = posting
+
+        latest = self.latest.as_bitmap()
+        if latest:
+            # Drop the previous latest versions of the datasets matching the new values,
+            # which are whole partitions of the latest version window (see `_latest_dataset_ids`)
+            touched = DatasetFacetIndex(postings, self.latest, max_id=max_id, count=count).resolve(
+                {facet: added.keys() for facet, added in additions.items() if added}
+            )
+            if touched is not None:
+                latest &= ~touched.as_bitmap()
+        latest |= _to_bitmap(latest_ids)
+
+        return DatasetFacetIndex(postings, IdSet.from_bitmap(latest, universe), max_id=max_id, count=count)
+
+    def resolve(self, facets: Mapping[str, Iterable[str]]) -> IdSet | None:
+        """
+        Get the ids of the datasets that match every facet.
+
+        A dataset matches a facet when its value is any of the given values.
+
+        Returns
+        -------
+        :
+            The matching ids (of every version),
+            or None if a facet is not indexed and the query must be answered with SQL
+        """
+        if not facets or any(facet not in self.postings for facet in facets):
+            return None
+
+        matching: IdSet | None = None
+        # Start from the most selective facet, so the intersections stay small
+        resolved = []
+        for facet, values in facets.items():
+            postings = self.postings[facet]
+            ids = IdSet(ids=frozenset())
+            for value in values:
+                posting = postings.get(str(value))
+                if posting is not None:
+                    ids = ids | posting
+            resolved.append(ids)
+        for ids in sorted(resolved, key=len):
+            matching = ids if matching is None else matching & ids
+        return matching
+
+
+def _latest_dataset_ids(session: Session, facets: Mapping[str, Iterable[str]] | None = None) -> list[int]:
+    # Reuse climate-ref's definition of the latest version, including ties and retracted datasets.
+    # The facets are the partition columns of the latest version window,
+    # so filtering on them only drops whole partitions.
+    adapter = get_dataset_adapter(SourceDatasetType.CMIP6.value)
+    statement = select_datasets(
+        DatasetFilter(
+            source_type=SourceDatasetType.CMIP6,
+            facets={facet: sorted(values) for facet, values in facets.items()} if facets else None,
+            include_retracted=True,
+        ),
+        latest_group_by=adapter.dataset_id_metadata,
+    )
+    return list(session.execute(statement.with_only_columns(CMIP6Dataset.id).order_by(None)).scalars())
+
+
+def _dataset_rows(session: Session, after_id: int) -> Iterator[Sequence[Any]]:
+    facet_columns = [getattr(CMIP6Dataset, facet) for facet in INDEXED_FACETS]
+    statement = (
+        select(CMIP6Dataset.id, *facet_columns)
+        .where(CMIP6Dataset.id > after_id)
+        .order_by(CMIP6Dataset.id)
+        .execution_options(yield_per=LOAD_BATCH_SIZE)
+    )
+    yield from session.execute(statement)
+
+
+def load_dataset_index(session: Session, previous: DatasetFacetIndex | None = None) -> DatasetFacetIndex:
+    """
+    Build the facet index from the database.
+
+    Parameters
+    ----------
+    session
+        Database session
+    previous
+        An earlier index of the same database.
+        Only datasets added since it was built are read,
+        unless datasets have since been removed, in which case the index is rebuilt.
+    """
+    if previous is not None:
+        count = session.execute(select(func.count(CMIP6Dataset.id))).scalar_one()
+        added = session.execute(
+            select(func.count(CMIP6Dataset.id)).where(CMIP6Dataset.id > previous.max_id)
+        ).scalar_one()
+        if previous.count + added == count:
+            if not added:
+                return previous
+            rows = list(_dataset_rows(session, previous.max_id))
+            return previous.extend(rows, _latest_dataset_ids(session, _facet_values(rows)))
+        logger.info("Datasets were removed, rebuilding the dataset facet index")
+
+    return DatasetFacetIndex.build(_dataset_rows(session, 0), _latest_dataset_ids(session))
+
+
+_indexes: dict[str, tuple[str, DatasetFacetIndex]] = {}
+_indexes_lock = threading.Lock()
+_refresh_locks: dict[str, threading.Lock] = {}
+
+
+def get_dataset_index(session: Session, settings: "Settings") -> DatasetFacetIndex | None:
+    """
+    Get the facet index for the database of a session, refreshing it when the database has changed.
+
+    The index lives in worker memory rather than in the shared cache backend,
+    as it is far larger than a query result and is only useful unpickled.
+    A single thread per database loads a new index,
+    while the others keep using the previous one (or wait for it, if there is none yet).
+
+    Returns
+    -------
+    :
+        The index, or None if ``DATASET_INDEX_ENABLED`` is off
+    """
+    if not settings.DATASET_INDEX_ENABLED:
+        return None
+
+    url = str(session.get_bind().engine.url)
+    generation = get_database_generation(session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS)
+    with _indexes_lock:
+        current = _indexes.get(url)
+        if current is not None and current[0] == generation:
+            return current[1]
+        refresh_lock = _refresh_locks.setdefault(url, threading.Lock())
+
+    if current is None:
+        refresh_lock.acquire()
+    elif not refresh_lock.acquire(blocking=False):
+        return current[1]
+    try:
+        # Another thread may have loaded the index while this one waited
+        with _indexes_lock:
+            current = _indexes.get(url)
+        if current is not None and current[0] == generation:
+            return current[1]
+        index = load_dataset_index(session, previous=current[1] if current else None)
+        with _indexes_lock:
+            _indexes[url] = (generation, index)
+        return index
+    finally:
+        refresh_lock.release()
+
+
+def resolve_dataset_ids(
+    session: Session, settings: "Settings", facets: Mapping[str, Iterable[str]], *, latest_only: bool = False
+) -> IdSet | None:
+    """
+    Resolve facet filters to the ids of the matching CMIP6 datasets.
+
+    Parameters
+    ----------
+    session
+        Database session
+    settings
+        Application settings
+    facets
+        Values to match for each facet, as in `DatasetFacetIndex.resolve`
+    latest_only
+        Only include the latest version of each dataset
+
+    Returns
+    -------
+    :
+        The matching ids, or None if the filters should be applied in SQL instead:
+        the index is disabled, a facet is not indexed,
+        or more than ``DATASET_INDEX_MAX_IDS`` datasets match
+        (a long id list is slower to send to the database than the facet filter itself)
+    """
+    index = get_dataset_index(session, settings)
+    if index is None:
+        return None
+    ids = index.resolve(facets)
+    if ids is None:
+        return None
+    if latest_only:
+        ids = ids & index.latest
+    if len(ids) > settings.DATASET_INDEX_MAX_IDS:
+        return None
+    return ids
@@ -0,0 +1,148 @@
+"""
+Filtering the executions of a diagnostic by the facets of their input datasets.
+
+An execution matches a set of filters when, for every filter,
+at least one of its CMIP6 input datasets matches that filter.
+
+The facets that are filtered most often are resolved with a per-diagnostic inverted index
+(facet value to execution ids), which is built with one query per database generation.
+Filters on other columns become ``EXISTS`` semi-joins against the dataset link table,
+so an execution is returned once however many of its datasets match.
+"""
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import ColumnElement, Select, and_, exists, inspect, select
+from sqlalchemy.orm import Session
+
+from climate_ref import models
+from climate_ref.models.dataset import CMIP6Dataset
+from climate_ref.models.execution import execution_datasets
+from ref_backend.core.cache import get_cache, get_database_generation
+from ref_backend.core.filter_utils import build_filter_clause, build_id_clause, parse_filter_values
+
+if TYPE_CHECKING:
+    from ref_backend.api.deps import AppContext
+
+INDEXED_FACETS = (
+    "activity_id",
+    "experiment_id",
+    "grid_label",
+    "institution_id",
+    "member_id",
+    "source_id",
+    "table_id",
+    "variable_id",
+)
+"""CMIP6 facets that are resolved with the per-diagnostic index rather than with SQL."""
+
+ExecutionFacetIndex = dict[str, dict[str, frozenset[int]]]
+"""Execution ids for each value of each indexed facet, keyed by facet then value."""
+
+
+def dataset_filter_columns() -> frozenset[str]:
+    """Names of the CMIP6 dataset columns that executions can be filtered on."""
+    return frozenset(attr.key for attr in inspect(CMIP6Dataset).column_attrs)
+
+
+def parse_dataset_filters(query_params: Mapping[str, str]) -> dict[str, str]:
+    """
+    Extract dataset filters from arbitrary query parameters.
+
+    Parameters that are not CMIP6 dataset columns are ignored.
+    """
+    columns = dataset_filter_columns()
+    return {key: value for key, value in query_params.items() if key in columns}
+
+
+def build_execution_facet_index(session: Session, diagnostic_id: int) -> ExecutionFacetIndex:
+    """
+    Build the inverted facet index for the executions of a diagnostic.
+
+    Reads each (execution, dataset) link of the diagnostic once.
+    """
+    facet_columns = [getattr(CMIP6Dataset, facet) for facet in INDEXED_FACETS]
+    rows = session.execute(
+        select(execution_datasets.c.execution_id, *facet_columns)
+        .join(CMIP6Dataset, CMIP6Dataset.id == execution_datasets.c.dataset_id)
+        .join(models.Execution, models.Execution.id == execution_datasets.c.execution_id)
+        .join(models.ExecutionGroup, models.ExecutionGroup.id == models.Execution.execution_group_id)
+        .where(models.ExecutionGroup.diagnostic_id == diagnostic_id)
+    )
+
+    postings: dict[str, dict[str, set[int]]] = {facet: {} for facet in INDEXED_FACETS}
+    for execution_id, *values in rows:
+        for facet, value in zip(INDEXED_FACETS, values):
+            if value is not None:
+                postings[facet].setdefault(value, set()).add(execution_id)
+
+    return {
+        facet: {value: frozenset(ids) for value, ids in values_to_ids.items()}
+        for facet, values_to_ids in postings.items()
+    }
+
+
+def get_execution_facet_index(app_context: "AppContext", diagnostic_id: int) -> ExecutionFacetIndex:
+    """Get the facet index for a diagnostic, rebuilding it when new executions are written."""
+    settings = app_context.settings
+    if settings.QUERY_CACHE_MAX_ENTRIES <= 0:
+        return build_execution_facet_index(app_context.session, diagnostic_id)
+
+    generation = get_database_generation(
+        app_context.session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS
+    )
+    return get_cache("execution_facet_index", settings).get_or_compute(
+        str(diagnostic_id),
+        generation,
+        lambda: build_execution_facet_index(app_context.session, diagnostic_id),
+    )
+
+
+def _dataset_exists(clause: ColumnElement[bool]) -> ColumnElement[bool]:
+    """Require at least one input dataset of the execution to satisfy ``clause``."""
+    return exists(
+        select(execution_datasets.c.execution_id)
+        .join(CMIP6Dataset, CMIP6Dataset.id == execution_datasets.c.dataset_id)
+        .where(and_(execution_datasets.c.execution_id == models.Execution.id, clause))
+    )
+
+
+def select_diagnostic_executions(
+    app_context: "AppContext", diagnostic_id: int, filters: Mapping[str, Any]
+) -> Select[models.Execution]:
+    """
+    Select the executions of a diagnostic that match dataset filters, ordered by id.
+
+    Parameters
+    ----------
+    app_context
+        Application context
+    diagnostic_id
+        Id of the diagnostic whose executions are selected
+    filters
+        Dataset filters, keyed by CMIP6 dataset column (see `parse_dataset_filters`).
+        Values are parsed by `build_filter_clause`, so a comma-separated value matches any of its items.
+    """
+    statement = (
+        select(models.Execution)
+        .join(models.ExecutionGroup, models.ExecutionGroup.id == models.Execution.execution_group_id)
+        .where(models.ExecutionGroup.diagnostic_id == diagnostic_id)
+        .order_by(models.Execution.id)
+    )
+
+    indexed = {key: value for key, value in filters.items() if key in INDEXED_FACETS}
+    if indexed:
+        index = get_execution_facet_index(app_context, diagnostic_id)
+        matching: frozenset[int] | None = None
+        for facet, value in indexed.items():
+            ids = frozenset().union(*(index[facet].get(v, frozenset()) for v in parse_filter_values(value)))
+            matching = ids if matching is None else matching & ids
+        statement = statement.where(build_id_clause(models.Execution.id, matching or frozenset()))
+
+    for key, value in filters.items():
+        if key not in INDEXED_FACETS:
+            clause = build_filter_clause(getattr(CMIP6Dataset, key), value)
+            statement = statement.where(_dataset_exists(clause))
+
+    return statement
@@ -0,0 +1,308 @@
+"""
+Precomputed data for the cards of the explorer collections.
+
+The content of every card is declared in the collection YAML files,
+so the values, filter options and figures it shows are the same for every visitor
+until new executions are written.
+They are built for a whole collection at once and cached under the database generation,
+so the explorer pages are served from the cache after the first visit,
+or after `materialize_explorer_cards` has been run following a batch of executions.
+"""
+
+from typing import TYPE_CHECKING, Literal
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import select, tuple_
+
+from climate_ref import models
+from climate_ref.models.execution import ResultOutputType
+from ref_backend.core.cache import get_cache, get_database_generation
+from ref_backend.core.collections import (
+    AFTCollectionCardContent,
+    AFTCollectionDetail,
+    load_all_collections,
+)
+from ref_backend.core.metric_values import MetricValueType, parse_id_list
+from ref_backend.core.output_catalog import CatalogEntry, OutputCatalog, get_output_catalog
+from ref_backend.core.reader_values import fetch_metric_value_batch, is_diagnostic_hidden
+from ref_backend.models import MetricValueCollection, MetricValueQuery, SeriesValue
+
+if TYPE_CHECKING:
+    from ref_backend.api.deps import AppContext
+
+# Number of values loaded for a card, matching what the explorer requests
+CARD_VALUES_LIMIT = 500
+
+
+class ExplorerCardFigure(BaseModel):
+    """A figure shown by a figure gallery card"""
+
+    id: int
+    execution_group_id: int
+    filename: str
+    description: str | None = None
+    url: str
+
+
+class ExplorerCardData(BaseModel):
+    """
+    The data shown by one content item of an explorer card
+
+    Values are loaded with the card's ``other_filters`` and the defaults of its filter controls,
+    and the options of each filter control are the facets of the values without those filters.
+    """
+
+    type: Literal["box-whisker-chart", "figure-gallery", "series-chart", "taylor-diagram"]
+    provider: str
+    diagnostic: str
+    status_code: int = 200
+    detail: str | None = None
+    values: MetricValueCollection | None = None
+    filter_options: dict[str, list[str]] = Field(default_factory=dict)
+    figures: list[ExplorerCardFigure] | None = None
+
+
+class ExplorerCollectionCards(BaseModel):
+    """
+    The data of every card of a collection
+
+    ``cards[i][j]`` is the data of ``explorer_cards[i].content[j]`` of the collection.
+    """
+
+    collection_id: str
+    cards: list[list[ExplorerCardData]]
+
+
+def _value_type(content: AFTCollectionCardContent) -> MetricValueType | None:
+    if content.placeholder or content.type == "figure-gallery":
+        return None
+    return MetricValueType.SERIES if content.type == "series-chart" else MetricValueType.SCALAR
+
+
+def _card_queries(content: AFTCollectionCardContent) -> list[MetricValueQuery]:
+    """
+    Build the queries the explorer makes for a card: its values, then the options of its filter controls.
+    """
+    value_type = _value_type(content)
+    if value_type is None:
+        return []
+
+    other_filters = dict(content.other_filters or {})
+    # The explorer sends the id filters of a card with both queries
+    isolate_ids = other_filters.pop("isolate_ids", None)
+    exclude_ids = other_filters.pop("exclude_ids", None)
+    isolate = parse_id_list(isolate_ids) if isolate_ids else None
+    exclude = parse_id_list(exclude_ids) if exclude_ids else None
+    controls = content.filter_controls or []
+    filters = {**other_filters}
+    for control in controls:
+        if control.default_value:
+            filters[control.filter_key] = control.default_value
+
+    queries = [
+        MetricValueQuery(
+            provider_slug=content.provider,
+            diagnostic_slug=content.diagnostic,
+            value_type=value_type,
+            filters=filters,
+            limit=CARD_VALUES_LIMIT,
+            isolate_ids=isolate,
+            exclude_ids=exclude,
+        )
+    ]
+    if controls:
+        controlled = {control.filter_key for control in controls}
+        queries.append(
+            MetricValueQuery(
+                provider_slug=content.provider,
+                diagnostic_slug=content.diagnostic,
+                value_type=value_type,
+                filters={k: v for k, v in other_filters.items() if k not in controlled},
+                limit=1,
+                isolate_ids=isolate,
+                exclude_ids=exclude,
+            )
+        )
+    return queries
+
+
+def downsample_series(value: SeriesValue, max_points: int) -> SeriesValue:
+    """
+    Thin a series to at most ``max_points`` evenly spaced points, keeping the first and last points.
+    """
+    n = len(value.values)
+    if max_points < 2 or n <= max_points:  # noqa: PLR2004
+        return value
+    step = (n - 1) / (max_points - 1)
+    positions = [round(i * step) for i in range(max_points)]
+    return value.model_copy(
+        update={
+            "values": [value.values[i] for i in positions],
+            "index": [value.index[i] for i in positions] if value.index and len(value.index) == n else None,
+        }
+    )
+
+
+def _downsample(collection: MetricValueCollection, max_points: int) -> MetricValueCollection:
+    data = [
+        downsample_series(item, max_points) if isinstance(item, SeriesValue) else item
+        for item in collection.data
+    ]
+    return collection.model_copy(update={"data": data})
+
+
+def _diagnostic_ids(
+    app_context: "AppContext", contents: list[AFTCollectionCardContent]
+) -> dict[tuple[str, str], int]:
+    """Look up the ids of the visible diagnostics of some cards."""
+    settings = app_context.settings
+    keys = {
+        (content.provider, content.diagnostic)
+        for content in contents
+        if not is_diagnostic_hidden(settings, content.provider, content.diagnostic)
+    }
+    if not keys:
+        return {}
+    rows = app_context.session.execute(
+        select(models.Provider.slug, models.Diagnostic.slug, models.Diagnostic.id)
+        .join(models.Diagnostic.provider)
+        .where(tuple_(models.Provider.slug, models.Diagnostic.slug).in_(keys))
+    )
+    return {
+        (provider_slug, diagnostic_slug): diagnostic_id
+        for provider_slug, diagnostic_slug, diagnostic_id in rows
+    }
+
+
+def _match_figures(catalog: OutputCatalog, filename_filter: str | None) -> list[CatalogEntry]:
+    """
+    Select the figures matching a card's ``filename_filter``
+
+    As in the explorer, the filter is a regular expression searched for in the filename and description
+    of each figure, and an invalid expression matches every figure.
+    """
+    try:
+        return catalog.match(filename_filter, output_type=ResultOutputType.Plot)
+    except ValueError:
+        return catalog.match(output_type=ResultOutputType.Plot)
+
+
+def _filter_options(
+    content: AFTCollectionCardContent, unfiltered: MetricValueCollection
+) -> dict[str, list[str]]:
+    facets = {facet.key: facet.values for facet in unfiltered.facets}
+    options = {}
+    for control in content.filter_controls or []:
+        excluded = set(control.exclude_values or [])
+        options[control.filter_key] = [
+            value for value in facets.get(control.filter_key, []) if value not in excluded
+        ]
+    return options
+
+
+def _gallery_figures(
+    app_context: "AppContext", diagnostic_id: int, filename_filter: str | None
+) -> list[ExplorerCardFigure]:
+    settings = app_context.settings
+    catalog = get_output_catalog(app_context, diagnostic_id)
+    return [
+        ExplorerCardFigure(
+            id=entry.output_id,
+            execution_group_id=entry.execution_group_id,
+            filename=entry.filename,
+            description=entry.description,
+            url=f"{settings.BACKEND_HOST}{settings.API_V1_STR}/results/{entry.output_id}",
+        )
+        for entry in _match_figures(catalog, filename_filter)
+    ]
+
+
+def build_collection_cards(
+    app_context: "AppContext", collection: AFTCollectionDetail
+) -> ExplorerCollectionCards:
+    """
+    Compute the data of every card of a collection.
+
+    The values queries of all the cards are answered as one batch,
+    and the figures of the gallery cards are matched against the output catalog of their diagnostic.
+    """
+    contents = [content for card in collection.explorer_cards for content in card.content]
+    card_queries: list[list[MetricValueQuery]] = []
+    errors: dict[int, HTTPException] = {}
+    for i, content in enumerate(contents):
+        try:
+            card_queries.append(_card_queries(content))
+        except HTTPException as exc:
+            # e.g. ids in ``other_filters`` that are not integers
+            card_queries.append([])
+            errors[i] = exc
+    results = iter(fetch_metric_value_batch(app_context, [q for queries in card_queries for q in queries]))
+    galleries = [c for c in contents if c.type == "figure-gallery" and not c.placeholder]
+    diagnostic_ids = _diagnostic_ids(app_context, galleries)
+    max_points = app_context.settings.EXPLORER_CARD_SERIES_MAX_POINTS
+
+    data = []
+    for i, (content, queries) in enumerate(zip(contents, card_queries, strict=True)):
+        item = ExplorerCardData(type=content.type, provider=content.provider, diagnostic=content.diagnostic)
+        if i in errors:
+            item.status_code, item.detail = errors[i].status_code, str(errors[i].detail)
+        elif queries:
+            values = next(results)
+            options = next(results) if len(queries) > 1 else None
+            if values.result is None:
+                item.status_code, item.detail = values.status_code, values.detail
+            else:
+                item.values = _downsample(values.result, max_points)
+            if options is not None and options.result is not None:
+                item.filter_options = _filter_options(content, options.result)
+        elif content.type == "figure-gallery" and not content.placeholder:
+            diagnostic_id = diagnostic_ids.get((content.provider, content.diagnostic))
+            if diagnostic_id is None:
+                item.status_code, item.detail = 404, "Diagnostic not found"
+            else:
+                item.figures = _gallery_figures(app_context, diagnostic_id, content.filename_filter)
+        data.append(item)
+
+    cards = []
+    start = 0
+    for card in collection.explorer_cards:
+        cards.append(data[start : start + len(card.content)])
+        start += len(card.content)
+    return ExplorerCollectionCards(collection_id=collection.id, cards=cards)
+
+
+def get_collection_cards(
+    app_context: "AppContext", collection: AFTCollectionDetail
+) -> ExplorerCollectionCards:
+    """Get the data of every card of a collection, reusing it until new executions are written."""
+    settings = app_context.settings
+    if settings.QUERY_CACHE_MAX_ENTRIES <= 0:
+        return build_collection_cards(app_context, collection)
+
+    cache = get_cache("explorer_cards", settings)
+    generation = get_database_generation(
+        app_context.session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS
+    )
+    return cache.get_or_compute(
+        collection.id, generation, lambda: build_collection_cards(app_context, collection)
+    )
+
+
+def materialize_explorer_cards(app_context: "AppContext") -> list[str]:
+    """
+    Compute the card data of every collection into the cache.
+
+    Run after a batch of executions has been written, so no visitor waits for the computation.
+    This only helps the workers when the cache is shared between them,
+    i.e. with the ``sqlite`` or ``redis`` ``CACHE_BACKEND``.
+
+    Returns
+    -------
+    :
+        The ids of the collections that were computed
+    """
+    collections = load_all_collections()
+    for collection in collections.values():
+        get_collection_cards(app_context, collection)
+    return list(collections)
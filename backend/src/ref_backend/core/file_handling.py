@@ -1,8 +1,21 @@
+import mimetypes
+import os
+import stat
+import threading
+import time
 from collections.abc import Callable, Generator
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from fastapi import HTTPException
 
+from ref_backend.core.cache import CacheStats, LRUCache
+from ref_backend.core.telemetry import timed
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
 
 def resolve_artifact(resolve: Callable[..., Path], *parts: str) -> Path:
     """
@@ -36,5 +49,172 @@ def file_iterator(file_path: str, chunk_size: int = 1024) -> Generator[bytes]:
         Size of each chunk to read from the file
     """
     with open(file_path, "rb") as file:
-        while chunk := file.read(chunk_size):
+        while True:
+            with timed("file"):
+                chunk = file.read(chunk_size)
+            if not chunk:
+                return
             yield chunk
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """Metadata of a file in the results directory"""
+
+    path: Path
+    size: int
+    mtime: float
+    """Modification time as a POSIX timestamp"""
+    mime_type: str | None
+
+
+def _file_info(path: Path, stat: os.stat_result) -> FileInfo:
+    mime_type, _encoding = mimetypes.guess_type(path)
+    return FileInfo(path=path, size=stat.st_size, mtime=stat.st_mtime, mime_type=mime_type)
+
+
+def _list_files(directory: Path) -> list[FileInfo] | None:
+    """
+    List the regular files below a directory, recursively, without following links to directories.
+
+    Returns None if ``directory`` is not a directory.
+    Unreadable subdirectories are skipped, as ``os.walk`` does.
+    """
+    files = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(Path(entry.path))
+                    elif entry.is_file():
+                        files.append(_file_info(Path(entry.path), entry.stat()))
+        except OSError:
+            if current == directory:
+                return None
+    return files
+
+
+class FileMetadataCache:
+    """
+    Metadata of the files in the results directory, reused for ``ttl_seconds``.
+
+    The results directory is often on a network filesystem, where every ``stat`` is a round trip.
+    Looking up a file with ``prefetch`` set to its execution's output directory
+    lists that whole directory the first time,
+    so the other outputs of the execution are then found without touching the filesystem.
+
+    Missing files and directories are not cached,
+    so the outputs of a new execution are found as soon as they are written.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        Hits and misses of the lookups of files and directories
+
+        Each call of `stat` or `listing` is one hit, if it was answered from the cache, or one miss.
+        """
+        return CacheStats(hits=self._hits, misses=self._misses, evictions=self._entries.stats.evictions)
+
+    def listing(self, directory: Path) -> list[FileInfo] | None:
+        """
+        List the regular files below a directory, recursively.
+
+        Returns None if ``directory`` is not a directory.
+        """
+        cached = self._entries.get(f"dir:{directory}")
+        if cached is not None:
+            self._hits += 1
+            return cached  # type: ignore[no-any-return]
+        self._misses += 1
+        return self._list(directory)
+
+    def _list(self, directory: Path) -> list[FileInfo] | None:
+        with timed("file"):
+            files = _list_files(directory)
+        if files is None:
+            return None
+        # Cache each file for later lookups, unless that would push most other entries out
+        if len(files) <= self._entries.max_entries // 2:
+            for info in files:
+                self._entries.set(f"file:{info.path}", info)
+        # Stored last, so the entries of its files never evict it
+        self._entries.set(f"dir:{directory}", files)
+        return files
+
+    def stat(self, path: Path, prefetch: Path | None = None) -> FileInfo | None:
+        """
+        Get the metadata of a regular file, or None if it is missing.
+
+        Parameters
+        ----------
+        path
+            Path to the file
+        prefetch
+            Directory containing ``path``, such as the execution's output directory,
+            whose files are all cached if it has not been listed yet.
+            Ignored when the cache is disabled.
+        """
+        cached = self._entries.get(f"file:{path}")
+        if cached is not None:
+            self._hits += 1
+            return cached  # type: ignore[no-any-return]
+
+        self._misses += 1
+        if self._entries.max_entries <= 0:
+            prefetch = None
+        if prefetch is not None and path.is_relative_to(prefetch):
+            if self._entries.get(f"dir:{prefetch}") is None:
+                files = self._list(prefetch)
+                for info in files or []:
+                    if info.path == path:
+                        return info
+
+        try:
+            with timed("file"):
+                result = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(result.st_mode):
+            return None
+        info = _file_info(path, result)
+        self._entries.set(f"file:{path}", info)
+        return info
+
+
+_metadata_caches: dict[tuple[int, float], FileMetadataCache] = {}
+_metadata_caches_lock = threading.Lock()
+
+
+def get_file_metadata_cache(settings: "Settings") -> FileMetadataCache:
+    """Get the worker-wide cache of the metadata of the results directory."""
+    key = (settings.RESULTS_METADATA_CACHE_MAX_ENTRIES, settings.RESULTS_METADATA_CACHE_TTL_SECONDS)
+    with _metadata_caches_lock:
+        if key not in _metadata_caches:
+            _metadata_caches[key] = FileMetadataCache(max_entries=key[0], ttl_seconds=key[1])
+        return _metadata_caches[key]
+
+
+def file_metadata_statistics() -> CacheStats:
+    """Get the statistics of the file metadata caches opened in this worker."""
+    total = CacheStats()
+    with _metadata_caches_lock:
+        caches = list(_metadata_caches.values())
+    for cache in caches:
+        total.hits += cache.stats.hits
+        total.misses += cache.stats.misses
+        total.evictions += cache.stats.evictions
+    return total
@@ -3,8 +3,10 @@
 Shared utilities for parsing multi-value query parameters
 """
 
+from collections.abc import Collection
 from typing import Any
 
+from sqlalchemy import ColumnElement, bindparam, false
 from sqlalchemy.sql.elements import BinaryExpression
 
 
@@ -64,3 +66,31 @@ def build_filter_clause(column: Any, value: Any) -> BinaryExpression[Any]:
 
     # Default: equality
     return column == value
+
+
+def parse_filter_values(value: Any) -> list[str]:
+    """
+    Get the values a filter matches, following the same rules as `build_filter_clause`.
+
+    A list or a comma-separated string matches any of its items,
+    and anything else matches only itself.
+    """
+    vals = _normalize_list_from_value(value)
+    if vals:
+        return vals
+    return [str(value)]
+
+
+def build_id_clause(column: Any, ids: Collection[int]) -> ColumnElement[bool]:
+    """
+    Build a clause restricting `column` to a set of integer ids.
+
+    The ids are rendered into the SQL rather than bound one parameter per id,
+    so the set can be larger than the database's limit on bound parameters.
+    An empty set matches nothing.
+    """
+    if not ids:
+        return false()
+    return column.in_(
+        bindparam(f"{column.key}_ids", sorted(ids), unique=True, expanding=True, literal_execute=True)
+    )
@@ -0,0 +1,168 @@
+"""
+HTTP caching for the read-only API.
+
+Responses only change when new results are written to the database,
+so an ETag built from the database generation and the request URL identifies a response
+without having to run the route.
+A client or CDN that revalidates with ``If-None-Match`` gets a ``304 Not Modified``
+straight from the middleware, and ``Cache-Control`` lets a CDN serve repeat requests itself.
+"""
+
+import hashlib
+import importlib.metadata
+import re
+from collections.abc import Mapping
+
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from climate_ref.database import Database
+from ref_backend.core.cache import get_database_generation
+from ref_backend.core.config import Settings
+
+NO_STORE = "no-store"
+# For content that changes as new executions are written
+DATABASE_CONTENT = "public, max-age=60, stale-while-revalidate=300"
+
+# Key in the ASGI scope state holding the ETag of the response being produced,
+# which lets inner middleware reuse work for identical content
+ETAG_STATE_KEY = "http_cache_etag"
+
+DEFAULT_CACHE_POLICIES: Mapping[str, str] = {
+    # Health checks must always reach a worker
+    "/utils": NO_STORE,
+    # Curated content that only changes between deployments
+    "/explorer": "public, max-age=300, stale-while-revalidate=3600",
+    # except for the data of the cards, which comes from the database
+    "/explorer/collections/{collection_id}/cards": DATABASE_CONTENT,
+    "/cmip7-aft-diagnostics": "public, max-age=300, stale-while-revalidate=3600",
+    # Output files are never rewritten once an execution has finished
+    "/results": "public, max-age=3600",
+    # Everything else changes as new executions are written
+    "": DATABASE_CONTENT,
+}
+"""
+``Cache-Control`` policy for each router, keyed by the router prefix.
+
+A ``{parameter}`` in a prefix matches any one path segment.
+The longest matching prefix applies.
+"""
+
+
+def _compile_prefix(prefix: str) -> re.Pattern[str]:
+    """Compile a policy prefix, in which each ``{parameter}`` matches one path segment."""
+    parts = re.split(r"\{[^}]*\}", prefix)
+    return re.compile("[^/]+".join(re.escape(part) for part in parts))
+
+
+def _content_version(settings: Settings) -> str:
+    """
+    Identify everything other than the database that determines the content of a response.
+
+    Responses depend on the deployed code and on the settings (e.g. the excluded diagnostics),
+    both of which are the same for every worker of a deployment.
+    """
+    version = importlib.metadata.version("ref-backend")
+    settings_hash = hashlib.sha256(settings.model_dump_json().encode()).hexdigest()[:12]
+    return f"{version}:{settings_hash}"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an ``If-None-Match`` header against an ETag, using weak comparison."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+class HTTPCacheMiddleware:
+    """
+    Add ``ETag`` and ``Cache-Control`` headers to successful API responses.
+
+    Only ``GET`` and ``HEAD`` requests under ``prefix`` are handled.
+    A request whose ``If-None-Match`` matches the current ETag is answered with a
+    ``304 Not Modified`` without calling the route.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        database: Database,
+        settings: Settings,
+        prefix: str,
+        policies: Mapping[str, str] = DEFAULT_CACHE_POLICIES,
+    ) -> None:
+        self.app = app
+        self.database = database
+        self.prefix = prefix
+        self.policies = [
+            (_compile_prefix(route_prefix), policy)
+            for route_prefix, policy in sorted(policies.items(), key=lambda item: len(item[0]), reverse=True)
+        ]
+        self.generation_check_seconds = settings.DATABASE_GENERATION_CHECK_SECONDS
+        self.content_version = _content_version(settings)
+
+    def policy_for(self, path: str) -> str | None:
+        """Get the ``Cache-Control`` policy for a request path, or None if it is not an API path."""
+        if not path.startswith(self.prefix):
+            return None
+        route_path = path.removeprefix(self.prefix)
+        for route_prefix, policy in self.policies:
+            if route_prefix.match(route_path):
+                return policy
+        return None
+
+    def _generation(self) -> str:
+        with self.database.session_scope() as session:
+            return get_database_generation(session, max_age_seconds=self.generation_check_seconds)
+
+    def _etag(self, generation: str, scope: Scope) -> str:
+        digest = hashlib.sha256(
+            "\n".join(
+                [self.content_version, generation, scope["path"], scope["query_string"].decode("latin-1")]
+            ).encode()
+        ).hexdigest()[:32]
+        # Weak, because compression may change the bytes without changing the content
+        return f'W/"{digest}"'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policy_for(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        if policy == NO_STORE:
+            etag = None
+        else:
+            generation = await run_in_threadpool(self._generation)
+            etag = self._etag(generation, scope)
+            scope.setdefault("state", {})[ETAG_STATE_KEY] = etag
+
+            if_none_match = Headers(scope=scope).get("if-none-match")
+            if if_none_match and _etag_matches(if_none_match, etag):
+                response = Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": policy}
+                )
+                await response(scope, receive, send)
+                return
+
+        async def send_with_cache_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if message["status"] == status.HTTP_200_OK:
+                    headers.setdefault("Cache-Control", policy)
+                    if etag is not None:
+                        headers.setdefault("ETag", etag)
+                else:
+                    headers.setdefault("Cache-Control", NO_STORE)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
@@ -0,0 +1,365 @@
+"""
+Lookup of the latest execution of each execution group.
+
+The latest execution of a group is the one with the largest id.
+Every answer about the latest execution, whether from the lookup, from SQL or from loaded executions,
+goes through this module so they all agree.
+
+Whether an execution group is successful depends on its latest execution,
+which SQL can only find by grouping every execution by group (``max(execution.id)``).
+Instead each worker keeps arrays indexed by execution group id,
+holding the id and success of the latest execution and the diagnostic of the group,
+so success filters become primary key filters and success counts need no query at all.
+
+The lookup is refreshed incrementally when the database generation changes:
+only executions added or updated since the last refresh are read.
+When the lookup is disabled the same answers are derived in SQL.
+"""
+
+import datetime
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+from sqlalchemy import ColumnElement, Subquery, func, or_, select
+from sqlalchemy.orm import Session
+
+from climate_ref import models
+from ref_backend.core.cache import get_database_generation
+from ref_backend.core.filter_utils import build_id_clause
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+
+RUNNING = 2
+"""Value of `LatestExecutions.successful` for a latest execution that has not finished"""
+
+
+def _grow(values: array, size: int) -> None:  # type: ignore[type-arg]
+    if len(values) < size:
+        values.frombytes(bytes(values.itemsize * (size - len(values))))
+
+
+@dataclass(frozen=True)
+class LatestExecutions:
+    """
+    The latest execution of each execution group, as arrays indexed by execution group id.
+
+    Instances are not modified once built, so they can be shared between request threads.
+    """
+
+    execution_ids: "array[int]"
+    """Id of the latest execution of each group, or 0 if the group has no executions"""
+    successful: bytearray
+    """1 if the latest execution of the group was successful, 0 if it failed, or `RUNNING`"""
+    diagnostic_ids: "array[int]"
+    """Diagnostic of each group, or 0 if there is no group with that id"""
+    execution_count: int
+    max_execution_id: int
+    max_updated_at: datetime.datetime | None
+
+    def latest_execution_id(self, group_id: int) -> int | None:
+        """Get the id of the latest execution of a group, or None if it has no executions."""
+        if 0 <= group_id < len(self.execution_ids):
+            return self.execution_ids[group_id] or None
+        return None
+
+    @cached_property
+    def _group_ids(self) -> dict[bool, list[int]]:
+        groups: dict[bool, list[int]] = {True: [], False: []}
+        for group_id, execution_id in enumerate(self.execution_ids):
+            outcome = self.successful[group_id]
+            if execution_id and outcome != RUNNING:
+                groups[bool(outcome)].append(group_id)
+        return groups
+
+    def group_ids(self, successful: bool) -> list[int]:
+        """Get the ids of the groups whose latest execution was, or was not, successful."""
+        return self._group_ids[successful]
+
+    @cached_property
+    def successful_group_counts(self) -> dict[int, int]:
+        """The number of groups whose latest execution was successful, by diagnostic id"""
+        return dict(Counter(self.diagnostic_ids[group_id] for group_id in self._group_ids[True]))
+
+    def extend(
+        self,
+        groups: Iterable[Sequence[Any]],
+        executions: Iterable[Sequence[Any]],
+        *,
+        execution_count: int,
+        max_execution_id: int,
+        max_updated_at: datetime.datetime | None,
+    ) -> "LatestExecutions":
+        """
+        Build a new lookup with added groups and added or updated executions.
+
+        Parameters
+        ----------
+        groups
+            ``(group id, diagnostic id)`` rows of the added execution groups
+        executions
+            ``(execution id, group id, successful)`` rows of the added or updated executions.
+            Rows for executions that are not the latest of their group are ignored.
+        execution_count
+            Total number of executions in the database
+        max_execution_id
+            Largest execution id in the database
+        max_updated_at
+            Newest ``updated_at`` of the executions in the database
+        """
+        execution_ids = array("q", self.execution_ids)
+        successful = bytearray(self.successful)
+        diagnostic_ids = array("q", self.diagnostic_ids)
+
+        for group_id, diagnostic_id in groups:
+            _grow(diagnostic_ids, group_id + 1)
+            diagnostic_ids[group_id] = diagnostic_id
+
+        _grow(execution_ids, len(diagnostic_ids))
+        successful.extend(bytes(len(diagnostic_ids) - len(successful)))
+        for execution_id, group_id, is_successful in executions:
+            if group_id >= len(execution_ids):
+                # Written after the groups were read, so it is picked up by the next refresh
+                continue
+            if execution_id >= execution_ids[group_id]:
+                execution_ids[group_id] = execution_id
+                successful[group_id] = RUNNING if is_successful is None else bool(is_successful)
+
+        return LatestExecutions(
+            execution_ids=execution_ids,
+            successful=successful,
+            diagnostic_ids=diagnostic_ids,
+            execution_count=execution_count,
+            max_execution_id=max_execution_id,
+            max_updated_at=max_updated_at,
+        )
+
+    @classmethod
+    def empty(cls) -> "LatestExecutions":
+        """Create a lookup without any execution groups."""
+        return cls(
+            execution_ids=array("q"),
+            successful=bytearray(),
+            diagnostic_ids=array("q"),
+            execution_count=0,
+            max_execution_id=0,
+            max_updated_at=None,
+        )
+
+
+def latest_execution_subquery(group_ids: Sequence[int] | None = None) -> Subquery:
+    """
+    Select the id of the latest execution of each group, as ``execution_group_id`` and ``execution_id``.
+
+    Parameters
+    ----------
+    group_ids
+        Only select the latest executions of these groups, rather than of every group
+    """
+    statement = select(
+        models.Execution.execution_group_id,
+        func.max(models.Execution.id).label("execution_id"),
+    ).group_by(models.Execution.execution_group_id)
+    if group_ids is not None:
+        statement = statement.where(build_id_clause(models.Execution.execution_group_id, group_ids))
+    return statement.subquery()
+
+
+def pick_latest_execution(executions: Iterable[models.Execution]) -> models.Execution | None:
+    """Pick the latest of some already loaded executions of a group, or None if there are none."""
+    return max(executions, key=lambda execution: execution.id, default=None)
+
+
+def load_latest_executions(session: Session, previous: LatestExecutions | None = None) -> LatestExecutions:
+    """
+    Build the lookup from the database.
+
+    Parameters
+    ----------
+    session
+        Database session
+    previous
+        An earlier lookup of the same database.
+        Only execution groups and executions added or updated since it was built are read,
+        unless executions have since been removed, in which case the lookup is rebuilt.
+    """
+    execution_count, max_execution_id, max_updated_at = session.execute(
+        select(
+            func.count(models.Execution.id),
+            func.coalesce(func.max(models.Execution.id), 0),
+            func.max(models.Execution.updated_at),
+        )
+    ).one()
+    state: dict[str, Any] = {
+        "execution_count": execution_count,
+        "max_execution_id": max_execution_id,
+        "max_updated_at": max_updated_at,
+    }
+
+    if previous is not None and previous.max_updated_at is not None:
+        added = session.execute(
+            select(func.count(models.Execution.id)).where(models.Execution.id > previous.max_execution_id)
+        ).scalar_one()
+        if previous.execution_count + added == execution_count:
+            groups = session.execute(
+                select(models.ExecutionGroup.id, models.ExecutionGroup.diagnostic_id).where(
+                    models.ExecutionGroup.id >= len(previous.diagnostic_ids)
+                )
+            )
+            # Executions are updated in place when they finish, so read those updated since too
+            executions = session.execute(
+                select(
+                    models.Execution.id, models.Execution.execution_group_id, models.Execution.successful
+                ).where(
+                    or_(
+                        models.Execution.id > previous.max_execution_id,
+                        models.Execution.updated_at >= previous.max_updated_at,
+                    )
+                )
+            )
+            return previous.extend(groups, executions, **state)
+        logger.info("Executions were removed, rebuilding the latest execution lookup")
+
+    latest = latest_execution_subquery()
+    groups = session.execute(select(models.ExecutionGroup.id, models.ExecutionGroup.diagnostic_id))
+    executions = session.execute(
+        select(latest.c.execution_id, latest.c.execution_group_id, models.Execution.successful).join(
+            models.Execution, models.Execution.id == latest.c.execution_id
+        )
+    )
+    return LatestExecutions.empty().extend(groups, executions, **state)
+
+
+_lookups: dict[str, tuple[str, LatestExecutions]] = {}
+_lookups_lock = threading.Lock()
+
+
+def get_latest_executions(session: Session, settings: "Settings") -> LatestExecutions | None:
+    """
+    Get the lookup for the database of a session, refreshing it when the database has changed.
+
+    Returns
+    -------
+    :
+        The lookup, or None if ``LATEST_EXECUTIONS_ENABLED`` is off
+    """
+    if not settings.LATEST_EXECUTIONS_ENABLED:
+        return None
+
+    url = str(session.get_bind().engine.url)
+    generation = get_database_generation(session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS)
+    with _lookups_lock:
+        current = _lookups.get(url)
+        if current is not None and current[0] == generation:
+            return current[1]
+
+        lookup = load_latest_executions(session, previous=current[1] if current else None)
+        _lookups[url] = (generation, lookup)
+        return lookup
+
+
+def get_latest_execution_id(session: Session, settings: "Settings", group_id: int) -> int | None:
+    """Get the id of the latest execution of a group, or None if it has no executions."""
+    lookup = get_latest_executions(session, settings)
+    if lookup is not None:
+        return lookup.latest_execution_id(group_id)
+    return session.execute(
+        select(func.max(models.Execution.id)).where(models.Execution.execution_group_id == group_id)
+    ).scalar_one_or_none()
+
+
+def get_latest_execution_ids(
+    session: Session, settings: "Settings", group_ids: Sequence[int]
+) -> dict[int, int]:
+    """Get the id of the latest execution of each of some groups, leaving out groups without executions."""
+    lookup = get_latest_executions(session, settings)
+    if lookup is not None:
+        return {
+            group_id: execution_id
+            for group_id in group_ids
+            if (execution_id := lookup.latest_execution_id(group_id)) is not None
+        }
+    if not group_ids:
+        return {}
+    latest = latest_execution_subquery(group_ids)
+    return {
+        group_id: execution_id
+        for group_id, execution_id in session.execute(
+            select(latest.c.execution_group_id, latest.c.execution_id)
+        )
+    }
+
+
+def build_latest_successful_clause(
+    session: Session, settings: "Settings", successful: bool
+) -> ColumnElement[bool]:
+    """
+    Build a clause on ``ExecutionGroup.id`` selecting groups by the success of their latest execution.
+
+    Groups match if their latest execution was ``successful``, or was not.
+    Groups without executions, or whose latest execution is still running, match neither.
+    The clause is a list of ids from the lookup when it is enabled
+    and at most ``LATEST_EXECUTIONS_MAX_IDS`` groups match, and a subquery otherwise.
+    """
+    lookup = get_latest_executions(session, settings)
+    if lookup is not None:
+        group_ids = lookup.group_ids(successful)
+        if len(group_ids) <= settings.LATEST_EXECUTIONS_MAX_IDS:
+            return build_id_clause(models.ExecutionGroup.id, group_ids)
+
+    latest = latest_execution_subquery()
+    return models.ExecutionGroup.id.in_(
+        select(latest.c.execution_group_id)
+        .join(models.Execution, models.Execution.id == latest.c.execution_id)
+        .where(models.Execution.successful.is_(successful))
+    )
+
+
+def count_successful_groups(
+    session: Session, settings: "Settings", diagnostic_ids: Iterable[int] | None = None
+) -> dict[int, int]:
+    """
+    Count the execution groups whose latest execution was successful, by diagnostic id.
+
+    Parameters
+    ----------
+    session
+        Database session
+    settings
+        Application settings
+    diagnostic_ids
+        Only count the groups of these diagnostics, rather than of every diagnostic
+
+    Returns
+    -------
+    :
+        The counts of the diagnostics with at least one successful group
+    """
+    wanted = set(diagnostic_ids) if diagnostic_ids is not None else None
+    lookup = get_latest_executions(session, settings)
+    if lookup is not None:
+        counts = lookup.successful_group_counts
+    else:
+        latest = latest_execution_subquery()
+        statement = (
+            select(models.ExecutionGroup.diagnostic_id, func.count())
+            .select_from(latest)
+            .join(models.Execution, models.Execution.id == latest.c.execution_id)
+            .join(models.ExecutionGroup, models.ExecutionGroup.id == latest.c.execution_group_id)
+            .where(models.Execution.successful.is_(True))
+            .group_by(models.ExecutionGroup.diagnostic_id)
+        )
+        if wanted is not None:
+            statement = statement.where(models.ExecutionGroup.diagnostic_id.in_(wanted))
+        counts = {diagnostic_id: count for diagnostic_id, count in session.execute(statement)}
+
+    if wanted is None:
+        return dict(counts)
+    return {diagnostic_id: count for diagnostic_id, count in counts.items() if diagnostic_id in wanted}
@@ -0,0 +1,356 @@
+"""
+Metrics about the API's internals, exposed in the OpenMetrics text format for Prometheus.
+
+Each worker process counts its own requests, database queries, response sizes and streaming downloads,
+and reads the utilisation of its caches and connection pools when the metrics are collected.
+
+With several workers (``fastapi run --workers 4``) a scrape only reaches one of them,
+so when ``METRICS_DIR`` is set each worker regularly writes a snapshot of its metrics there
+and ``/metrics`` adds up the snapshots of every worker.
+Counters of workers that have exited are kept so totals never go backwards,
+while gauges only include the workers that are still running.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ref_backend.core import aft, collections
+from ref_backend.core.cache import cache_statistics
+from ref_backend.core.file_handling import file_metadata_statistics
+from ref_backend.core.telemetry import current_timings, track_request
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS_BYTES = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+FAMILIES: dict[str, tuple[str, str]] = {
+    "ref_http_requests": ("counter", "HTTP requests handled, by route and status"),
+    "ref_http_request_duration_seconds": ("histogram", "Time taken to handle HTTP requests, by route"),
+    "ref_http_response_bytes": ("counter", "Bytes sent in HTTP response bodies, by route"),
+    "ref_db_queries": ("counter", "SQL statements executed while handling requests, by route"),
+    "ref_db_query_duration_seconds": ("counter", "Time spent executing SQL statements, by route"),
+    "ref_streaming_responses_in_progress": ("gauge", "Streaming responses being sent, by route"),
+    "ref_streaming_response_bytes": ("histogram", "Size of completed streaming responses, by route"),
+    "ref_cache_requests": ("counter", "Lookups in the API's caches, by cache and result"),
+    "ref_db_pool_connections": ("gauge", "Connections in the database pools, by database and state"),
+}
+"""Type and help text of each metric."""
+
+HISTOGRAM_BUCKETS = {
+    "ref_http_request_duration_seconds": LATENCY_BUCKETS_SECONDS,
+    "ref_streaming_response_bytes": SIZE_BUCKETS_BYTES,
+}
+
+LRU_CACHES: dict[str, Any] = {
+    "aft_diagnostics": aft.load_official_aft_diagnostics,
+    "aft_index": aft.get_aft_diagnostics_index,
+    "aft_diagnostic": aft.get_aft_diagnostic_by_id,
+    "collections": collections.load_all_collections,
+    "themes": collections.load_theme_mapping,
+}
+"""In-process caches of the explorer content, reported with their ``cache_info()``."""
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """The metrics of one worker process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, Labels], float] = {}
+        # Per-bucket (not cumulative) counts, followed by the sum and count of the observations
+        self._histograms: dict[tuple[str, Labels], list[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Increase a counter or gauge."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge, or a counter maintained elsewhere."""
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add an observation to a histogram."""
+        buckets = HISTOGRAM_BUCKETS[name]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts = self._histograms.setdefault(key, [0.0] * (len(buckets) + 3))
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the metrics as a JSON-serialisable dict."""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "values": [[name, dict(labels), value] for (name, labels), value in self._values.items()],
+                "histograms": [
+                    [name, dict(labels), list(counts)] for (name, labels), counts in self._histograms.items()
+                ],
+            }
+
+
+registry = MetricsRegistry()
+"""Metrics of this worker process."""
+
+
+def _pid_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(
+    snapshots: Iterable[dict[str, Any]], live_pids: set[int] | None = None
+) -> MetricsRegistry:
+    """
+    Add up the snapshots of several workers.
+
+    Gauges of workers that are not in ``live_pids`` are left out.
+    """
+    merged = MetricsRegistry()
+    for snapshot in snapshots:
+        live = live_pids is None or snapshot["pid"] in live_pids
+        for name, labels, value in snapshot["values"]:
+            if live or FAMILIES[name][0] != "gauge":
+                merged.inc(name, value, **labels)
+        for name, labels, counts in snapshot["histograms"]:
+            key = (name, tuple(sorted(labels.items())))
+            existing = merged._histograms.setdefault(key, [0.0] * len(counts))
+            merged._histograms[key] = [a + b for a, b in zip(existing, counts)]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = [*labels, extra] if extra else list(labels)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def render(metrics: MetricsRegistry) -> str:
+    """Format metrics in the OpenMetrics text format."""
+    lines = []
+    for name, (kind, description) in FAMILIES.items():
+        lines += [f"# TYPE {name} {kind}", f"# HELP {name} {description}"]
+        suffix = "_total" if kind == "counter" else ""
+        for (sample_name, labels), value in sorted(metrics._values.items()):
+            if sample_name == name:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        for (sample_name, labels), counts in sorted(metrics._histograms.items()):
+            if sample_name != name:
+                continue
+            cumulative = 0.0
+            for bound, count in zip([*HISTOGRAM_BUCKETS[name], float("inf")], counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {_format_value(cumulative)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(counts[-1])}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(counts[-2])}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Collect the metrics of this worker, share them with the other workers, and serve them.
+
+    Parameters
+    ----------
+    engines
+        Called to get the engines whose connection pools are reported, by name
+    directory
+        Directory the workers write their snapshots to, or None to only report this worker
+    write_interval_seconds
+        Shortest time between two snapshots written after requests
+    """
+
+    def __init__(
+        self,
+        engines: Callable[[], dict[str, Engine]],
+        directory: Path | None = None,
+        write_interval_seconds: float = 1.0,
+    ) -> None:
+        self.engines = engines
+        self.directory = directory
+        self.write_interval_seconds = write_interval_seconds
+        self._written = 0.0
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def collect(self) -> None:
+        """Read the cache and connection pool utilisation into the registry."""
+        for cache, stats in cache_statistics().items():
+            registry.set("ref_cache_requests", stats.hits, cache=cache, result="hit")
+            registry.set("ref_cache_requests", stats.misses, cache=cache, result="miss")
+        files = file_metadata_statistics()
+        registry.set("ref_cache_requests", files.hits, cache="results_files", result="hit")
+        registry.set("ref_cache_requests", files.misses, cache="results_files", result="miss")
+        for cache, function in LRU_CACHES.items():
+            info = function.cache_info()
+            registry.set("ref_cache_requests", info.hits, cache=cache, result="hit")
+            registry.set("ref_cache_requests", info.misses, cache=cache, result="miss")
+        for database, engine in self.engines().items():
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                registry.set("ref_db_pool_connections", pool.checkedout(), database=database, state="in_use")
+                registry.set("ref_db_pool_connections", pool.checkedin(), database=database, state="idle")
+                registry.set(
+                    "ref_db_pool_connections", max(pool.overflow(), 0), database=database, state="overflow"
+                )
+
+    def write_snapshot(self, force: bool = False) -> None:
+        """Write this worker's snapshot, at most once per ``write_interval_seconds`` unless forced."""
+        now = time.monotonic()
+        if self.directory is None or (not force and now - self._written < self.write_interval_seconds):
+            return
+        self._written = now
+        self.collect()
+        path = self.directory / f"worker-{os.getpid()}.json"
+        partial = path.with_suffix(".tmp")
+        try:
+            partial.write_text(json.dumps(registry.snapshot()))
+            os.replace(partial, path)
+        except OSError as exc:
+            logger.warning(f"Could not write the metrics to {path}: {exc}")
+
+    def gather(self) -> MetricsRegistry:
+        """Get the metrics of every worker."""
+        if self.directory is None:
+            self.collect()
+            return merge_snapshots([registry.snapshot()])
+
+        self.write_snapshot(force=True)
+        snapshots = []
+        for path in self.directory.glob("worker-*.json"):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # Removed or replaced while being read
+                continue
+        live_pids = {snapshot["pid"] for snapshot in snapshots if _pid_running(snapshot["pid"])}
+        return merge_snapshots(snapshots, live_pids)
+
+    async def endpoint(self, request: Request) -> Response:
+        """Serve the metrics of every worker."""
+        return Response(render(self.gather()), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """Record the latency, response size, database use and streaming of each HTTP request, by route."""
+
+    def __init__(self, app: ASGIApp, exporter: MetricsExporter) -> None:
+        self.app = app
+        self.exporter = exporter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = current_timings()
+        if timings is None:
+            with track_request():
+                await self(scope, receive, send)
+            return
+
+        status_code = 500
+        sent_bytes = 0
+        body_started = False
+        streaming = False
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code, sent_bytes, body_started, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                # A streamed body is sent in several messages, while other bodies are sent at once,
+                # with or without a ``content-length`` (e.g. a ``304 Not Modified``)
+                if not body_started and message.get("more_body", False):
+                    streaming = True
+                    registry.inc("ref_streaming_responses_in_progress", route=_route(scope))
+                    self.exporter.write_snapshot(force=True)
+                body_started = True
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = _route(scope)
+            registry.inc("ref_http_requests", route=route, method=scope["method"], status=str(status_code))
+            registry.observe("ref_http_request_duration_seconds", timings.elapsed_ms() / 1000, route=route)
+            registry.inc("ref_http_response_bytes", sent_bytes, route=route)
+            registry.inc("ref_db_queries", timings.counts.get("db", 0), route=route)
+            registry.inc(
+                "ref_db_query_duration_seconds", timings.durations_ms.get("db", 0) / 1000, route=route
+            )
+            if streaming:
+                registry.inc("ref_streaming_responses_in_progress", -1, route=route)
+                registry.observe("ref_streaming_response_bytes", sent_bytes, route=route)
+            self.exporter.write_snapshot(force=streaming)
+
+
+def _route(scope: Scope) -> str:
+    """
+    Get the path template of the matched route, so the paths of a route share its metrics.
+
+    Responses sent before routing, such as the ``304 Not Modified`` of `HTTPCacheMiddleware`,
+    are matched against the routes of the application here.
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if path is None and "app" in scope:
+        for route in _application_routes(scope["app"]):
+            if route.matches(scope)[0] == Match.FULL:
+                # The route that would have been put in the scope, as FastAPI wraps included routes
+                path = getattr(getattr(route, "original_route", route), "path", None)
+                break
+    return path or "unmatched"
+
+
+def _application_routes(app: Any) -> Iterable[Any]:
+    """
+    Get the routes of an application, with those of included routers in their place.
+
+    Older FastAPI versions copy the routes of an included router into the application,
+    so its Starlette ``routes`` are matched directly.
+    Newer versions keep each included router as a single route, expanded by ``iter_route_contexts``.
+    """
+    routes = getattr(app, "routes", [])
+    try:
+        from fastapi.routing import iter_route_contexts  # noqa: PLC0415
+    except ImportError:
+        return routes
+    return iter_route_contexts(routes)
@@ -0,0 +1,284 @@
+"""
+Catalog of the outputs of each diagnostic, for matching figures by filename.
+
+Figure galleries select the outputs of a diagnostic with a ``filename_filter`` pattern.
+Rather than loading the execution groups of the diagnostic with their outputs for each request,
+each worker keeps a catalog per diagnostic of the outputs of the latest execution of every group,
+with the size and modification time of each file,
+which is loaded with one query and matched in memory.
+
+A diagnostic's catalog is loaded the first time it is used
+and reloaded once the database generation has changed.
+"""
+
+import fnmatch
+import re
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import select
+
+from climate_ref import models
+from climate_ref.models.execution import ResultOutputType
+from ref_backend.core.cache import get_database_generation
+from ref_backend.core.file_handling import get_file_metadata_cache
+from ref_backend.core.latest_executions import latest_execution_subquery
+
+if TYPE_CHECKING:
+    from ref_backend.api.deps import AppContext
+
+MatchMode = Literal["regex", "glob"]
+"""How a filename filter is interpreted."""
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """An output of the latest execution of an execution group."""
+
+    output_id: int
+    execution_id: int
+    execution_group_id: int
+    output_type: ResultOutputType
+    filename: str
+    short_name: str | None
+    long_name: str | None
+    description: str | None
+    size: int | None
+    """Size of the file in bytes, or None if it is missing from the results directory"""
+    mtime: float | None
+    """Modification time of the file as a POSIX timestamp, or None if it is missing"""
+
+
+MAX_FILTER_LENGTH = 200
+"""Longest filename filter that is accepted."""
+
+MAX_REPEATS = 2
+"""Largest number of quantifiers, other than exact counts such as ``{3}``, in a regular expression."""
+
+# A quantifier, with the ``?`` or ``+`` that makes it lazy or possessive
+_QUANTIFIER = re.compile(r"(?:[*+?]|\{\d*(,\d*)?\})[?+]?")
+
+
+def _skip_class(pattern: str, start: int) -> int:
+    """Find the position after the character class that opens at ``start``."""
+    i = start + 1
+    if pattern.startswith("^", i):
+        i += 1
+    if pattern.startswith("]", i):
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def check_regex_complexity(pattern: str) -> None:
+    """
+    Reject regular expressions that can backtrack catastrophically.
+
+    Python's ``re`` has no time limit, and the time a pattern such as ``(.*)(.*)(.*)(.*)#`` takes
+    grows with a power of the length of the text for each quantifier.
+    Filters may therefore have at most ``MAX_REPEATS`` quantifiers that match a variable number of times,
+    and may not repeat a group that contains a quantifier or an alternation, as in ``(a+)+`` or ``(a|ab)*``.
+
+    Raises
+    ------
+    ValueError
+        If the pattern is too complex
+    """
+    # Whether each open group contains a quantifier or an alternation
+    groups: list[bool] = []
+    repeats = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _skip_class(pattern, i)
+            continue
+        if char == "(":
+            groups.append(False)
+            # Skip the ``?`` of ``(?:``, ``(?P<name>`` and the like, which is not a quantifier
+            i += 2 if pattern.startswith("?", i + 1) else 1
+            continue
+        if char == ")":
+            complex_group = groups.pop() if groups else False
+            i += 1
+            if complex_group and _QUANTIFIER.match(pattern, i):
+                raise ValueError("Repeated groups may not contain quantifiers or alternations")
+            continue
+        quantifier = _QUANTIFIER.match(pattern, i)
+        if char == "|" or quantifier:
+            groups = [True] * len(groups)
+        if quantifier:
+            if quantifier.group(1) is not None or not quantifier.group().startswith("{"):
+                repeats += 1
+            i = quantifier.end()
+            continue
+        i += 1
+
+    if repeats > MAX_REPEATS:
+        raise ValueError(f"Regular expressions may have at most {MAX_REPEATS} quantifiers")
+
+
+def compile_filter(pattern: str, mode: MatchMode = "regex") -> Callable[[str], re.Match[str] | None]:
+    """
+    Compile a filename filter into a predicate.
+
+    Both modes ignore case.
+    A ``regex`` is searched for anywhere in the text, as the figure galleries do,
+    while a ``glob`` must match the whole text.
+    Globs always match in linear time,
+    while regular expressions are checked with `check_regex_complexity`.
+
+    Raises
+    ------
+    ValueError
+        If ``pattern`` is longer than ``MAX_FILTER_LENGTH``,
+        or is not a valid or is too complex a regular expression
+    """
+    if len(pattern) > MAX_FILTER_LENGTH:
+        raise ValueError(f"Filters may be at most {MAX_FILTER_LENGTH} characters long")
+    if mode == "glob":
+        return re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+    try:
+        compiled = re.compile(pattern, re.IGNORECASE)
+    except re.error as exc:
+        raise ValueError(f"Invalid regular expression: {exc}") from None
+    check_regex_complexity(pattern)
+    return compiled.search
+
+
+class OutputCatalog:
+    """The outputs of a diagnostic, ordered by execution group and output."""
+
+    def __init__(self, entries: list[CatalogEntry]) -> None:
+        self.entries = entries
+
+    def match(
+        self,
+        pattern: str | None = None,
+        *,
+        mode: MatchMode = "regex",
+        output_type: ResultOutputType | None = None,
+        time_budget_seconds: float | None = None,
+    ) -> list[CatalogEntry]:
+        """
+        Find the outputs whose filename or description matches a filter.
+
+        Raises
+        ------
+        ValueError
+            If ``pattern`` is not accepted by `compile_filter`
+        TimeoutError
+            If matching takes longer than ``time_budget_seconds``
+        """
+        entries = self.entries
+        if output_type is not None:
+            entries = [entry for entry in entries if entry.output_type == output_type]
+        if not pattern:
+            return list(entries)
+        matches = compile_filter(pattern, mode)
+        deadline = None if time_budget_seconds is None else time.monotonic() + time_budget_seconds
+        matched = []
+        for entry in entries:
+            if matches(entry.filename or "") or matches(entry.description or ""):
+                matched.append(entry)
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("The filter took too long to match")
+        return matched
+
+
+def load_output_catalog(app_context: "AppContext", diagnostic_id: int) -> OutputCatalog:
+    """Load the catalog of a diagnostic from the database and the results directory."""
+    latest = latest_execution_subquery()
+    rows = app_context.session.execute(
+        select(
+            models.ExecutionOutput.id,
+            models.ExecutionOutput.execution_id,
+            latest.c.execution_group_id,
+            models.ExecutionOutput.output_type,
+            models.ExecutionOutput.filename,
+            models.ExecutionOutput.short_name,
+            models.ExecutionOutput.long_name,
+            models.ExecutionOutput.description,
+            models.Execution.output_fragment,
+        )
+        .join(latest, latest.c.execution_id == models.ExecutionOutput.execution_id)
+        .join(models.Execution, models.Execution.id == models.ExecutionOutput.execution_id)
+        .join(models.ExecutionGroup, models.ExecutionGroup.id == latest.c.execution_group_id)
+        .where(models.ExecutionGroup.diagnostic_id == diagnostic_id)
+        .order_by(latest.c.execution_group_id, models.ExecutionOutput.id)
+    )
+
+    artifacts = app_context.reader.artifacts
+    files = get_file_metadata_cache(app_context.settings)
+    entries = []
+    for (
+        output_id,
+        execution_id,
+        group_id,
+        output_type,
+        filename,
+        short_name,
+        long_name,
+        description,
+        fragment,
+    ) in rows:
+        try:
+            directory = artifacts.output_directory(fragment)
+            path = artifacts.output_file(fragment, filename)
+        except ValueError:
+            # The recorded fragment or filename escapes the results directory
+            info = None
+        else:
+            info = files.stat(path, prefetch=directory)
+        entries.append(
+            CatalogEntry(
+                output_id=output_id,
+                execution_id=execution_id,
+                execution_group_id=group_id,
+                output_type=output_type,
+                filename=filename,
+                short_name=short_name,
+                long_name=long_name,
+                description=description,
+                size=info.size if info else None,
+                mtime=info.mtime if info else None,
+            )
+        )
+    return OutputCatalog(entries)
+
+
+_catalogs: dict[tuple[str, int], tuple[str, OutputCatalog]] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_output_catalog(app_context: "AppContext", diagnostic_id: int) -> OutputCatalog:
+    """
+    Get the catalog of a diagnostic, reloading it when the database has changed.
+
+    The catalog is loaded afresh for every call if ``OUTPUT_CATALOG_ENABLED`` is off.
+    """
+    settings = app_context.settings
+    if not settings.OUTPUT_CATALOG_ENABLED:
+        return load_output_catalog(app_context, diagnostic_id)
+
+    session = app_context.session
+    key = (str(session.get_bind().engine.url), diagnostic_id)
+    generation = get_database_generation(session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS)
+    with _catalogs_lock:
+        current = _catalogs.get(key)
+        if current is not None and current[0] == generation:
+            return current[1]
+        # Drop the catalogs of older generations, which are all stale
+        for stale in [k for k, (g, _) in _catalogs.items() if k[0] == key[0] and g != generation]:
+            del _catalogs[stale]
+
+        catalog = load_output_catalog(app_context, diagnostic_id)
+        _catalogs[key] = (generation, catalog)
+        return catalog
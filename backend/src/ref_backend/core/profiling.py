@@ -0,0 +1,171 @@
+"""
+Sampling profiler for diagnosing slow requests in a running deployment.
+
+Profiling is disabled unless ``PROFILING_TOKEN`` is set, in which case nothing is installed
+and requests pay no overhead.
+Once enabled, a client presenting the token in the ``X-Profile-Token`` header can:
+
+- profile a single request by adding ``__profile=1`` to its query string,
+  which returns the profile instead of the response
+- sample the worker that answers ``GET /api/v1/utils/profile?seconds=N`` for ``N`` seconds
+
+The sampler records the Python stack of every thread in the worker at a fixed interval,
+so a request's work in the event loop and in the thread pool is captured alike,
+as is the work of any requests handled concurrently.
+Profiles are returned in the folded stack format (``frame;frame;frame count`` per line)
+read by ``flamegraph.pl``, inferno and speedscope.
+"""
+
+import hmac
+import sys
+import threading
+import urllib.parse
+from collections import Counter
+from types import FrameType
+
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_PARAMETER = "__profile"
+TOKEN_HEADER = "X-Profile-Token"  # noqa: S105
+
+IDLE_FRAMES = {
+    ("selectors", "EpollSelector.select"),
+    ("selectors", "KqueueSelector.select"),
+    ("selectors", "PollSelector.select"),
+    ("selectors", "SelectSelector.select"),
+    ("threading", "Condition.wait"),
+    ("threading", "Event.wait"),
+    ("threading", "Thread._wait_for_tstate_lock"),
+    ("queue", "Queue.get"),
+}
+"""Innermost frames of threads that are waiting for work rather than doing it."""
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already being taken in this worker."""
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (frame.f_globals.get("__name__"), frame.f_code.co_qualname) in IDLE_FRAMES
+
+
+def _frame_label(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Record the stacks of the threads of this process at a fixed interval.
+
+    Only one sampler runs at a time in a worker, as concurrent samplers would profile each other.
+    """
+
+    _running = threading.Lock()
+
+    def __init__(self, interval_seconds: float, include_idle: bool = False) -> None:
+        self.interval_seconds = interval_seconds
+        self.include_idle = include_idle
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being taken in this worker")
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._running.release()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the current stack of every other thread."""
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == threading.get_ident():
+                continue
+            if not self.include_idle and _is_idle(frame):
+                continue
+            labels = []
+            current: FrameType | None = frame
+            while current is not None:
+                labels.append(_frame_label(current))
+                current = current.f_back
+            thread_name = thread_names.get(ident, str(ident)).replace(";", ":").replace(" ", "_")
+            self.stacks[";".join([thread_name, *reversed(labels)])] += 1
+
+    def folded(self) -> str:
+        """Format the recorded stacks in the folded stack format."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def token_matches(expected: str | None, provided: str | None) -> bool:
+    """Check a profiling token in constant time, failing when profiling is disabled."""
+    return expected is not None and provided is not None and hmac.compare_digest(expected, provided)
+
+
+class RequestProfilerMiddleware:
+    """
+    Profile requests that ask for it with ``__profile=1`` and the profiling token.
+
+    The profiled request is handled as usual, but its response is replaced by the profile,
+    with the status the response would have had in an ``X-Profiled-Status`` header.
+    """
+
+    def __init__(self, app: ASGIApp, token: str, interval_seconds: float) -> None:
+        self.app = app
+        self.token = token
+        self.interval_seconds = interval_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        query = urllib.parse.parse_qsl(
+            scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True
+        )
+        if scope["type"] != "http" or not any(key == PROFILE_PARAMETER for key, _ in query):
+            await self.app(scope, receive, send)
+            return
+
+        response: Response
+        if not token_matches(self.token, Headers(scope=scope).get(TOKEN_HEADER)):
+            response = JSONResponse({"detail": "Invalid profiling token"}, status.HTTP_403_FORBIDDEN)
+            await response(scope, receive, send)
+            return
+
+        # The profiled request must not be cached or answered from a cache
+        remaining = [(key, value) for key, value in query if key != PROFILE_PARAMETER]
+        scope = {
+            **scope,
+            "query_string": urllib.parse.urlencode(remaining).encode("latin-1"),
+            "headers": [
+                (k, v) for k, v in scope["headers"] if k not in (b"if-none-match", b"accept-encoding")
+            ],
+        }
+        profiled_status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal profiled_status
+            if message["type"] == "http.response.start":
+                profiled_status = message["status"]
+
+        try:
+            with StackSampler(self.interval_seconds) as sampler:
+                await self.app(scope, receive, discard)
+        except ProfilerBusy as exc:
+            response = JSONResponse({"detail": str(exc)}, status.HTTP_409_CONFLICT)
+            await response(scope, receive, send)
+            return
+
+        response = PlainTextResponse(
+            sampler.folded(), headers={"X-Profiled-Status": str(profiled_status), "Cache-Control": "no-store"}
+        )
+        await response(scope, receive, send)
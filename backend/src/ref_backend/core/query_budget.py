@@ -0,0 +1,237 @@
+"""
+Time budgets for the database queries of a request.
+
+Every API request gets a budget (``QUERY_BUDGET_SECONDS``, or a per-route value from
+``QUERY_BUDGET_ROUTE_SECONDS``) counted from when it reaches the app.
+Queries still running when the budget runs out are interrupted,
+so one pathological filter cannot hold a pooled connection for everyone else:
+
+- on SQLite, a progress handler aborts the statement from inside the SQLite VM
+- on PostgreSQL, ``SET LOCAL statement_timeout`` is set to the remaining budget
+  at the start of each transaction
+
+The budget only applies until the response starts:
+a streamed body, such as a CSV export, runs its queries after a ``200`` has been sent,
+when interrupting them would only truncate the body.
+The budget is also cancelled when the client disconnects, even while streaming,
+and no further statements are started for it.
+
+Requests over budget are answered with a ``504``,
+and requests that cannot get a connection from the pool in time with a ``503``.
+"""
+
+import asyncio
+import contextlib
+import math
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import Engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import ExceptionContext
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROGRESS_HANDLER_INSTRUCTIONS = 10_000
+"""Number of SQLite VM instructions between checks of the budget."""
+
+POSTGRES_QUERY_CANCELED = "57014"
+"""SQLSTATE of a PostgreSQL statement cancelled by ``statement_timeout`` or a cancel request."""
+
+
+class QueryBudget:
+    """
+    The time a request may take to start its response, and whether its client is still waiting.
+
+    The time is counted from when the request reaches the app, whether it is spent in the database or not.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.started = time.monotonic()
+        self.seconds = seconds
+        self.cancelled = False
+        self.responding = False
+
+    def remaining(self) -> float:
+        """Get the seconds left in the budget, or infinity if it is unlimited or the response has started."""
+        if self.seconds <= 0 or self.responding:
+            return float("inf")
+        return self.seconds - (time.monotonic() - self.started)
+
+    def exhausted(self) -> bool:
+        """Check whether the budget has run out or the client has gone away."""
+        return self.cancelled or self.remaining() <= 0
+
+
+class QueryBudgetExceeded(Exception):
+    """A query was interrupted because its request ran out of budget or was cancelled."""
+
+    def __init__(self, budget: QueryBudget | None) -> None:
+        self.budget = budget
+        if budget is not None and budget.cancelled:
+            message = "The client disconnected before the query finished"
+        elif budget is not None:
+            message = f"The query took longer than its {budget.seconds:g} s budget"
+        else:
+            message = "The query took longer than the database statement timeout"
+        super().__init__(message)
+
+
+_current_budget: ContextVar[QueryBudget | None] = ContextVar("query_budget", default=None)
+
+
+def current_budget() -> QueryBudget | None:
+    """Get the budget of the request being handled, if any."""
+    return _current_budget.get()
+
+
+@contextlib.contextmanager
+def query_budget(seconds: float) -> Iterator[QueryBudget]:
+    """Run the queries in a block under a budget."""
+    budget = QueryBudget(seconds)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def _progress_handler() -> int:
+    budget = _current_budget.get()
+    # A non-zero return value interrupts the statement
+    return int(budget is not None and budget.exhausted())
+
+
+def install_query_budget(engine: Engine) -> None:
+    """Enforce the budget of the current request on the queries run by an engine."""
+    postgres = engine.dialect.name == "postgresql"
+
+    @event.listens_for(engine, "connect")
+    def set_progress_handler(dbapi_connection: Any, connection_record: Any) -> None:
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.set_progress_handler(_progress_handler, PROGRESS_HANDLER_INSTRUCTIONS)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def check_budget(  # noqa: PLR0913, PLR0917
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        budget = _current_budget.get()
+        if budget is None:
+            return
+        if budget.exhausted():
+            raise QueryBudgetExceeded(budget)
+        if postgres and budget.seconds > 0:
+            transaction = conn.get_transaction()
+            # SET LOCAL lasts until the end of the transaction, so it is only needed once per transaction,
+            # and once more to lift the timeout if the response starts during the transaction
+            state = (transaction, budget.responding)
+            if transaction is not None and conn.info.get("query_budget_transaction") != state:
+                remaining = budget.remaining()
+                timeout = 0 if math.isinf(remaining) else max(int(remaining * 1000), 1)
+                cursor.execute(f"SET LOCAL statement_timeout = {timeout}")
+                conn.info["query_budget_transaction"] = state
+
+    @event.listens_for(engine, "handle_error")
+    def translate_interruption(context: ExceptionContext) -> BaseException | None:
+        original = context.original_exception
+        if isinstance(original, QueryBudgetExceeded):
+            return original
+
+        budget = _current_budget.get()
+        interrupted = isinstance(original, sqlite3.OperationalError) and "interrupted" in str(original)
+        cancelled = POSTGRES_QUERY_CANCELED in (
+            getattr(original, "pgcode", None),
+            getattr(original, "sqlstate", None),
+        )
+        if (interrupted and budget is not None and budget.exhausted()) or cancelled:
+            return QueryBudgetExceeded(budget)
+        return None
+
+
+class QueryBudgetMiddleware:
+    """
+    Give each HTTP request a query budget, and cancel it if the client disconnects.
+
+    The app receives messages through a queue fed by a task that watches for the disconnect,
+    so the watch does not compete with the app for request messages.
+    The time limit is lifted once the response starts, leaving only the cancellation.
+    """
+
+    def __init__(self, app: ASGIApp, seconds: float) -> None:
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+
+        with query_budget(self.seconds) as budget:
+
+            async def watch_for_disconnect() -> None:
+                while True:
+                    message = await receive()
+                    await messages.put(message)
+                    if message["type"] == "http.disconnect":
+                        budget.cancelled = True
+                        return
+
+            async def send_and_lift_limit(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    budget.responding = True
+                await send(message)
+
+            watcher = asyncio.create_task(watch_for_disconnect())
+            try:
+                await self.app(scope, messages.get, send_and_lift_limit)
+            finally:
+                watcher.cancel()
+
+
+def set_budget_seconds(seconds: float) -> None:
+    """Change the length of the budget of the request being handled, keeping its start time."""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.seconds = seconds
+
+
+def query_budget_exceeded_handler(request: Request, exc: Exception) -> Response:
+    """Answer a request whose queries ran out of budget with a ``504 Gateway Timeout``."""
+    budget = exc.budget if isinstance(exc, QueryBudgetExceeded) else None
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={
+            "detail": str(exc),
+            "code": "query_budget_exceeded",
+            "budget_seconds": budget.seconds if budget is not None else None,
+        },
+    )
+
+
+def pool_timeout_handler(request: Request, exc: Exception) -> Response:
+    """Answer a request that could not get a database connection with a ``503 Service Unavailable``."""
+    logger.warning(f"{request.method} {request.url.path}: no database connection available: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": "The database is busy, please retry shortly",
+            "code": "database_busy",
+        },
+        headers={"Retry-After": "1"},
+    )
+
+
+EXCEPTION_HANDLERS = {
+    QueryBudgetExceeded: query_budget_exceeded_handler,
+    sa_exc.TimeoutError: pool_timeout_handler,
+}
+"""Exception handlers to register on the app."""
@@ -2,21 +2,57 @@
 
 import csv
 import io
-from collections.abc import Generator, Mapping
-from typing import TYPE_CHECKING, Literal
+import json
+from collections.abc import Callable, Generator, Mapping, Sequence
+from typing import TYPE_CHECKING, Any, Literal, TypeVar, cast
 
+import attrs
 from fastapi import HTTPException
+from sqlalchemy import select, tuple_
 from starlette.responses import StreamingResponse
 
 from climate_ref import models
 from climate_ref.results import MetricValueFilter, OutlierPolicy
 from climate_ref.results.values import ScalarValueCollection, SeriesValueCollection
+from ref_backend.core.cache import get_cache, get_database_generation
 from ref_backend.core.json_utils import sanitize_float_value
 from ref_backend.core.metric_values import MetricValueType
-from ref_backend.models import MetricValueCollection
+from ref_backend.models import MetricValueBatchResult, MetricValueCollection, MetricValueQuery
 
 if TYPE_CHECKING:
     from ref_backend.api.deps import AppContext
+    from ref_backend.core.config import Settings
+
+T = TypeVar("T")
+
+
+def is_diagnostic_hidden(settings: "Settings", provider_slug: str, diagnostic_slug: str) -> bool:
+    """Whether a diagnostic is hidden by the ``DIAGNOSTIC_PROVIDERS`` or ``DIAGNOSTIC_EXCLUDE`` settings."""
+    if settings.DIAGNOSTIC_PROVIDERS and provider_slug not in settings.DIAGNOSTIC_PROVIDERS:
+        return True
+    return bool(settings.DIAGNOSTIC_EXCLUDE and diagnostic_slug in settings.DIAGNOSTIC_EXCLUDE)
+
+
+def diagnostic_metric_filter(
+    provider_slug: str,
+    diagnostic_slug: str,
+    dimensions: dict[str, str],
+    isolate_ids: list[int] | None = None,
+    exclude_ids: list[int] | None = None,
+) -> MetricValueFilter:
+    """Build the filter for the metric values of a diagnostic that are served by the API."""
+    # Scope to this diagnostic/provider via exact-match slugs. ``promoted_only`` keeps only the
+    # promoted diagnostic version, so values from superseded versions are hidden. Exposing
+    # previous versions needs a separate design (TODO). Retracted executions are still included.
+    return MetricValueFilter(
+        diagnostic_slug=diagnostic_slug,
+        provider_slug=provider_slug,
+        dimensions=dimensions,
+        isolate_ids=isolate_ids,
+        exclude_ids=exclude_ids,
+        promoted_only=True,
+        include_retracted=True,
+    )
 
 
 def parse_dimension_filters(query_params: Mapping[str, str]) -> dict[str, str]:
@@ -126,6 +162,59 @@ def generate_csv_response_series(
     )
 
 
+def _normalize_filter(metric_filter: MetricValueFilter) -> dict[str, Any]:
+    """
+    Convert a filter to a plain mapping that is equal for equivalent filters.
+
+    The order of ids and dimension values does not change the result, so both are sorted.
+    """
+    normalized: dict[str, Any] = {}
+    for key, value in attrs.asdict(metric_filter, recurse=False).items():
+        if isinstance(value, Mapping):
+            normalized[key] = {k: v if isinstance(v, str) else sorted(v) for k, v in sorted(value.items())}
+        elif isinstance(value, list | tuple):
+            normalized[key] = sorted(value)
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def metric_values_cache_key(  # noqa: PLR0913
+    value_type: MetricValueType,
+    metric_filter: MetricValueFilter,
+    *,
+    outlier_policy: OutlierPolicy | None,
+    include_unverified: bool,
+    offset: int,
+    limit: int | None,
+) -> str:
+    """Build the key a metric value query is cached under."""
+    return json.dumps(
+        {
+            "value_type": value_type.value,
+            "filter": _normalize_filter(metric_filter),
+            "outliers": attrs.asdict(outlier_policy) if outlier_policy else None,
+            "include_unverified": include_unverified,
+            "offset": offset,
+            "limit": limit,
+        },
+        sort_keys=True,
+    )
+
+
+def _cached(app_context: "AppContext", key: str, compute: Callable[[], T], *, enabled: bool = True) -> T:
+    """Reuse the result of a metric value query until new executions are written, unless not ``enabled``."""
+    settings = app_context.settings
+    if not enabled or settings.QUERY_CACHE_MAX_ENTRIES <= 0:
+        return compute()
+
+    cache = get_cache("metric_values", settings)
+    generation = get_database_generation(
+        app_context.session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS
+    )
+    return cache.get_or_compute(key, generation, compute)
+
+
 def fetch_metric_values(  # noqa: PLR0913, PLR0917
     app_context: "AppContext",
     metric_filter: MetricValueFilter,
@@ -143,42 +232,175 @@ def fetch_metric_values(  # noqa: PLR0913, PLR0917
     `filename_stem` names the CSV download, which is the only thing that varies
     between the diagnostic-scoped and execution-scoped endpoints.
     CSV exports return every matching value, so `offset` and `limit` are ignored there.
+    JSON results are cached, keyed on the normalised filter, paging and outlier policy.
+    CSV exports are not: an unpaged collection can be far larger than any page,
+    and would crowd the pages out of the cache.
     """
+    reader = app_context.reader.values
+    use_cache = format != "csv"
+    if format == "csv":
+        offset, limit_or_none = 0, None
+    else:
+        limit_or_none = limit
+
     if value_type == MetricValueType.SCALAR:
         detection_ran = detect_outliers == "iqr"
         outlier_policy = OutlierPolicy(method=detect_outliers)
-
-        if format == "csv":
-            collection = app_context.reader.values.scalar_values(
+        key = metric_values_cache_key(
+            value_type,
+            metric_filter,
+            outlier_policy=outlier_policy,
+            include_unverified=include_unverified,
+            offset=offset,
+            limit=limit_or_none,
+        )
+        collection = _cached(
+            app_context,
+            key,
+            lambda: reader.scalar_values(
                 metric_filter,
                 outliers=outlier_policy,
                 include_unverified=include_unverified,
-            )
+                offset=offset,
+                limit=limit_or_none,
+            ),
+            enabled=use_cache,
+        )
+
+        if format == "csv":
             return generate_csv_response_scalar(
                 collection, detection_ran, f"metric_values_scalar_{filename_stem}.csv"
             )
+        return MetricValueCollection.build_scalar_from_reader(collection, detection_ran)
 
-        collection = app_context.reader.values.scalar_values(
+    if value_type == MetricValueType.SERIES:
+        key = metric_values_cache_key(
+            value_type,
             metric_filter,
-            outliers=outlier_policy,
-            include_unverified=include_unverified,
+            outlier_policy=None,
+            include_unverified=False,
             offset=offset,
-            limit=limit,
+            limit=limit_or_none,
+        )
+        series_collection = _cached(
+            app_context,
+            key,
+            lambda: reader.series_values(metric_filter, offset=offset, limit=limit_or_none),
+            enabled=use_cache,
         )
-        return MetricValueCollection.build_scalar_from_reader(collection, detection_ran)
 
-    if value_type == MetricValueType.SERIES:
         if format == "csv":
-            series_collection = app_context.reader.values.series_values(metric_filter)
             return generate_csv_response_series(
                 series_collection, f"metric_values_series_{filename_stem}.csv"
             )
-
-        series_collection = app_context.reader.values.series_values(
-            metric_filter,
-            offset=offset,
-            limit=limit,
-        )
         return MetricValueCollection.build_series_from_reader(series_collection)
 
     raise HTTPException(status_code=500, detail="Unknown value_type")
+
+
+def fetch_metric_value_pages(  # noqa: PLR0913
+    app_context: "AppContext",
+    metric_filter: MetricValueFilter,
+    value_type: MetricValueType,
+    pages: Sequence[tuple[int, int]],
+    *,
+    detect_outliers: Literal["off", "iqr"],
+    include_unverified: bool,
+) -> list[MetricValueCollection]:
+    """
+    Read several `(offset, limit)` pages of the same metric value query.
+
+    The total count, facets and outliers do not depend on the paging,
+    so overlapping or adjacent pages are cut from a single read covering them all,
+    e.g. the one-value facet query of an explorer card and the card's values.
+    The pages are returned in the order they were given.
+    """
+    results: list[MetricValueCollection | None] = [None] * len(pages)
+    order = sorted(range(len(pages)), key=lambda i: pages[i][0])
+    while order:
+        start, end = pages[order[0]][0], sum(pages[order[0]])
+        run = [order.pop(0)]
+        while order and pages[order[0]][0] <= end:
+            end = max(end, sum(pages[order[0]]))
+            run.append(order.pop(0))
+
+        # Without a format the values are returned as JSON rather than streamed as CSV
+        window = cast(
+            MetricValueCollection,
+            fetch_metric_values(
+                app_context,
+                metric_filter,
+                value_type=value_type,
+                format=None,
+                offset=start,
+                limit=end - start,
+                detect_outliers=detect_outliers,
+                include_unverified=include_unverified,
+                filename_stem="",
+            ),
+        )
+        for i in run:
+            offset, limit = pages[i]
+            data = window.data[offset - start : offset - start + limit]
+            results[i] = window.model_copy(update={"data": data, "count": len(data)})
+    return [result for result in results if result is not None]
+
+
+def fetch_metric_value_batch(
+    app_context: "AppContext", queries: Sequence[MetricValueQuery]
+) -> list[MetricValueBatchResult]:
+    """
+    Answer several metric value queries, in the order they were given.
+
+    The diagnostics are looked up together,
+    and queries that differ only in their paging share a read (see `fetch_metric_value_pages`).
+    A query for a hidden or unknown diagnostic gets a 404 result rather than failing the others.
+    """
+    settings = app_context.settings
+    requested = {
+        (query.provider_slug, query.diagnostic_slug)
+        for query in queries
+        if not is_diagnostic_hidden(settings, query.provider_slug, query.diagnostic_slug)
+    }
+    found: set[tuple[str, str]] = set()
+    if requested:
+        rows = app_context.session.execute(
+            select(models.Provider.slug, models.Diagnostic.slug)
+            .join(models.Diagnostic.provider)
+            .where(tuple_(models.Provider.slug, models.Diagnostic.slug).in_(requested))
+        )
+        found = {(provider_slug, diagnostic_slug) for provider_slug, diagnostic_slug in rows}
+
+    results = [MetricValueBatchResult(status_code=404, detail="Diagnostic not found") for _ in queries]
+    shared: dict[str, list[int]] = {}
+    for i, query in enumerate(queries):
+        if (query.provider_slug, query.diagnostic_slug) in found:
+            # Sorted, so that the same filters given in another order are shared too
+            key = json.dumps(query.model_dump(mode="json", exclude={"offset", "limit"}), sort_keys=True)
+            shared.setdefault(key, []).append(i)
+
+    for indices in shared.values():
+        query = queries[indices[0]]
+        metric_filter = diagnostic_metric_filter(
+            query.provider_slug,
+            query.diagnostic_slug,
+            parse_dimension_filters(query.filters),
+            query.isolate_ids,
+            query.exclude_ids,
+        )
+        try:
+            pages = fetch_metric_value_pages(
+                app_context,
+                metric_filter,
+                query.value_type,
+                [(queries[i].offset, queries[i].limit) for i in indices],
+                detect_outliers=query.detect_outliers,
+                include_unverified=query.include_unverified,
+            )
+        except HTTPException as exc:
+            for i in indices:
+                results[i] = MetricValueBatchResult(status_code=exc.status_code, detail=str(exc.detail))
+            continue
+        for i, page in zip(indices, pages, strict=True):
+            results[i] = MetricValueBatchResult(result=page)
+    return results
@@ -0,0 +1,281 @@
+"""
+Substring search over dataset slugs and diagnostic and provider names.
+
+The ``*_contains`` filters are leading-wildcard ``ILIKE`` patterns,
+which cannot use a btree index and scan the whole table.
+Instead each worker keeps a trigram index of the names in an in-memory SQLite database
+(an FTS5 table with the ``trigram`` tokenizer),
+which answers ``LIKE '%...%'`` from the index and is used whatever database holds the results,
+without writing to it.
+
+The index is refreshed when the database generation changes:
+datasets added since the last refresh are appended,
+while the much smaller diagnostic and provider tables are reloaded.
+Searches keep using the current contents of the index while a refresh reads from the database.
+"""
+
+import sqlite3
+import threading
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Literal, get_args
+
+from loguru import logger
+from sqlalchemy import ColumnElement, func, select
+from sqlalchemy.orm import Session
+
+from climate_ref import models
+from ref_backend.core.cache import get_database_generation
+from ref_backend.core.filter_utils import build_id_clause
+
+if TYPE_CHECKING:
+    from ref_backend.core.config import Settings
+
+SearchKind = Literal["datasets", "diagnostics", "providers"]
+"""The collections of names that can be searched."""
+
+TRIGRAM_LENGTH = 3
+"""Shortest query that can be answered from the trigram index, rather than by scanning every name."""
+
+
+_NAME_COLUMNS = {
+    "datasets": (models.Dataset.id, models.Dataset.slug),
+    "diagnostics": (models.Diagnostic.id, models.Diagnostic.name),
+    "providers": (models.Provider.id, models.Provider.name),
+}
+
+
+def _name_rows(session: Session, kind: SearchKind, after_id: int = 0) -> list[tuple[int, str]]:
+    id_column, name_column = _NAME_COLUMNS[kind]
+    statement = select(id_column, name_column).where(id_column > after_id).order_by(id_column)
+    return [(row_id, name) for row_id, name in session.execute(statement)]
+
+
+def _escape_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """
+    Trigram index over the names of each `SearchKind`.
+
+    The index is held in a private in-memory SQLite database.
+    Access is serialised with a lock, as the connection is shared by the request threads.
+    """
+
+    def __init__(self) -> None:
+        self._connection = self._connect()
+        self._lock = threading.Lock()
+        self.max_dataset_id = 0
+        self.dataset_count = 0
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        for kind in get_args(SearchKind):
+            connection.execute(f"CREATE VIRTUAL TABLE {kind} USING fts5(name, tokenize='trigram')")
+        return connection
+
+    def add(self, kind: SearchKind, rows: Iterable[tuple[int, str]]) -> None:
+        """Add ``(id, name)`` rows to the index."""
+        with self._lock, self._connection:
+            self._connection.executemany(f"INSERT INTO {kind} (rowid, name) VALUES (?, ?)", rows)  # noqa: S608
+
+    def replace(self, kind: SearchKind, rows: Iterable[tuple[int, str]]) -> None:
+        """Replace every row of ``kind`` with ``(id, name)`` rows."""
+        self.update({kind: list(rows)})
+
+    def update(
+        self,
+        replaced: dict[SearchKind, list[tuple[int, str]]],
+        added: dict[SearchKind, list[tuple[int, str]]] | None = None,
+    ) -> None:
+        """
+        Replace every row of some kinds and add rows to others, as one change.
+
+        Searches see either the index before the change or after it.
+        """
+        with self._lock, self._connection:
+            for kind, rows in replaced.items():
+                self._connection.execute(f"DELETE FROM {kind}")  # noqa: S608
+                self._connection.executemany(f"INSERT INTO {kind} (rowid, name) VALUES (?, ?)", rows)  # noqa: S608
+            for kind, rows in (added or {}).items():
+                self._connection.executemany(f"INSERT INTO {kind} (rowid, name) VALUES (?, ?)", rows)  # noqa: S608
+
+    def rebuild(self, rows: dict[SearchKind, Iterable[tuple[int, str]]]) -> None:
+        """
+        Replace the whole index.
+
+        The new index is built in a separate database while searches go on using the current one,
+        which is then swapped for it.
+        """
+        connection = self._connect()
+        with connection:
+            for kind, kind_rows in rows.items():
+                connection.executemany(f"INSERT INTO {kind} (rowid, name) VALUES (?, ?)", kind_rows)  # noqa: S608
+        with self._lock:
+            previous, self._connection = self._connection, connection
+        previous.close()
+
+    def like(self, kind: SearchKind, pattern: str) -> list[int]:
+        """
+        Get the ids whose name matches a SQL ``LIKE`` pattern, ignoring case.
+
+        Patterns with at least three literal characters between wildcards are resolved with the index.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT rowid FROM {kind} WHERE name LIKE ?",  # noqa: S608
+                (pattern,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def suggest(self, kind: SearchKind, text: str, limit: int) -> list[tuple[int, str]]:
+        """
+        Get the names containing ``text``, best matches first.
+
+        Names that start with ``text`` come first, then shorter names.
+        """
+        if len(text) >= TRIGRAM_LENGTH:
+            where, match = f"{kind} MATCH ?", _escape_phrase(text)
+        else:
+            where, match = "instr(lower(name), lower(?)) > 0", text
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT rowid, name FROM {kind} WHERE {where} "  # noqa: S608
+                "ORDER BY instr(lower(name), lower(?)) != 1, length(name), name LIMIT ?",
+                (match, text, limit),
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def refresh(self, session: Session) -> None:
+        """Bring the index up to date with the database."""
+        # The much smaller diagnostic and provider tables are reloaded every time
+        replaced: dict[SearchKind, list[tuple[int, str]]] = {
+            "diagnostics": _name_rows(session, "diagnostics"),
+            "providers": _name_rows(session, "providers"),
+        }
+
+        count = session.execute(select(func.count(models.Dataset.id))).scalar_one()
+        added = session.execute(
+            select(func.count(models.Dataset.id)).where(models.Dataset.id > self.max_dataset_id)
+        ).scalar_one()
+        if self.dataset_count + added != count:
+            logger.info("Datasets were removed, rebuilding the dataset search index")
+            rows = _name_rows(session, "datasets")
+            self.rebuild({**replaced, "datasets": rows})
+            self.max_dataset_id = 0
+        else:
+            rows = _name_rows(session, "datasets", after_id=self.max_dataset_id)
+            self.update(replaced, {"datasets": rows})
+        if rows:
+            self.max_dataset_id = rows[-1][0]
+        self.dataset_count = count
+
+
+_indexes: dict[str, tuple[str, SearchIndex]] = {}
+_indexes_lock = threading.Lock()
+_refresh_locks: dict[str, threading.Lock] = {}
+
+
+def get_search_index(session: Session, settings: "Settings") -> SearchIndex | None:
+    """
+    Get the search index for the database of a session, refreshing it when the database has changed.
+
+    A single thread per database refreshes the index,
+    while the others keep searching its current contents (or wait for it, if it is not built yet).
+
+    Returns
+    -------
+    :
+        The index, or None if ``SEARCH_INDEX_ENABLED`` is off
+    """
+    if not settings.SEARCH_INDEX_ENABLED:
+        return None
+
+    url = str(session.get_bind().engine.url)
+    generation = get_database_generation(session, max_age_seconds=settings.DATABASE_GENERATION_CHECK_SECONDS)
+    with _indexes_lock:
+        current = _indexes.get(url)
+        if current is not None and current[0] == generation:
+            return current[1]
+        refresh_lock = _refresh_locks.setdefault(url, threading.Lock())
+
+    if current is None:
+        refresh_lock.acquire()
+    elif not refresh_lock.acquire(blocking=False):
+        return current[1]
+    try:
+        # Another thread may have refreshed the index while this one waited
+        with _indexes_lock:
+            current = _indexes.get(url)
+        if current is not None and current[0] == generation:
+            return current[1]
+        index = current[1] if current is not None else SearchIndex()
+        index.refresh(session)
+        with _indexes_lock:
+            _indexes[url] = (generation, index)
+        return index
+    finally:
+        refresh_lock.release()
+
+
+def resolve_name_contains(
+    session: Session, settings: "Settings", kind: SearchKind, text: str
+) -> list[int] | None:
+    """
+    Resolve a ``*_contains`` filter to the ids of the matching rows.
+
+    ``text`` is matched as it would be by ``ILIKE '%text%'``,
+    so ``%`` and ``_`` in it remain wildcards.
+
+    Returns
+    -------
+    :
+        The matching ids, or None if the filter should be applied in SQL instead:
+        the index is disabled or more than ``SEARCH_INDEX_MAX_IDS`` rows match
+    """
+    index = get_search_index(session, settings)
+    if index is None:
+        return None
+    ids = index.like(kind, f"%{text}%")
+    if len(ids) > settings.SEARCH_INDEX_MAX_IDS:
+        return None
+    return ids
+
+
+def build_name_contains_clause(
+    session: Session, settings: "Settings", kind: SearchKind, text: str
+) -> ColumnElement[bool]:
+    """
+    Build the clause for a ``*_contains`` filter on the names of ``kind``.
+
+    The clause restricts the ids to those found with the search index when it can,
+    and is a ``ILIKE '%text%'`` on the name otherwise.
+    """
+    id_column, name_column = _NAME_COLUMNS[kind]
+    ids = resolve_name_contains(session, settings, kind, text)
+    if ids is None:
+        return name_column.ilike(f"%{text}%")
+    return build_id_clause(id_column, ids)
+
+
+def suggest_names(
+    session: Session, settings: "Settings", kind: SearchKind, text: str, limit: int
+) -> list[tuple[int, str]]:
+    """
+    Get ``(id, name)`` for the names that contain ``text``, best matches first.
+
+    Falls back to a SQL query when the search index is disabled.
+    """
+    index = get_search_index(session, settings)
+    if index is not None:
+        return index.suggest(kind, text, limit)
+
+    id_column, name_column = _NAME_COLUMNS[kind]
+    rows = session.execute(
+        select(id_column, name_column)
+        .where(name_column.icontains(text, autoescape=True))
+        .order_by(~name_column.istartswith(text, autoescape=True), func.length(name_column), name_column)
+        .limit(limit)
+    )
+    return [(row[0], row[1]) for row in rows]
@@ -0,0 +1,236 @@
+"""
+Per-request performance telemetry.
+
+Each request is split into phases whose durations are added up while it is handled:
+
+- ``db``: time spent executing SQL statements, and the number of statements
+- ``app``: time spent in the endpoint function, including its queries
+- ``serialize``: time spent validating and encoding the endpoint's result
+- ``file``: time spent reading result files
+- ``cache``: hits and misses of the query cache
+
+The phases are reported in a ``Server-Timing`` header,
+which browser developer tools show alongside each request,
+and as structured fields of a log record for each request.
+File reads streamed after the headers were sent only appear in the log record.
+"""
+
+import functools
+import inspect
+import time
+import weakref
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi.routing import APIRoute
+from loguru import logger
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@dataclass
+class RequestTimings:
+    """Durations, in milliseconds, and counts of the phases of a request."""
+
+    started: float = field(default_factory=time.perf_counter)
+    durations_ms: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    endpoint_finished: float | None = None
+
+    def record(self, phase: str, duration_ms: float, count: int = 1) -> None:
+        """Add a duration to a phase."""
+        self.durations_ms[phase] = self.durations_ms.get(phase, 0.0) + duration_ms
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def count(self, name: str) -> None:
+        """Count an event that has no duration, such as a cache hit."""
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed_ms(self) -> float:
+        """Get the time since the request started."""
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Format the phases as the value of a ``Server-Timing`` header."""
+        metrics = []
+        for phase, duration in self.durations_ms.items():
+            description = f';desc="{self.counts[phase]} queries"' if phase == "db" else ""
+            metrics.append(f"{phase};dur={duration:.1f}{description}")
+        if "cache_hit" in self.counts or "cache_miss" in self.counts:
+            hits, misses = self.counts.get("cache_hit", 0), self.counts.get("cache_miss", 0)
+            metrics.append(f'cache;desc="{hits} hits, {misses} misses"')
+        metrics.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(metrics)
+
+    def log_fields(self) -> dict[str, Any]:
+        """Get the phases as fields of a structured log record."""
+        fields: dict[str, Any] = {f"{phase}_ms": round(ms, 2) for phase, ms in self.durations_ms.items()}
+        fields["db_queries"] = self.counts.get("db", 0)
+        fields["cache_hits"] = self.counts.get("cache_hit", 0)
+        fields["cache_misses"] = self.counts.get("cache_miss", 0)
+        fields["total_ms"] = round(self.elapsed_ms(), 2)
+        return fields
+
+
+_current_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> RequestTimings | None:
+    """Get the timings of the request being handled, if telemetry is enabled."""
+    return _current_timings.get()
+
+
+@contextmanager
+def track_request() -> Iterator[RequestTimings]:
+    """Collect the timings of the work done in a block."""
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in a block to a phase of the current request."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record(phase, (time.perf_counter() - start) * 1000)
+
+
+def record_cache(hit: bool) -> None:
+    """Count a cache hit or miss for the current request."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.count("cache_hit" if hit else "cache_miss")
+
+
+def install_telemetry(engine: Engine) -> None:
+    """Add the statements executed by an engine to the ``db`` phase of the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(  # noqa: PLR0913, PLR0917
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        conn.info["telemetry_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(  # noqa: PLR0913, PLR0917
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        timings = _current_timings.get()
+        started = conn.info.pop("telemetry_started", None)
+        if timings is not None and started is not None:
+            timings.record("db", (time.perf_counter() - started) * 1000)
+
+
+_timed_endpoints: "weakref.WeakSet[Callable[..., Any]]" = weakref.WeakSet()
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint to record its duration, and when it returned, in the ``app`` phase."""
+    # Including a router recreates its routes from the already wrapped endpoints
+    if endpoint in _timed_endpoints:
+        return endpoint
+
+    def finished(started: float) -> None:
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.endpoint_finished = time.perf_counter()
+            timings.record("app", (timings.endpoint_finished - started) * 1000)
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                finished(started)
+
+        _timed_endpoints.add(async_wrapper)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            finished(started)
+
+    _timed_endpoints.add(wrapper)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that records the time spent in its endpoint and serializing the endpoint's result.
+
+    FastAPI inspects the wrapped endpoint, so its parameters and dependencies are unchanged.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response = await handler(request)
+            timings = _current_timings.get()
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.record("serialize", (time.perf_counter() - timings.endpoint_finished) * 1000)
+            return response
+
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    """
+    Measure the phases of each HTTP request, and report them in a header and a log record.
+
+    Requests slower than ``slow_request_ms`` are logged at ``INFO``, and the rest at ``DEBUG``.
+    """
+
+    def __init__(self, app: ASGIApp, slow_request_ms: float) -> None:
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        with track_request() as timings:
+
+            async def send_with_timings(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timings)
+            finally:
+                fields = timings.log_fields()
+                level = "INFO" if fields["total_ms"] >= self.slow_request_ms else "DEBUG"
+                logger.bind(method=scope["method"], path=scope["path"], status=status_code, **fields).log(
+                    level, f"{scope['method']} {scope['path']} {status_code} in {fields['total_ms']:.1f} ms"
+                )
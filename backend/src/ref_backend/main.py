@@ -23,13 +23,31 @@ dotenv.load_dotenv(override=True)
 settings = get_settings()
 
 from ref_backend.builder import build_app  # noqa: E402
+from ref_backend.core.aft import get_aft_diagnostics_index  # noqa: E402
+from ref_backend.core.collections import load_theme_mapping  # noqa: E402
+from ref_backend.core.dataset_index import get_dataset_index  # noqa: E402
+from ref_backend.core.diagnostic_metadata import load_diagnostic_metadata_cached  # noqa: E402
+from ref_backend.core.latest_executions import get_latest_executions  # noqa: E402
 from ref_backend.core.ref import get_provider_registry, get_ref_config  # noqa: E402
+from ref_backend.core.search_index import get_search_index  # noqa: E402
 
 # Initialize singletons at application startup
 ref_config = get_ref_config(settings)
 database = deps._get_database_dependency(settings, ref_config)
 provider_registry = get_provider_registry(ref_config, read_only=settings.REF_READ_ONLY_DATABASE)
 
+# Parse the static YAML metadata now, so that the first request to each worker does not pay for it
+get_aft_diagnostics_index()
+load_theme_mapping()
+load_diagnostic_metadata_cached(settings.diagnostic_metadata_path_resolved)
+
+# Build the dataset facet and search indexes and the latest execution lookup before serving,
+# so the first filter does not wait for them
+with database.session_scope() as session:
+    get_dataset_index(session, settings)
+    get_search_index(session, settings)
+    get_latest_executions(session, settings)
+
 setup_logging(settings.LOG_LEVEL)
 app = build_app(settings, ref_config, database)
 
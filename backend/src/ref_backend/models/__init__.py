@@ -11,20 +11,25 @@ from ref_backend.models.aft import (
     AFTDiagnosticSummary,
     RefDiagnosticLink,
 )
-from ref_backend.models.common import Collection, GroupBy, ProviderSummary, T
+from ref_backend.models.common import Collection, CursorCollection, GroupBy, ProviderSummary, T
+from ref_backend.models.database import DatabasePoolStatus
 from ref_backend.models.datasets import CMIP6DatasetMetadata, Dataset
 from ref_backend.models.diagnostics import DiagnosticSummary
 from ref_backend.models.executions import (
+    DiagnosticOutput,
     Execution,
     ExecutionGroup,
     ExecutionOutput,
     ExecutionStats,
 )
+from ref_backend.models.search import SearchSuggestion
 from ref_backend.models.values import (
     NON_FACET_DIMENSIONS,
     Facet,
+    MetricValueBatchResult,
     MetricValueCollection,
     MetricValueFacetSummary,
+    MetricValueQuery,
     ScalarValue,
     SeriesValue,
 )
@@ -36,7 +41,10 @@ __all__ = [
     "AFTDiagnosticSummary",
     "CMIP6DatasetMetadata",
     "Collection",
+    "CursorCollection",
+    "DatabasePoolStatus",
     "Dataset",
+    "DiagnosticOutput",
     "DiagnosticSummary",
     "Execution",
     "ExecutionGroup",
@@ -44,11 +52,14 @@ __all__ = [
     "ExecutionStats",
     "Facet",
     "GroupBy",
+    "MetricValueBatchResult",
     "MetricValueCollection",
     "MetricValueFacetSummary",
+    "MetricValueQuery",
     "ProviderSummary",
     "RefDiagnosticLink",
     "ScalarValue",
+    "SearchSuggestion",
     "SeriesValue",
     "T",
 ]
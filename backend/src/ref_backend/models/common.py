@@ -12,6 +12,8 @@ T = TypeVar("T")
 class Collection(BaseModel, Generic[T]):
     data: list[T]
     total_count: int | None = None
+    total_count_exact: bool = True
+    """False if ``total_count`` is the database's estimate rather than an exact count"""
 
     @computed_field  # type: ignore
     @property
@@ -22,6 +24,19 @@ class Collection(BaseModel, Generic[T]):
         return len(self.data)
 
 
+class CursorCollection(Collection[T], Generic[T]):
+    """
+    A page of a collection that is fetched with a cursor rather than an offset.
+    """
+
+    next_cursor: str | None = None
+    """
+    Cursor to pass to the next request to fetch the following page.
+
+    None once the last page has been returned.
+    """
+
+
 class ProviderSummary(BaseModel):
     """
     Summary information about a Metric Provider.
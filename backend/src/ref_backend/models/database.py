@@ -0,0 +1,21 @@
+"""Status of the database connections of the API."""
+
+from pydantic import BaseModel
+
+
+class DatabasePoolStatus(BaseModel):
+    """Utilisation of the connection pool of one database in one worker process."""
+
+    name: str
+    """``primary``, or ``replica-<n>`` for the read replicas in ``DATABASE_READ_REPLICA_URLS`` order"""
+    pid: int
+    """Id of the worker process the pool belongs to"""
+    pool_class: str
+    size: int | None
+    """Number of connections kept open, or None if the pool does not queue connections"""
+    checked_out: int | None
+    """Connections in use by requests"""
+    checked_in: int | None
+    """Idle connections in the pool"""
+    overflow: int | None
+    """Connections opened beyond ``size``; negative while the pool has not yet been filled"""
@@ -1,11 +1,12 @@
 """Diagnostic summaries, including the YAML metadata overrides."""
 
-from collections.abc import Mapping
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
 from typing import TYPE_CHECKING
 
 from loguru import logger
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy import Integer, exists, func, select
 
 from climate_ref import models
 from ref_backend.core.diagnostic_metadata import (
@@ -13,10 +14,13 @@ from ref_backend.core.diagnostic_metadata import (
     ReferenceDatasetLink,
     load_diagnostic_metadata_cached,
 )
+from ref_backend.core.latest_executions import count_successful_groups
 from ref_backend.models.aft import AFTDiagnosticDetail
 from ref_backend.models.common import GroupBy, ProviderSummary
 
 if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
     from ref_backend.api.deps import AppContext
 
 
@@ -225,28 +229,9 @@ class DiagnosticSummary(BaseModel):
         )
 
         # Count execution groups whose latest execution is successful
-        ExecutionGroup = models.ExecutionGroup
-        Execution = models.Execution
-
-        # Subquery: latest execution id per group
-        latest_exec_per_group = (
-            app_context.session.query(
-                Execution.execution_group_id.label("egid"),
-                func.max(Execution.id).label("latest_exec_id"),
-            )
-            .join(ExecutionGroup, Execution.execution_group_id == ExecutionGroup.id)
-            .filter(ExecutionGroup.diagnostic_id == diagnostic.id)
-            .group_by(Execution.execution_group_id)
-            .subquery()
-        )
-
-        # Join back to executions to check success of latest
-        successful_execution_group_count = (
-            app_context.session.query(latest_exec_per_group.c.egid)
-            .join(Execution, Execution.id == latest_exec_per_group.c.latest_exec_id)
-            .filter(Execution.successful.is_(True))
-            .count()
-        )
+        successful_execution_group_count = count_successful_groups(
+            app_context.session, app_context.settings, [diagnostic.id]
+        ).get(diagnostic.id, 0)
 
         concrete_diagnostic = app_context.provider_registry.get_metric(
             diagnostic.provider.slug, diagnostic.slug
@@ -286,6 +271,7 @@ class DiagnosticSummary(BaseModel):
         execution_stats: dict[str, int],
         execution_group_count: int,
         successful_execution_group_count: int,
+        execution_group_ids: list[int] | None = None,
     ) -> "DiagnosticSummary":
         """Build a DiagnosticSummary with pre-computed statistics to avoid N+1 queries."""
         metadata_cache = DiagnosticSummary._ensure_metadata_cache(app_context)
@@ -311,7 +297,11 @@ class DiagnosticSummary(BaseModel):
             slug=diagnostic.slug,
             name=diagnostic.name,
             description=description,
-            execution_groups=[e.id for e in diagnostic.execution_groups],
+            execution_groups=(
+                execution_group_ids
+                if execution_group_ids is not None
+                else [e.id for e in diagnostic.execution_groups]
+            ),
             has_metric_values=has_metric_values,
             has_scalar_values=has_scalar_values,
             has_series_values=has_series_values,
@@ -327,3 +317,86 @@ class DiagnosticSummary(BaseModel):
         DiagnosticSummary._apply_metadata_overrides(summary, diagnostic, metadata_cache)
 
         return summary
+
+    @staticmethod
+    def _ids_with_values(
+        session: "Session",
+        diagnostic_ids: list[int],
+        value_model: type[models.ScalarMetricValue] | type[models.SeriesMetricValue],
+    ) -> set[int]:
+        """Get the ids of the diagnostics with at least one metric value of ``value_model``."""
+        has_values = (
+            exists()
+            .where(models.ExecutionGroup.diagnostic_id == models.Diagnostic.id)
+            .where(models.Execution.execution_group_id == models.ExecutionGroup.id)
+            .where(value_model.execution_id == models.Execution.id)
+        )
+        return set(
+            session.scalars(
+                select(models.Diagnostic.id).where(models.Diagnostic.id.in_(diagnostic_ids), has_values)
+            )
+        )
+
+    @staticmethod
+    def build_many(
+        diagnostics: Sequence[models.Diagnostic], app_context: "AppContext"
+    ) -> "list[DiagnosticSummary]":
+        """
+        Build the summaries of several diagnostics with a fixed number of queries.
+
+        The statistics of every diagnostic are fetched together,
+        so the number of queries does not grow with the number of diagnostics.
+        The providers of the diagnostics should already be loaded, e.g. with ``selectinload``.
+        """
+        if not diagnostics:
+            return []
+        session = app_context.session
+        diagnostic_ids = [d.id for d in diagnostics]
+
+        # Check for scalar and series values existence, stopping at the first value of each diagnostic
+        scalar_diagnostic_ids = DiagnosticSummary._ids_with_values(
+            session, diagnostic_ids, models.ScalarMetricValue
+        )
+        series_diagnostic_ids = DiagnosticSummary._ids_with_values(
+            session, diagnostic_ids, models.SeriesMetricValue
+        )
+
+        # Count executions per diagnostic
+        execution_counts = (
+            session.query(
+                models.ExecutionGroup.diagnostic_id,
+                func.count(models.Execution.id).label("total_count"),
+                func.sum(func.cast(models.Execution.successful, Integer)).label("successful_count"),
+            )
+            .join(models.Execution)
+            .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
+            .group_by(models.ExecutionGroup.diagnostic_id)
+            .all()
+        )
+        execution_stats = {row[0]: {"total": row[1], "successful": row[2] or 0} for row in execution_counts}
+
+        # Execution groups per diagnostic, which also gives their counts
+        group_ids: dict[int, list[int]] = defaultdict(list)
+        for diagnostic_id, group_id in (
+            session.query(models.ExecutionGroup.diagnostic_id, models.ExecutionGroup.id)
+            .filter(models.ExecutionGroup.diagnostic_id.in_(diagnostic_ids))
+            .order_by(models.ExecutionGroup.id)
+        ):
+            group_ids[diagnostic_id].append(group_id)
+
+        # Count successful execution groups (latest execution successful)
+        successful_group_counts = count_successful_groups(session, app_context.settings, diagnostic_ids)
+
+        return [
+            DiagnosticSummary.build_with_stats(
+                d,
+                app_context,
+                has_scalar_values=d.id in scalar_diagnostic_ids,
+                has_series_values=d.id in series_diagnostic_ids,
+                execution_stats=execution_stats.get(d.id, {"total": 0, "successful": 0}),
+                execution_group_count=len(group_ids[d.id]),
+                successful_execution_group_count=successful_group_counts.get(d.id, 0),
+                execution_group_ids=group_ids[d.id],
+            )
+            for d in diagnostics
+        ]
@@ -1,16 +1,20 @@
 """Execution groups, executions and their outputs."""
 
-from datetime import datetime
+from collections.abc import Sequence
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING
 
+from loguru import logger
 from pydantic import BaseModel, computed_field
 
 from climate_ref import models
 from climate_ref.models.execution import ResultOutputType
+from ref_backend.core.latest_executions import pick_latest_execution
 from ref_backend.models.diagnostics import DiagnosticSummary
 
 if TYPE_CHECKING:
     from ref_backend.api.deps import AppContext
+    from ref_backend.core.output_catalog import CatalogEntry
 
 
 class ExecutionOutput(BaseModel):
@@ -41,6 +45,43 @@ class ExecutionOutput(BaseModel):
         )
 
 
+class DiagnosticOutput(BaseModel):
+    """
+    An output of the latest execution of one of a diagnostic's execution groups
+
+    `size` and `modified_at` describe the file in the results directory,
+    and are None if the file is missing.
+    """
+
+    id: int
+    execution_id: int
+    execution_group_id: int
+    output_type: ResultOutputType
+    filename: str
+    short_name: str | None = None
+    long_name: str | None = None
+    description: str | None = None
+    size: int | None = None
+    modified_at: datetime | None = None
+    url: str
+
+    @staticmethod
+    def build(entry: "CatalogEntry", app_context: "AppContext") -> "DiagnosticOutput":
+        return DiagnosticOutput(
+            id=entry.output_id,
+            execution_id=entry.execution_id,
+            execution_group_id=entry.execution_group_id,
+            output_type=entry.output_type,
+            filename=entry.filename,
+            short_name=entry.short_name,
+            long_name=entry.long_name,
+            description=entry.description,
+            size=entry.size,
+            modified_at=datetime.fromtimestamp(entry.mtime, tz=UTC) if entry.mtime is not None else None,
+            url=f"{app_context.settings.BACKEND_HOST}{app_context.settings.API_V1_STR}/results/{entry.output_id}",
+        )
+
+
 class ExecutionGroup(BaseModel):
     id: int
     key: str
@@ -57,10 +98,31 @@ class ExecutionGroup(BaseModel):
         execution_group: models.ExecutionGroup,
         app_context: "AppContext",
         diagnostic_summary: "DiagnosticSummary | None" = None,
+        *,
+        executions: Sequence[models.Execution] | None = None,
+        include_outputs: bool = True,
     ) -> "ExecutionGroup":
-        latest_execution = None
-        if len(execution_group.executions):
-            latest_execution = execution_group.executions[-1]
+        """
+        Build the response for an execution group.
+
+        Parameters
+        ----------
+        execution_group
+            Execution group to describe
+        app_context
+            Application context
+        diagnostic_summary
+            Precomputed summary of the group's diagnostic, to avoid querying it for every group
+        executions
+            Executions to include, oldest first.
+            Defaults to every execution of the group.
+            The one with the largest id is reported as the latest execution.
+        include_outputs
+            Whether to include the outputs of each execution
+        """
+        if executions is None:
+            executions = execution_group.executions
+        latest_execution = pick_latest_execution(executions)
 
         # Reuse a precomputed DiagnosticSummary when provided to avoid N+1 DB queries
         diagnostic = diagnostic_summary or DiagnosticSummary.build(execution_group.diagnostic, app_context)
@@ -69,14 +131,58 @@ class ExecutionGroup(BaseModel):
             id=execution_group.id,
             key=execution_group.key,
             dirty=execution_group.dirty,
-            executions=[Execution.build(r, app_context) for r in execution_group.executions],
-            latest_execution=Execution.build(latest_execution, app_context) if latest_execution else None,
+            executions=[Execution.build(r, app_context, include_outputs=include_outputs) for r in executions],
+            latest_execution=(
+                Execution.build(latest_execution, app_context, include_outputs=include_outputs)
+                if latest_execution
+                else None
+            ),
             selectors=execution_group.selectors,
             diagnostic=diagnostic,
             created_at=execution_group.created_at,
             updated_at=execution_group.updated_at,
         )
 
+    @staticmethod
+    def build_many(
+        execution_groups: Sequence[models.ExecutionGroup],
+        app_context: "AppContext",
+        *,
+        include_outputs: bool = True,
+        skip_failures: bool = False,
+    ) -> "list[ExecutionGroup]":
+        """
+        Build the responses for several execution groups.
+
+        The summaries of the diagnostics are built together, once however many of the groups share each.
+        The executions (and their datasets and outputs) and diagnostics of the groups
+        should already be loaded, e.g. with ``selectinload``, to avoid a query per group.
+
+        With ``skip_failures``, a group whose response cannot be built is logged and left out,
+        rather than failing the whole list.
+        """
+        diagnostics = {group.diagnostic_id: group.diagnostic for group in execution_groups}
+        summaries = {
+            summary.id: summary
+            for summary in DiagnosticSummary.build_many(list(diagnostics.values()), app_context)
+        }
+        data = []
+        for execution_group in execution_groups:
+            try:
+                data.append(
+                    ExecutionGroup.build(
+                        execution_group,
+                        app_context,
+                        diagnostic_summary=summaries[execution_group.diagnostic_id],
+                        include_outputs=include_outputs,
+                    )
+                )
+            except Exception as e:
+                if not skip_failures:
+                    raise
+                logger.error(f"Error building execution group ID {execution_group.id}: {e}")
+        return data
+
 
 class Execution(BaseModel):
     id: int
@@ -89,8 +195,12 @@ class Execution(BaseModel):
     outputs: "list[ExecutionOutput]"
 
     @staticmethod
-    def build(execution: models.Execution, app_context: "AppContext") -> "Execution":
-        outputs = [ExecutionOutput.build(o, app_context) for o in execution.outputs]
+    def build(
+        execution: models.Execution, app_context: "AppContext", *, include_outputs: bool = True
+    ) -> "Execution":
+        outputs = (
+            [ExecutionOutput.build(o, app_context) for o in execution.outputs] if include_outputs else []
+        )
         return Execution(
             id=execution.id,
             successful=execution.successful or False,
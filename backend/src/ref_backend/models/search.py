@@ -0,0 +1,13 @@
+"""Search suggestions returned by the API."""
+
+from pydantic import BaseModel
+
+from ref_backend.core.search_index import SearchKind
+
+
+class SearchSuggestion(BaseModel):
+    """A name that matches a search, with the id of what it names."""
+
+    kind: SearchKind
+    id: int
+    name: str
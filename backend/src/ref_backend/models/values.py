@@ -3,10 +3,11 @@
 from collections.abc import Sequence
 from typing import TYPE_CHECKING, Literal, Union, cast
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from climate_ref_core.metric_values import ScalarMetricValue
 from ref_backend.core.json_utils import sanitize_float_list, sanitize_float_value
+from ref_backend.core.metric_values import MetricValueType
 
 if TYPE_CHECKING:
     from climate_ref.results.values import ScalarValueCollection, SeriesValueCollection
@@ -180,6 +181,39 @@ class MetricValueCollection(BaseModel):
         )
 
 
+class MetricValueQuery(BaseModel):
+    """
+    A query for the metric values of a diagnostic, as one of a batch
+
+    The fields match the parameters of the diagnostic values endpoint,
+    with the dimension filters collected in `filters`.
+    """
+
+    provider_slug: str
+    diagnostic_slug: str
+    value_type: MetricValueType
+    filters: dict[str, str] = Field(default_factory=dict)
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=50, ge=1, le=500)
+    detect_outliers: Literal["off", "iqr"] = "iqr"
+    include_unverified: bool = False
+    isolate_ids: list[int] | None = None
+    exclude_ids: list[int] | None = None
+
+
+class MetricValueBatchResult(BaseModel):
+    """
+    The outcome of one query of a batch
+
+    A query that fails, e.g. for an unknown diagnostic, does not fail the rest of the batch:
+    its `status_code` and `detail` are those the single query would have been answered with.
+    """
+
+    status_code: int = 200
+    detail: str | None = None
+    result: MetricValueCollection | None = None
+
+
 class MetricValueFacetSummary(BaseModel):
     """
     Summary of the dimensions used in a metric value collection.
@@ -1,5 +1,8 @@
 import functools
 from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Engine, event
 
 from climate_ref.config import Config
 from ref_backend.core.config import Settings
@@ -46,3 +49,37 @@ def test_ref_config() -> Config:
     config.ignore_datasets_file = EXAMPLE_DIR / "ignore_datasets.yaml"
 
     return config
+
+
+class QueryCounter:
+    """
+    Record the SQL statements executed by every engine while the counter is active.
+
+    Used as a context manager around test requests, to catch changes that add queries to an endpoint:
+
+    .. code-block:: python
+
+        with QueryCounter() as counter:
+            client.get("/api/v1/diagnostics/")
+        assert counter.count <= 6, counter.statements
+    """
+
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        """Number of statements executed."""
+        return len(self.statements)
+
+    def _record(  # noqa: PLR0913, PLR0917
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(Engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        event.remove(Engine, "before_cursor_execute", self._record)
@@ -1,4 +1,4 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator
 
 import pytest
 from fastapi import FastAPI
@@ -6,8 +6,10 @@ from starlette.testclient import TestClient
 
 from ref_backend.api import deps
 from ref_backend.builder import build_app
+from ref_backend.core.compression import CompressionMiddleware
 from ref_backend.core.config import get_settings
-from ref_backend.testing import test_ref_config, test_settings
+from ref_backend.core.ref import get_provider_registry
+from ref_backend.testing import QueryCounter, test_ref_config, test_settings
 
 
 @pytest.fixture(scope="session")
@@ -39,3 +41,59 @@ def app() -> FastAPI:
 def client(app) -> Generator[TestClient, None, None]:
     with TestClient(app) as c:
         yield c
+
+
+@pytest.fixture
+def without_compression_cache(app, client) -> Generator[None, None, None]:
+    """
+    Answer requests from the app rather than the compressed responses kept by earlier tests.
+
+    The cache is emptied and disabled for the test, then enabled again.
+    """
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, CompressionMiddleware):
+        layer = getattr(layer, "app", None)
+    if layer is None:
+        yield
+        return
+
+    cache = layer.precompressed
+    max_entries = cache.max_entries
+    cache.clear()
+    cache.max_entries = 0
+    try:
+        yield
+    finally:
+        cache.max_entries = max_entries
+
+
+@pytest.fixture
+def count_queries(app, client) -> Generator[Callable[[str], QueryCounter], None, None]:
+    """
+    Count the SQL statements executed by a GET request, with the query cache disabled.
+
+    A first, uncounted, request loads anything that a worker only loads once.
+    """
+    previous = dict(app.dependency_overrides)
+    # Check the database generation in every request, rather than in those that come after a delay
+    uncached = test_settings().model_copy(
+        update={"QUERY_CACHE_MAX_ENTRIES": 0, "DATABASE_GENERATION_CHECK_SECONDS": 0}
+    )
+    app.dependency_overrides[get_settings] = lambda: uncached
+    # Load the providers up front, as main.py does, rather than in every request
+    provider_registry = get_provider_registry(test_ref_config())
+    app.dependency_overrides[deps._provider_registry_dependency] = lambda: provider_registry
+    # Responses must come from the app rather than the cache of compressed responses
+    headers = {"Accept-Encoding": "identity"}
+
+    def count(url: str) -> QueryCounter:
+        client.get(url, headers=headers).raise_for_status()
+        with QueryCounter() as counter:
+            client.get(url, headers=headers).raise_for_status()
+        return counter
+
+    try:
+        yield count
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
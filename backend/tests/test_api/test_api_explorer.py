@@ -253,3 +253,91 @@ def test_atmosphere_cards_include_y_min_y_max(client: TestClient, settings, coll
     content = data["explorer_cards"][0]["content"][0]
     assert content["y_min"] == -5.0
     assert content["y_max"] == 5.0
+
+
+@pytest.fixture
+def cards_collection(tmp_path: Path, monkeypatch):
+    """A collection with one card of each kind, for diagnostics in the test database."""
+    cols_dir = tmp_path / "collections"
+    cols_dir.mkdir()
+    _write_yaml(
+        cols_dir / "9.1.yaml",
+        {
+            "id": "9.1",
+            "name": "Cards Collection",
+            "diagnostics": [],
+            "explorer_cards": [
+                {
+                    "title": "Annual cycle",
+                    "content": [
+                        {
+                            "type": "box-whisker-chart",
+                            "provider": "pmp",
+                            "diagnostic": "annual-cycle",
+                            "title": "Bias",
+                            "other_filters": {"statistic": "bias_xy", "season": "ann"},
+                            "filter_controls": [
+                                {"filter_key": "season", "default_value": "djf", "exclude_values": ["mam"]}
+                            ],
+                        },
+                        {
+                            "type": "figure-gallery",
+                            "provider": "pmp",
+                            "diagnostic": "annual-cycle",
+                            "title": "Maps",
+                            "filename_filter": "djf",
+                        },
+                    ],
+                },
+                {
+                    "title": "Sea ice",
+                    "content": [
+                        {
+                            "type": "series-chart",
+                            "provider": "esmvaltool",
+                            "diagnostic": "sea-ice-area-basic",
+                            "title": "Seasonal cycle",
+                        },
+                        {
+                            "type": "series-chart",
+                            "provider": "missing",
+                            "diagnostic": "missing",
+                            "title": "Unknown diagnostic",
+                        },
+                    ],
+                },
+            ],
+        },
+    )
+    monkeypatch.setattr("ref_backend.core.collections.get_collections_dir", lambda: cols_dir)
+    return "9.1"
+
+
+def test_collection_cards_match_the_explorer_requests(client: TestClient, settings, cards_collection):
+    r = client.get(f"{settings.API_V1_STR}/explorer/collections/{cards_collection}/cards")
+
+    assert r.status_code == 200
+    data = r.json()
+    assert data["collection_id"] == cards_collection
+    assert [len(card) for card in data["cards"]] == [2, 2]
+    (box, gallery), (series, missing) = data["cards"]
+
+    values_url = f"{settings.API_V1_STR}/diagnostics/pmp/annual-cycle/values"
+    expected = client.get(
+        values_url, params={"value_type": "scalar", "limit": 500, "statistic": "bias_xy", "season": "djf"}
+    ).json()
+    assert box["values"] == expected
+    assert "djf" in box["filter_options"]["season"]
+    assert "mam" not in box["filter_options"]["season"]
+
+    assert gallery["figures"]
+    assert all("djf" in figure["filename"].lower() for figure in gallery["figures"])
+
+    assert series["values"]["count"] > 0
+    assert missing["status_code"] == 404
+    assert missing["values"] is None
+
+
+def test_collection_cards_unknown_collection(client: TestClient, settings, cards_collection):
+    r = client.get(f"{settings.API_V1_STR}/explorer/collections/nonexistent/cards")
+    assert r.status_code == 404
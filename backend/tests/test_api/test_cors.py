@@ -1,7 +1,7 @@
 """Tests for CORS middleware configuration.
 
 Verifies that the read-only API restricts CORS appropriately:
-- Only GET method is allowed
+- Only GET, and POST for the metric value batches, are allowed
 - Credentials are not permitted
 """
 
@@ -21,20 +21,19 @@ def test_cors_allows_get_requests(client: TestClient, settings) -> None:
     assert "GET" in r.headers.get("access-control-allow-methods", "")
 
 
-def test_cors_rejects_post_preflight(client: TestClient, settings) -> None:
-    """Test that CORS preflight rejects POST requests.
-
-    The API is read-only so only GET should be permitted.
-    """
+def test_cors_allows_post_preflight_for_batches(client: TestClient, settings) -> None:
+    """Test that CORS preflight allows the JSON POST of a batch of metric value queries."""
     r = client.options(
-        f"{settings.API_V1_STR}/diagnostics/",
+        f"{settings.API_V1_STR}/diagnostics/values",
         headers={
             "Origin": "http://localhost:5173",
             "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "content-type",
         },
     )
-    # CORS middleware returns 400 for disallowed methods
-    assert r.status_code == 400
+    assert r.status_code == 200
+    assert "POST" in r.headers.get("access-control-allow-methods", "")
+    assert "content-type" in r.headers.get("access-control-allow-headers", "").lower()
 
 
 def test_cors_rejects_delete_preflight(client: TestClient, settings) -> None:
@@ -2,8 +2,15 @@ from contextlib import contextmanager
 
 import sqlalchemy
 from fastapi.testclient import TestClient
-
-from ref_backend.api.deps import _get_database_dependency, get_database_session
+from starlette.requests import Request
+
+from ref_backend.api.deps import (
+    _get_database_dependency,
+    _request_database_dependency,
+    get_database_session,
+    get_read_replicas,
+    use_read_replica,
+)
 from ref_backend.testing import test_ref_config as _load_test_ref_config
 
 # FastAPI drives the dependency as a generator, so the tests wrap it to get the same teardown.
@@ -47,3 +54,19 @@ def test_request_returns_its_connection_to_the_pool(client: TestClient, settings
 
     assert response.status_code == 200
     assert database._engine.pool.checkedout() == 0
+
+
+def test_heavy_endpoints_use_a_read_replica(settings):
+    """Only requests to endpoints that opt in are sent to the replicas, in turn"""
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    replica_settings = settings.model_copy(update={"DATABASE_READ_REPLICA_URLS": [database.url, "sqlite://"]})
+    replicas = get_read_replicas(replica_settings)
+
+    heavy = Request({"type": "http"})
+    use_read_replica(heavy)
+    chosen = {id(_request_database_dependency(heavy, replica_settings, database)) for _ in range(4)}
+    light = Request({"type": "http"})
+
+    assert chosen == {id(replica) for replica in replicas}
+    assert _request_database_dependency(light, replica_settings, database) is database
+    assert _request_database_dependency(heavy, settings, database) is database
@@ -0,0 +1,73 @@
+"""Tests for the ETag and Cache-Control middleware."""
+
+from fastapi.testclient import TestClient
+
+from ref_backend.core.http_cache import DATABASE_CONTENT, HTTPCacheMiddleware, _etag_matches
+
+
+def test_responses_have_etag_and_cache_control(client: TestClient, settings) -> None:
+    r = client.get(f"{settings.API_V1_STR}/diagnostics/")
+
+    assert r.status_code == 200
+    assert r.headers["etag"].startswith('W/"')
+    assert "max-age=60" in r.headers["cache-control"]
+
+
+def test_matching_if_none_match_returns_not_modified(client: TestClient, settings) -> None:
+    url = f"{settings.API_V1_STR}/diagnostics/"
+    etag = client.get(url).headers["etag"]
+
+    r = client.get(url, headers={"If-None-Match": etag})
+
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+
+def test_stale_if_none_match_returns_response(client: TestClient, settings) -> None:
+    r = client.get(f"{settings.API_V1_STR}/diagnostics/", headers={"If-None-Match": 'W/"stale"'})
+
+    assert r.status_code == 200
+    assert r.json()
+
+
+def test_etag_depends_on_query(client: TestClient, settings) -> None:
+    first = client.get(f"{settings.API_V1_STR}/diagnostics/")
+    second = client.get(f"{settings.API_V1_STR}/diagnostics/?provider=pmp")
+
+    assert first.headers["etag"] != second.headers["etag"]
+
+
+def test_router_policies(client: TestClient, settings) -> None:
+    explorer = client.get(f"{settings.API_V1_STR}/explorer/themes/")
+    health = client.get(f"{settings.API_V1_STR}/utils/health-check/")
+
+    assert "max-age=300" in explorer.headers["cache-control"]
+    assert health.headers["cache-control"] == "no-store"
+    assert "etag" not in health.headers
+
+
+def test_policy_for_parameterised_prefixes(settings) -> None:
+    middleware = HTTPCacheMiddleware(None, database=None, settings=settings, prefix="/api/v1")  # type: ignore[arg-type]
+
+    # The data of the explorer cards changes with the database, unlike the curated explorer content
+    assert middleware.policy_for("/api/v1/explorer/collections/1.1/cards") == DATABASE_CONTENT
+    assert "max-age=300" in middleware.policy_for("/api/v1/explorer/collections/1.1")
+    assert middleware.policy_for("/api/v1/diagnostics/") == DATABASE_CONTENT
+    assert middleware.policy_for("/other") is None
+
+
+def test_errors_are_not_cached(client: TestClient, settings) -> None:
+    r = client.get(f"{settings.API_V1_STR}/executions/999999")
+
+    assert r.status_code == 404
+    assert r.headers["cache-control"] == "no-store"
+    assert "etag" not in r.headers
+
+
+def test_etag_matches() -> None:
+    assert _etag_matches('W/"abc"', 'W/"abc"')
+    assert _etag_matches('"abc"', 'W/"abc"')
+    assert _etag_matches('W/"xyz", W/"abc"', 'W/"abc"')
+    assert _etag_matches("*", 'W/"abc"')
+    assert not _etag_matches('W/"xyz"', 'W/"abc"')
@@ -0,0 +1,120 @@
+"""
+Query budgets of the API.
+
+Each endpoint has a budget of SQL statements per request,
+and must not use more statements for larger pages or larger collections.
+A change that adds a query per item, e.g. by lazy loading a relationship in one of the ``build``
+methods of ``ref_backend.models``, fails here rather than slowing down large databases.
+The budgets are the current counts, and should be lowered when an endpoint is optimised.
+"""
+
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+API = "/api/v1"
+
+QUERY_BUDGETS = {
+    "/diagnostics/": 7,
+    "/diagnostics/{diagnostic}": 9,
+    "/diagnostics/{diagnostic}/execution_groups": 14,
+    "/diagnostics/{diagnostic}/executions": 5,
+    "/diagnostics/{diagnostic}/outputs": 2,
+    "/diagnostics/{diagnostic}/values?value_type=scalar": 21,
+    "/executions/": 12,
+    "/executions/statistics": 6,
+    "/executions/{group}": 13,
+    "/executions/{group}/datasets": 4,
+    "/executions/{group}/values?value_type=scalar": 22,
+    "/datasets/": 2,
+    "/datasets/{dataset}/executions": 12,
+    "/search/suggest?q=a": 1,
+}
+
+
+@pytest.fixture(scope="module")
+def diagnostics(client):
+    """Diagnostics that have execution groups, from the fewest groups to the most."""
+    data = client.get(f"{API}/diagnostics/").json()["data"]
+    with_groups = [d for d in data if d["execution_group_count"]]
+    return sorted(with_groups, key=lambda d: d["execution_group_count"])
+
+
+def _diagnostic_path(diagnostic) -> str:
+    return f"{diagnostic['provider']['slug']}/{diagnostic['slug']}"
+
+
+@pytest.fixture(scope="module")
+def placeholders(client, diagnostics):
+    diagnostic = diagnostics[-1]
+    group = diagnostic["execution_groups"][0]
+    dataset = client.get(f"{API}/datasets/", params={"limit": 1}).json()["data"][0]
+    return {"diagnostic": _diagnostic_path(diagnostic), "group": group, "dataset": dataset["id"]}
+
+
+@pytest.mark.parametrize("endpoint", QUERY_BUDGETS)
+def test_query_budget(count_queries, placeholders, endpoint):
+    counter = count_queries(API + endpoint.format(**placeholders))
+
+    assert counter.count <= QUERY_BUDGETS[endpoint], "\n\n".join(counter.statements)
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        "/executions/?limit={limit}",
+        "/datasets/?limit={limit}",
+        "/datasets/{dataset}/executions?limit={limit}",
+        "/diagnostics/{diagnostic}/execution_groups?limit={limit}",
+        "/diagnostics/{diagnostic}/executions?limit={limit}",
+        "/diagnostics/{diagnostic}/values?value_type=scalar&limit={limit}",
+    ],
+)
+def test_queries_do_not_grow_with_page_size(count_queries, placeholders, endpoint):
+    counts = {
+        limit: count_queries(API + endpoint.format(limit=limit, **placeholders)).count
+        for limit in (1, 10, 100)
+    }
+
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        "/diagnostics/{diagnostic}",
+        "/diagnostics/{diagnostic}/execution_groups",
+        "/diagnostics/{diagnostic}/executions",
+        "/diagnostics/{diagnostic}/outputs",
+    ],
+)
+def test_queries_do_not_grow_with_collection_size(count_queries, diagnostics, endpoint):
+    smallest, largest = diagnostics[0], diagnostics[-1]
+    assert smallest["execution_group_count"] < largest["execution_group_count"]
+
+    counts = [
+        count_queries(API + endpoint.format(diagnostic=_diagnostic_path(diagnostic))).count
+        for diagnostic in (smallest, largest)
+    ]
+
+    assert counts[0] == counts[1], counts
+
+
+def test_batched_card_queries_share_their_reads(count_queries, diagnostics):
+    """The facet and values queries of an explorer card cost no more than the values query alone."""
+    diagnostic = diagnostics[-1]
+    card = {
+        "provider_slug": diagnostic["provider"]["slug"],
+        "diagnostic_slug": diagnostic["slug"],
+        "value_type": "scalar",
+    }
+    single = count_queries(
+        f"{API}/diagnostics/{_diagnostic_path(diagnostic)}/values?value_type=scalar&limit=500"
+    )
+    batch = count_queries(
+        f"{API}/diagnostics/values?"
+        + urlencode({"queries": json.dumps([{**card, "limit": 1}, {**card, "limit": 500}])})
+    )
+
+    assert batch.count <= single.count, "\n\n".join(batch.statements)
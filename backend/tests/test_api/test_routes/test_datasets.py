@@ -1,5 +1,17 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import func, select, text
+
+from climate_ref import models
+from climate_ref.datasets import get_dataset_adapter
+from climate_ref.models.execution import execution_datasets
+from climate_ref.results import DatasetFilter
+from climate_ref.results.datasets import select_datasets
+from climate_ref_core.datasets import SourceDatasetType
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.testing import test_ref_config as _load_test_ref_config
 
 
 def get_dataset(client: TestClient, settings) -> dict:
@@ -122,3 +134,67 @@ def test_dataset_list_name_contains(client: TestClient, settings):
     returned_slugs = [ds["slug"] for ds in r.json()["data"]]
     assert slug in returned_slugs
     assert all(slug.lower() in returned.lower() for returned in returned_slugs)
+
+
+def test_dataset_list_indexed_facets_match_sql(client: TestClient, settings):
+    """Test that facets resolved with the dataset index give the same datasets as the SQL filter."""
+    dataset = get_dataset(client, settings)
+    facets = {
+        "source_id": [dataset["metadata"]["source_id"], "not-a-model"],
+        "variable_id": dataset["metadata"]["variable_id"],
+    }
+
+    r = client.get(f"{settings.API_V1_STR}/datasets/", params={"facets": json.dumps(facets), "limit": 100})
+    assert r.status_code == 200
+
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        statement = select_datasets(
+            DatasetFilter(source_type=SourceDatasetType.CMIP6, facets=facets, include_retracted=True),
+            latest_group_by=get_dataset_adapter("cmip6").dataset_id_metadata,
+        )
+        expected = session.execute(statement).scalars().unique().all()
+
+    assert r.json()["count"] == len(expected)
+    assert sorted(ds["id"] for ds in r.json()["data"]) == sorted(ds.id for ds in expected)
+
+
+def test_dataset_list_reports_exact_count(client: TestClient, settings):
+    """Test that the SQLite test database reports exact counts."""
+    r = client.get(f"{settings.API_V1_STR}/datasets/?limit=1")
+
+    assert r.status_code == 200
+    assert r.json()["total_count_exact"] is True
+    assert r.json()["total_count"] >= r.json()["count"]
+
+
+def test_dataset_executions_match_join(client: TestClient, settings):
+    """Test that the execution groups of a dataset are each listed once, in id order."""
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        # The dataset used by the most execution groups
+        dataset_id, group_count = session.execute(
+            select(
+                execution_datasets.c.dataset_id,
+                func.count(func.distinct(models.Execution.execution_group_id)).label("groups"),
+            )
+            .join(models.Execution, models.Execution.id == execution_datasets.c.execution_id)
+            .group_by(execution_datasets.c.dataset_id)
+            .order_by(text("groups DESC"))
+            .limit(1)
+        ).one()
+        expected = sorted(
+            session.scalars(
+                select(models.ExecutionGroup.id)
+                .join(models.ExecutionGroup.executions)
+                .join(models.Execution.datasets)
+                .where(models.Dataset.id == dataset_id)
+                .distinct()
+            ).all()
+        )
+
+    r = client.get(f"{settings.API_V1_STR}/datasets/{dataset_id}/executions", params={"limit": 100})
+
+    assert r.status_code == 200
+    assert r.json()["total_count"] == group_count == len(expected)
+    assert [eg["id"] for eg in r.json()["data"]] == expected[:100]
@@ -1,6 +1,10 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
+from ref_backend.core.cache import get_cache
+
 
 def get_diagnostic(client: TestClient, settings) -> dict:
     """Helper to get a diagnostic for testing."""
@@ -378,6 +382,20 @@ def test_diagnostic_values_pagination_beyond_total(client: TestClient, settings)
     assert data["total_count"] >= 0
 
 
+def test_diagnostic_values_csv_is_not_cached(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    cache = get_cache("metric_values", settings)
+    lookups = cache.stats.hits + cache.stats.misses
+
+    r = client.get(
+        f"{settings.API_V1_STR}/diagnostics/{diagnostic['provider']['slug']}/{diagnostic['slug']}/values",
+        params={"value_type": "scalar", "format": "csv", "detect_outliers": "off"},
+    )
+
+    assert r.status_code == 200
+    assert cache.stats.hits + cache.stats.misses == lookups
+
+
 def test_diagnostic_values_csv_ignores_pagination(client: TestClient, settings):
     """Test that CSV export returns all results regardless of pagination params."""
     diagnostic = get_diagnostic_with_scalar_values(client, settings)
@@ -623,13 +641,10 @@ def test_diagnostic_executions_ignores_truly_unknown_query_params(client: TestCl
 
 
 def test_diagnostic_executions_dunder_attrs_do_not_crash(client: TestClient, settings) -> None:
-    """Test that dunder attribute names in query params don't cause 500 errors.
+    """Test that dunder attribute names in query params are ignored.
 
-    NOTE: hasattr(CMIP6Dataset, '__tablename__') is True because it's a
-    SQLAlchemy class attribute. This means dunder names pass the hasattr check
-    and may produce unexpected filter behavior (returning 0 results). This test
-    verifies the server doesn't crash -- the empty result is a known limitation
-    of the unfiltered hasattr approach (tracked as MEDIUM priority).
+    Only CMIP6Dataset columns are used as filters, so class attributes such as
+    `__tablename__` do not filter the results.
     """
     diagnostic = get_diagnostic(client, settings)
     provider_slug = diagnostic["provider"]["slug"]
@@ -641,6 +656,11 @@ def test_diagnostic_executions_dunder_attrs_do_not_crash(client: TestClient, set
     # Must not crash with a 500
     assert r.status_code == 200
 
+    r_unfiltered = client.get(
+        f"{settings.API_V1_STR}/diagnostics/{provider_slug}/{diagnostic_slug}/executions"
+    )
+    assert r.json()["count"] == r_unfiltered.json()["count"]
+
 
 def test_diagnostic_values_ignores_unknown_filter_params(client: TestClient, settings) -> None:
     """Test that unknown filter params on the values endpoint are safely ignored."""
@@ -700,3 +720,344 @@ def test_diagnostics_facets(client: TestClient, settings) -> None:
     assert "count" in data
     assert isinstance(data["dimensions"], dict)
     assert isinstance(data["count"], int)
+
+
+def test_diagnostic_values_repeat_request_is_cached(client: TestClient, settings):
+    """Repeating an identical values request is answered from the query cache."""
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    url = (
+        f"{settings.API_V1_STR}/diagnostics/{diagnostic['provider']['slug']}/{diagnostic['slug']}"
+        "/values?value_type=scalar&limit=7"
+    )
+    cache = get_cache("metric_values", settings)
+
+    first = client.get(url)
+    hits = cache.stats.hits
+    second = client.get(url)
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert cache.stats.hits == hits + 1
+
+
+def execution_groups_url(client: TestClient, settings) -> str:
+    """URL of the execution groups of the diagnostic with the most groups."""
+    diagnostics = client.get(f"{settings.API_V1_STR}/diagnostics/").json()["data"]
+    diagnostic = max(diagnostics, key=lambda d: d["execution_group_count"])
+    assert diagnostic["execution_group_count"] > 2
+    slug = f"{diagnostic['provider']['slug']}/{diagnostic['slug']}"
+    return f"{settings.API_V1_STR}/diagnostics/{slug}/execution_groups"
+
+
+def test_diagnostic_execution_groups_unpaginated_by_default(client: TestClient, settings) -> None:
+    r = client.get(execution_groups_url(client, settings))
+    assert r.status_code == 200
+    data = r.json()
+
+    assert data["count"] == data["total_count"]
+    assert data["next_cursor"] is None
+    ids = [group["id"] for group in data["data"]]
+    assert ids == sorted(ids)
+
+
+def test_diagnostic_execution_groups_cursor_pages(client: TestClient, settings) -> None:
+    url = execution_groups_url(client, settings)
+    expected = [group["id"] for group in client.get(url).json()["data"]]
+
+    ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+        page = client.get(url, params=params).json()
+        assert page["count"] <= 2
+        assert page["total_count"] == len(expected)
+        ids.extend(group["id"] for group in page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == expected
+
+
+def test_diagnostic_execution_groups_invalid_cursor(client: TestClient, settings) -> None:
+    r = client.get(execution_groups_url(client, settings), params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+def test_diagnostic_execution_groups_projection(client: TestClient, settings) -> None:
+    url = execution_groups_url(client, settings)
+    full = {group["id"]: group for group in client.get(url).json()["data"]}
+
+    r = client.get(url, params={"include_outputs": False, "include_history": False})
+    assert r.status_code == 200
+
+    for group in r.json()["data"]:
+        latest = full[group["id"]]["latest_execution"]
+        if latest is None:
+            assert group["executions"] == []
+            continue
+        assert [execution["id"] for execution in group["executions"]] == [latest["id"]]
+        assert group["latest_execution"]["id"] == latest["id"]
+        assert group["latest_execution"]["dataset_count"] == latest["dataset_count"]
+        assert group["latest_execution"]["outputs"] == []
+
+
+def test_diagnostic_execution_groups_ndjson(client: TestClient, settings) -> None:
+    url = execution_groups_url(client, settings)
+    expected = client.get(url).json()["data"]
+
+    r = client.get(url, params={"format": "ndjson"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines == expected
+
+    limited = client.get(url, params={"format": "ndjson", "limit": 2})
+    assert len(limited.text.splitlines()) == 2
+
+
+def test_diagnostic_executions_are_unique_and_paginated(client: TestClient, settings) -> None:
+    diagnostic = get_diagnostic(client, settings)
+    url = (
+        f"{settings.API_V1_STR}/diagnostics/{diagnostic['provider']['slug']}/{diagnostic['slug']}/executions"
+    )
+
+    full = client.get(url, params={"source_id": "ACCESS-ESM1-5"}).json()
+    ids = [execution["id"] for execution in full["data"]]
+    assert ids
+    assert ids == sorted(set(ids))
+    assert full["total_count"] == len(ids)
+
+    paged = []
+    for offset in range(0, len(ids), 2):
+        page = client.get(url, params={"source_id": "ACCESS-ESM1-5", "offset": offset, "limit": 2}).json()
+        assert page["total_count"] == len(ids)
+        paged.extend(execution["id"] for execution in page["data"])
+    assert paged == ids
+
+
+def test_diagnostic_executions_combined_filters(client: TestClient, settings) -> None:
+    diagnostic = get_diagnostic(client, settings)
+    url = (
+        f"{settings.API_V1_STR}/diagnostics/{diagnostic['provider']['slug']}/{diagnostic['slug']}/executions"
+    )
+
+    everything = client.get(url).json()["total_count"]
+    by_source = client.get(url, params={"source_id": "ACCESS-ESM1-5"}).json()["total_count"]
+    # `instance_id` is not indexed, so this combines an index lookup with an EXISTS filter
+    no_match = client.get(url, params={"source_id": "ACCESS-ESM1-5", "instance_id": "missing"}).json()
+    any_source = client.get(url, params={"source_id": "ACCESS-ESM1-5,missing-model"}).json()
+
+    assert 0 < by_source <= everything
+    assert no_match["total_count"] == 0
+    assert any_source["total_count"] == by_source
+
+
+def values_batch(client: TestClient, settings, queries: list[dict]):
+    return client.get(f"{settings.API_V1_STR}/diagnostics/values", params={"queries": json.dumps(queries)})
+
+
+def test_diagnostic_values_batch_matches_single_requests(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    provider_slug = diagnostic["provider"]["slug"]
+    diagnostic_slug = diagnostic["slug"]
+    metric = get_diagnostic_metrics(client, settings, provider_slug, diagnostic_slug)[0]
+    queries = [
+        {"value_type": "scalar", "limit": 1, "offset": 0},
+        {"value_type": "scalar", "limit": 5, "offset": 2, "filters": {"metric": metric}},
+        {"value_type": "scalar", "limit": 3, "offset": 1, "detect_outliers": "off"},
+        {"value_type": "scalar", "limit": 20, "offset": 0, "detect_outliers": "off"},
+    ]
+
+    r = values_batch(
+        client,
+        settings,
+        [{"provider_slug": provider_slug, "diagnostic_slug": diagnostic_slug, **q} for q in queries],
+    )
+
+    assert r.status_code == 200
+    results = r.json()
+    assert len(results) == len(queries)
+    url = f"{settings.API_V1_STR}/diagnostics/{provider_slug}/{diagnostic_slug}/values"
+    for query, result in zip(queries, results, strict=True):
+        params = {k: v for k, v in query.items() if k != "filters"} | query.get("filters", {})
+        assert result["status_code"] == 200
+        assert result["result"] == client.get(url, params=params).json()
+
+
+def test_diagnostic_values_batch_reports_errors_per_query(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+
+    r = values_batch(
+        client,
+        settings,
+        [
+            {"provider_slug": "missing", "diagnostic_slug": "missing", "value_type": "scalar"},
+            {
+                "provider_slug": diagnostic["provider"]["slug"],
+                "diagnostic_slug": diagnostic["slug"],
+                "value_type": "scalar",
+            },
+        ],
+    )
+
+    assert r.status_code == 200
+    missing, found = r.json()
+    assert missing["status_code"] == 404
+    assert missing["result"] is None
+    assert found["status_code"] == 200
+    assert found["result"]["count"] > 0
+
+
+def test_diagnostic_values_batch_pages_share_a_read(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    query = {
+        "provider_slug": diagnostic["provider"]["slug"],
+        "diagnostic_slug": diagnostic["slug"],
+        "value_type": "scalar",
+        "detect_outliers": "off",
+    }
+    cache = get_cache("metric_values", settings)
+    misses = cache.stats.misses
+
+    r = values_batch(
+        client, settings, [{**query, "limit": 1}, {**query, "limit": 13}, {**query, "limit": 11}]
+    )
+
+    assert r.status_code == 200
+    one, thirteen, eleven = (result["result"] for result in r.json())
+    assert thirteen["data"][:1] == one["data"]
+    assert thirteen["data"][:11] == eleven["data"]
+    assert one["total_count"] == thirteen["total_count"]
+    assert cache.stats.misses <= misses + 1
+
+
+def test_diagnostic_values_batch_shares_reordered_filters(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    metric = get_diagnostic_metrics(client, settings, diagnostic["provider"]["slug"], diagnostic["slug"])[0]
+    query = {
+        "provider_slug": diagnostic["provider"]["slug"],
+        "diagnostic_slug": diagnostic["slug"],
+        "value_type": "scalar",
+        "detect_outliers": "off",
+    }
+    cache = get_cache("metric_values", settings)
+    misses = cache.stats.misses
+
+    r = values_batch(
+        client,
+        settings,
+        [
+            {**query, "filters": {"metric": metric, "source_id": "ACCESS-ESM1-5"}},
+            {**query, "filters": {"source_id": "ACCESS-ESM1-5", "metric": metric}, "limit": 1},
+        ],
+    )
+
+    assert r.status_code == 200
+    assert cache.stats.misses <= misses + 1
+
+
+def test_diagnostic_values_batch_post(client: TestClient, settings):
+    diagnostic = get_diagnostic_with_scalar_values(client, settings)
+    queries = [
+        {
+            "provider_slug": diagnostic["provider"]["slug"],
+            "diagnostic_slug": diagnostic["slug"],
+            "value_type": "scalar",
+            "limit": limit,
+        }
+        for limit in (1, 5)
+    ]
+
+    r = client.post(f"{settings.API_V1_STR}/diagnostics/values", json=queries)
+
+    assert r.status_code == 200
+    assert r.json() == values_batch(client, settings, queries).json()
+
+    too_many = [queries[0]] * (settings.VALUES_BATCH_MAX_QUERIES + 1)
+    assert client.post(f"{settings.API_V1_STR}/diagnostics/values", json=too_many).status_code == 400
+
+
+@pytest.mark.parametrize(
+    "queries",
+    [
+        "not json",
+        json.dumps({"provider_slug": "a"}),
+        json.dumps([{"provider_slug": "a", "diagnostic_slug": "b", "value_type": "scalar", "limit": 501}]),
+    ],
+)
+def test_diagnostic_values_batch_invalid_queries(client: TestClient, settings, queries):
+    r = client.get(f"{settings.API_V1_STR}/diagnostics/values", params={"queries": queries})
+
+    assert r.status_code == 422
+
+
+def test_diagnostic_values_batch_too_many_queries(client: TestClient, settings):
+    query = {"provider_slug": "a", "diagnostic_slug": "b", "value_type": "scalar"}
+
+    r = values_batch(client, settings, [query] * (settings.VALUES_BATCH_MAX_QUERIES + 1))
+
+    assert r.status_code == 400
+
+
+def list_outputs(client: TestClient, settings, **params):
+    return client.get(f"{settings.API_V1_STR}/diagnostics/pmp/annual-cycle/outputs", params=params)
+
+
+def test_diagnostic_outputs(client: TestClient, settings):
+    r = list_outputs(client, settings)
+
+    assert r.status_code == 200
+    outputs = r.json()
+    assert outputs["total_count"] == len(outputs["data"]) > 0
+    output = outputs["data"][0]
+    assert output["url"].endswith(f"/results/{output['id']}")
+    assert {"size", "modified_at", "execution_group_id"} <= output.keys()
+
+
+def test_diagnostic_outputs_regex_filter(client: TestClient, settings):
+    r = list_outputs(client, settings, filter="djf", output_type="plot")
+
+    assert r.status_code == 200
+    outputs = r.json()["data"]
+    assert outputs
+    for output in outputs:
+        assert output["output_type"] == "plot"
+        assert "djf" in f"{output['filename']} {output['description']}".lower()
+
+
+def test_diagnostic_outputs_glob_filter(client: TestClient, settings):
+    everything = list_outputs(client, settings).json()["data"]
+
+    r = list_outputs(client, settings, filter="*.PNG", match="glob")
+
+    assert r.status_code == 200
+    filenames = [output["filename"] for output in r.json()["data"]]
+    assert filenames == [
+        output["filename"]
+        for output in everything
+        if output["filename"].lower().endswith(".png")
+        or (output["description"] or "").lower().endswith(".png")
+    ]
+
+
+def test_diagnostic_outputs_pagination(client: TestClient, settings):
+    everything = list_outputs(client, settings).json()
+
+    r = list_outputs(client, settings, offset=1, limit=2)
+
+    assert r.status_code == 200
+    assert r.json()["total_count"] == everything["total_count"]
+    assert r.json()["data"] == everything["data"][1:3]
+
+
+@pytest.mark.parametrize("pattern", ["[", "(.*)(.*)(.*)(.*)(.*)(.*)#"])
+def test_diagnostic_outputs_rejected_regex(client: TestClient, settings, pattern):
+    assert list_outputs(client, settings, filter=pattern).status_code == 400
+
+
+def test_diagnostic_outputs_unknown_diagnostic(client: TestClient, settings):
+    r = client.get(f"{settings.API_V1_STR}/diagnostics/pmp/missing/outputs")
+
+    assert r.status_code == 404
@@ -1,5 +1,15 @@
+import io
+import tarfile
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from climate_ref import models
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core.file_handling import FileInfo, FileMetadataCache
+from ref_backend.models.executions import ExecutionGroup
+from ref_backend.testing import test_ref_config as _load_test_ref_config
 
 
 def test_execution_list_count(client: TestClient, settings) -> None:
@@ -13,6 +23,26 @@ def test_execution_list_count(client: TestClient, settings) -> None:
     assert len(data["data"]) > 0
 
 
+def test_execution_list_skips_failed_group(client: TestClient, settings, monkeypatch) -> None:
+    build = ExecutionGroup.build
+    failed = []
+
+    def build_or_fail(execution_group, *args, **kwargs):
+        if not failed:
+            failed.append(execution_group.id)
+            raise ValueError("broken execution group")
+        return build(execution_group, *args, **kwargs)
+
+    monkeypatch.setattr(ExecutionGroup, "build", staticmethod(build_or_fail))
+
+    r = client.get(f"{settings.API_V1_STR}/executions", params={"limit": 7})
+
+    assert r.status_code == 200
+    ids = [group["id"] for group in r.json()["data"]]
+    assert len(ids) == 6
+    assert failed[0] not in ids
+
+
 def get_execution_group_id(client: TestClient, settings) -> str:
     """Helper to get an execution group ID that has scalar metric values."""
     r = client.get(f"{settings.API_V1_STR}/executions")
@@ -422,3 +452,64 @@ def test_execution_statistics(client: TestClient, settings) -> None:
     assert isinstance(data["total_execution_groups"], int)
     assert isinstance(data["successful_execution_groups"], int)
     assert isinstance(data["failed_execution_groups"], int)
+
+
+def test_execution_list_source_id_filter(client: TestClient, settings) -> None:
+    """Test that filtering by source_id only returns groups with a dataset from that model."""
+    group = client.get(f"{settings.API_V1_STR}/executions").json()["data"][0]
+    datasets = client.get(f"{settings.API_V1_STR}/executions/{group['id']}/datasets").json()["data"]
+    source_ids = {(ds["metadata"] or {}).get("source_id") for ds in datasets} - {None}
+    if not source_ids:
+        pytest.skip("Execution group has no CMIP6 datasets")
+    source_id = sorted(source_ids)[0]
+
+    r = client.get(f"{settings.API_V1_STR}/executions", params={"source_id": source_id, "limit": 100})
+    missing = client.get(f"{settings.API_V1_STR}/executions", params={"source_id": "not-a-model"})
+
+    assert r.status_code == 200
+    assert group["id"] in [eg["id"] for eg in r.json()["data"]]
+    assert missing.json()["count"] == 0
+
+
+def test_execution_list_name_contains_filters(client: TestClient, settings) -> None:
+    """Test that the name filters match case-insensitive substrings of the stored names."""
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        group = session.scalars(select(models.ExecutionGroup)).first()
+        group_id = group.id
+        diagnostic_name = group.diagnostic.name
+        provider_name = group.diagnostic.provider.name
+
+    r = client.get(
+        f"{settings.API_V1_STR}/executions",
+        params={
+            "diagnostic_name_contains": diagnostic_name[1:].upper(),
+            "provider_name_contains": provider_name[1:].lower(),
+            "limit": 100,
+        },
+    )
+
+    assert r.status_code == 200
+    assert group_id in [eg["id"] for eg in r.json()["data"]]
+
+
+def test_execution_archive_skips_removed_files(client: TestClient, settings, monkeypatch) -> None:
+    group_id = client.get(f"{settings.API_V1_STR}/executions").json()["data"][0]["id"]
+    listing = FileMetadataCache.listing
+
+    def listing_with_removed_file(self, directory):
+        files = listing(self, directory)
+        if files is None:
+            return None
+        # As a cached listing would still hold a file removed since
+        return [*files, FileInfo(path=directory / "removed.png", size=1, mtime=0.0, mime_type="image/png")]
+
+    monkeypatch.setattr(FileMetadataCache, "listing", listing_with_removed_file)
+
+    r = client.get(f"{settings.API_V1_STR}/executions/{group_id}/archive")
+
+    if r.status_code == 404:
+        pytest.skip("No execution output directory in the test data")
+    assert r.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(r.content), mode="r:gz") as tar:
+        assert "removed.png" not in tar.getnames()
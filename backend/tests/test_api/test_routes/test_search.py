@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+
+
+def test_suggest_datasets(client: TestClient, settings):
+    dataset = client.get(f"{settings.API_V1_STR}/datasets/").json()["data"][0]
+    text = dataset["slug"].split(".")[3]
+
+    r = client.get(f"{settings.API_V1_STR}/search/suggest", params={"q": text})
+
+    assert r.status_code == 200
+    data = r.json()["data"]
+    assert data
+    assert all(text.lower() in suggestion["name"].lower() for suggestion in data)
+    assert all(suggestion["kind"] == "datasets" for suggestion in data)
+
+
+def test_suggest_diagnostics_limit(client: TestClient, settings):
+    r = client.get(
+        f"{settings.API_V1_STR}/search/suggest", params={"q": "a", "kind": "diagnostics", "limit": 2}
+    )
+
+    assert r.status_code == 200
+    assert len(r.json()["data"]) <= 2
+
+
+def test_suggest_requires_query(client: TestClient, settings):
+    assert client.get(f"{settings.API_V1_STR}/search/suggest", params={"q": ""}).status_code == 422
+    assert (
+        client.get(f"{settings.API_V1_STR}/search/suggest", params={"q": "x", "kind": "bogus"}).status_code
+        == 422
+    )
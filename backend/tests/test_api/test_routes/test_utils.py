@@ -1,5 +1,7 @@
 from fastapi.testclient import TestClient
 
+from ref_backend.core.config import get_settings
+
 
 def test_health_check(client: TestClient, settings) -> None:
     r = client.get(
@@ -11,3 +13,34 @@ def test_health_check(client: TestClient, settings) -> None:
     data = r.json()
 
     assert data is True
+
+
+def test_database_pools(client: TestClient, settings) -> None:
+    r = client.get(f"{settings.API_V1_STR}/utils/database-pools")
+
+    assert r.status_code == 200
+    (primary,) = r.json()["data"]
+    assert primary["name"] == "primary"
+    assert primary["pool_class"] == "QueuePool"
+    assert primary["size"] == settings.DATABASE_POOL_SIZE
+    assert primary["checked_out"] == 0
+
+
+def test_profile_worker(app, client: TestClient, settings) -> None:
+    url = f"{settings.API_V1_STR}/utils/profile?seconds=0.05&include_idle=true"
+    assert client.get(url).status_code == 404
+
+    previous = app.dependency_overrides[get_settings]
+    profiling = settings.model_copy(update={"PROFILING_TOKEN": "secret"})
+    app.dependency_overrides[get_settings] = lambda: profiling
+    try:
+        forbidden = client.get(url, headers={"X-Profile-Token": "wrong"})
+        r = client.get(url, headers={"X-Profile-Token": "secret"})
+    finally:
+        app.dependency_overrides[get_settings] = previous
+
+    assert forbidden.status_code == 403
+    assert r.status_code == 200
+    stack, count = r.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
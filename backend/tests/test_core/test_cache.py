@@ -0,0 +1,223 @@
+"""Tests for the generation-aware query result cache."""
+
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core.cache import (
+    GenerationalCache,
+    LRUCache,
+    RedisCacheBackend,
+    SQLiteCacheBackend,
+    TieredCache,
+    get_cache,
+    get_database_generation,
+)
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestLRUCache:
+    def test_get_missing_returns_default(self):
+        cache = LRUCache(max_entries=2)
+
+        assert cache.get("missing") is None
+        assert cache.get("missing", "default") == "default"
+        assert cache.stats.misses == 2
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        # Touch "a" so "b" becomes the least recently used entry
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats.evictions == 1
+
+    def test_expired_entries_are_missing(self):
+        clock = FakeClock()
+        cache = LRUCache(max_entries=2, ttl_seconds=10, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 5
+        assert cache.get("a") == 1
+
+        clock.now = 11
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_zero_entries_disables_storage(self):
+        cache = LRUCache(max_entries=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_evicts_to_stay_within_max_bytes(self):
+        cache = LRUCache(max_entries=10, max_bytes=10)
+        cache.set("a", b"1234")
+        cache.set("b", b"1234")
+        cache.get("a")
+        cache.set("c", b"1234")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1234"
+        assert cache.total_bytes == 8
+        assert cache.stats.evictions == 1
+
+        # A replaced entry no longer counts, and an entry larger than the limit is not kept
+        cache.set("a", b"12")
+        cache.set("d", b"12345678901")
+        assert cache.total_bytes == 6
+        assert cache.get("d") is None
+
+    def test_clear_prefix(self):
+        cache = LRUCache(max_entries=4)
+        cache.set("ns:a", 1)
+        cache.set("ns:b", 2)
+        cache.set("other:a", 3)
+
+        cache.clear("ns:")
+
+        assert cache.get("ns:a") is None
+        assert cache.get("other:a") == 3
+
+
+class TestSQLiteCacheBackend:
+    def test_shared_between_connections(self, tmp_path):
+        path = tmp_path / "cache.sqlite"
+        writer = SQLiteCacheBackend(path, max_entries=4)
+        reader = SQLiteCacheBackend(path, max_entries=4)
+
+        writer.set("key", {"values": [1.0, 2.0]})
+
+        assert reader.get("key") == {"values": [1.0, 2.0]}
+        assert reader.get("missing", "default") == "default"
+        assert reader.stats.hits == 1
+        assert reader.stats.misses == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = SQLiteCacheBackend(tmp_path / "cache.sqlite", max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+
+        assert cache.get("a") is None
+        assert cache.get("c") == 3
+        assert cache.stats.evictions == 1
+
+    def test_expired_entries_are_missing(self, tmp_path):
+        cache = SQLiteCacheBackend(tmp_path / "cache.sqlite", max_entries=2, ttl_seconds=-1)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_clear_prefix(self, tmp_path):
+        cache = SQLiteCacheBackend(tmp_path / "cache.sqlite", max_entries=4)
+        cache.set("ns:a", 1)
+        cache.set("other:a", 2)
+
+        cache.clear("ns:")
+
+        assert cache.get("ns:a") is None
+        assert cache.get("other:a") == 2
+
+
+class RecordingRedis:
+    def __init__(self):
+        self.expiries = []
+
+    def set(self, key, value, ex=None):
+        self.expiries.append(ex)
+
+
+def test_redis_expiry_is_rounded_up_to_whole_seconds():
+    client = RecordingRedis()
+    for ttl_seconds in (0.5, 1.5, 60, None):
+        RedisCacheBackend(client, ttl_seconds=ttl_seconds).set("a", 1)
+
+    assert client.expiries == [1, 2, 60, None]
+
+
+def test_tiered_cache_copies_shared_hits_locally(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    SQLiteCacheBackend(path, max_entries=4).set("key", "value")
+    cache = TieredCache(LRUCache(max_entries=2), SQLiteCacheBackend(path, max_entries=4))
+
+    assert cache.get("key") == "value"
+    assert cache.get("key") == "value"
+
+    assert cache.local.stats.hits == 1
+    assert cache.shared.stats.hits == 1
+
+
+class TestGenerationalCache:
+    def test_computes_once_per_key(self):
+        cache = GenerationalCache(LRUCache(max_entries=4))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        assert cache.get_or_compute("key", "gen-1", compute) == "value"
+        assert cache.get_or_compute("key", "gen-1", compute) == "value"
+
+        assert len(calls) == 1
+        assert cache.stats.hits == 1
+
+    def test_new_generation_invalidates(self):
+        cache = GenerationalCache(LRUCache(max_entries=4))
+
+        assert cache.get_or_compute("key", "gen-1", lambda: "old") == "old"
+        assert cache.get_or_compute("key", "gen-2", lambda: "new") == "new"
+
+        assert cache.stats.invalidations == 1
+
+    def test_falsy_values_are_cached(self):
+        cache = GenerationalCache(LRUCache(max_entries=4))
+        calls = []
+
+        def compute():
+            calls.append(1)
+
+        cache.get_or_compute("key", "gen-1", compute)
+        cache.get_or_compute("key", "gen-1", compute)
+
+        assert len(calls) == 1
+
+    def test_namespaces_share_a_store(self):
+        store = LRUCache(max_entries=4)
+        first = GenerationalCache(store, namespace="first")
+        second = GenerationalCache(store, namespace="second")
+
+        assert first.get_or_compute("key", "gen-1", lambda: "first") == "first"
+        assert second.get_or_compute("key", "gen-1", lambda: "second") == "second"
+
+        # Moving one namespace to a new generation leaves the other's entries in place
+        first.get_or_compute("key", "gen-2", lambda: "newer")
+        assert second.get_or_compute("key", "gen-1", lambda: "recomputed") == "second"
+
+
+def test_get_cache_shares_backend_between_namespaces(settings):
+    first = get_cache("first", settings)
+
+    assert get_cache("first", settings) is first
+    assert get_cache("second", settings).store is first.store
+
+
+def test_database_generation_is_stable(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        first = get_database_generation(session)
+        second = get_database_generation(session)
+
+    assert first == second
@@ -0,0 +1,131 @@
+"""Tests for negotiated response compression."""
+
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from ref_backend.core.compression import CompressionMiddleware, GzipEncoder, negotiate_encoding
+from ref_backend.core.config import Settings
+from ref_backend.core.http_cache import ETAG_STATE_KEY
+
+BODY = "value," * 1000
+
+
+def build_client(calls: list[str], cache_max_bytes: int = 1024 * 1024) -> TestClient:
+    async def large(request):
+        calls.append("large")
+        return PlainTextResponse(BODY)
+
+    async def small(request):
+        return PlainTextResponse("small")
+
+    async def stream(request):
+        async def chunks():
+            for _ in range(3):
+                yield BODY
+
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    async def archive(request):
+        return Response(BODY.encode(), media_type="application/zip")
+
+    app = Starlette(
+        routes=[
+            Route("/large", large),
+            Route("/small", small),
+            Route("/stream", stream),
+            Route("/archive", archive),
+        ]
+    )
+    middleware = CompressionMiddleware(
+        app, settings=Settings(COMPRESSION_MINIMUM_SIZE=100, COMPRESSION_CACHE_MAX_BYTES=cache_max_bytes)
+    )
+
+    async def assign_etag(scope, receive, send):
+        # Stands in for HTTPCacheMiddleware, which assigns the ETag before the route runs
+        if scope["type"] == "http" and scope["path"] == "/large":
+            scope.setdefault("state", {})[ETAG_STATE_KEY] = 'W/"large"'
+        await middleware(scope, receive, send)
+
+    return TestClient(assign_etag)
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("br;q=0", ["br", "gzip"]) is None
+    assert negotiate_encoding("*", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("", ["gzip"]) is None
+
+
+def test_gzip_encoder_streams_decodable_chunks():
+    encoder = GzipEncoder(level=6)
+    first = encoder.compress(b"first,")
+    rest = encoder.finish(b"second")
+
+    assert gzip.decompress(first + rest) == b"first,second"
+
+
+def test_large_responses_are_compressed():
+    client = build_client([])
+    r = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < len(BODY)
+    assert "accept-encoding" in r.headers["vary"].lower()
+    assert r.text == BODY
+
+
+def test_small_and_excluded_responses_are_not_compressed():
+    client = build_client([])
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/archive", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_responses_are_compressed():
+    client = build_client([])
+    r = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    assert r.text == BODY * 3
+
+
+def test_compressed_responses_with_etag_are_reused():
+    calls: list[str] = []
+    client = build_client(calls)
+
+    first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert calls == ["large"]
+    assert second.headers["content-encoding"] == "gzip"
+    assert second.headers["content-length"] == first.headers["content-length"]
+    assert second.text == BODY
+
+
+def test_compressed_responses_over_the_cache_size_are_not_reused():
+    calls: list[str] = []
+    client = build_client(calls, cache_max_bytes=10)
+
+    client.get("/large", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert calls == ["large", "large"]
+    assert second.text == BODY
+
+
+def test_uncompressed_responses_vary_by_encoding():
+    client = build_client([])
+
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    archive = client.get("/archive", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding"
+    assert "vary" not in archive.headers
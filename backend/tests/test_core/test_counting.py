@@ -0,0 +1,56 @@
+"""Tests for the cached and estimated listing counts."""
+
+from sqlalchemy import select
+
+from climate_ref import models
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core import counting
+from ref_backend.core.counting import RowCount, count_rows, estimate_row_count
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def test_count_rows_is_exact_on_sqlite(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        statement = select(models.ExecutionGroup).where(models.ExecutionGroup.dirty.is_(False))
+        expected = len(session.scalars(statement).all())
+
+        assert estimate_row_count(session, statement) is None
+        assert count_rows(session, settings, statement) == RowCount(expected, exact=True)
+        # Legacy ORM queries are counted through their statement
+        query = session.query(models.ExecutionGroup).filter(models.ExecutionGroup.dirty.is_(False))
+        assert count_rows(session, settings, query) == RowCount(expected, exact=True)
+
+
+def test_counts_are_cached_per_filter(settings, monkeypatch):
+    calls = []
+    original = counting._count
+
+    def tracking_count(session, settings, statement):
+        calls.append(statement)
+        return original(session, settings, statement)
+
+    monkeypatch.setattr(counting, "_count", tracking_count)
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        first = select(models.ExecutionGroup.id).where(models.ExecutionGroup.id > 1)
+        second = select(models.ExecutionGroup.id).where(models.ExecutionGroup.id > 2)
+
+        count_rows(session, settings, first)
+        count_rows(session, settings, first)
+        count_rows(session, settings, second)
+
+    assert len(calls) == 2
+
+
+def test_large_estimates_are_reported_as_inexact(settings, monkeypatch):
+    monkeypatch.setattr(counting, "estimate_row_count", lambda session, statement: 5_000_000)
+    uncached = settings.model_copy(update={"QUERY_CACHE_MAX_ENTRIES": 0})
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        statement = select(models.ExecutionGroup.id)
+
+        assert count_rows(session, uncached, statement) == RowCount(5_000_000, exact=False)
+
+        exact_only = uncached.model_copy(update={"COUNT_ESTIMATE_MIN_ROWS": 0})
+        assert count_rows(session, exact_only, statement).exact
@@ -0,0 +1,130 @@
+"""Tests for the connection pool configuration of the API's databases."""
+
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from climate_ref.database import Database
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core import database as database_module
+from ref_backend.core.database import (
+    _read_only_sqlite_path,
+    configure_database,
+    copy_sqlite_database,
+    engine_options,
+    pool_status,
+)
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def test_engine_options_for_postgresql(settings):
+    timeout_settings = settings.model_copy(update={"DATABASE_STATEMENT_TIMEOUT_MS": 5000})
+
+    options = engine_options("postgresql://ref@db/ref", timeout_settings)
+
+    assert options["poolclass"] is QueuePool
+    assert options["pool_size"] == settings.DATABASE_POOL_SIZE
+    assert options["max_overflow"] == settings.DATABASE_MAX_OVERFLOW
+    assert options["pool_pre_ping"] is settings.DATABASE_POOL_PRE_PING
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+    assert "connect_args" not in engine_options("postgresql://ref@db/ref", settings)
+
+
+def test_engine_options_for_sqlite(settings):
+    timeout_settings = settings.model_copy(update={"DATABASE_STATEMENT_TIMEOUT_MS": 5000})
+
+    # In-memory databases live in a single connection, so they cannot be pooled
+    assert "pool_size" not in engine_options("sqlite://", settings)
+    assert engine_options("sqlite:////ref/climate_ref.db", timeout_settings)["pool_size"] == (
+        settings.DATABASE_POOL_SIZE
+    )
+    assert "connect_args" not in engine_options("sqlite:////ref/climate_ref.db", timeout_settings)
+
+
+def test_database_uses_configured_pool(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+
+    assert isinstance(database._engine.pool, QueuePool)
+    assert database._engine.pool.size() == settings.DATABASE_POOL_SIZE
+    assert database._session_factory.kw["bind"] is database._engine
+
+    status = pool_status("primary", database._engine)
+    assert status.size == settings.DATABASE_POOL_SIZE
+    assert status.checked_out == 0
+
+
+def test_sqlite_connections_are_tuned(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+
+    with database.session_scope() as session:
+        assert session.execute(text("PRAGMA cache_size")).scalar_one() == -settings.SQLITE_CACHE_SIZE_KIB
+        assert session.execute(text("PRAGMA temp_store")).scalar_one() == 2
+
+
+def _example_database(path):
+    path.parent.mkdir()
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE example (id INTEGER PRIMARY KEY)")
+        connection.execute("INSERT INTO example VALUES (1)")
+    connection.close()
+
+
+def test_read_only_database_is_copied(settings, tmp_path):
+    source = tmp_path / "source" / "climate_ref.db"
+    _example_database(source)
+    copy_settings = settings.model_copy(update={"SQLITE_COPY_DIR": tmp_path / "shm"})
+
+    database = Database(f"sqlite:///file:{source}?mode=ro&immutable=1&uri=true", connect_args={"uri": True})
+    configure_database(database, copy_settings)
+
+    assert (tmp_path / "shm" / "climate_ref.db").exists()
+    assert database._engine.url.database == f"file:{tmp_path / 'shm' / 'climate_ref.db'}"
+    with database.session_scope() as session:
+        assert session.execute(text("SELECT id FROM example")).scalar_one() == 1
+    database.close()
+
+    # An up-to-date copy is reused
+    assert copy_sqlite_database(source, tmp_path / "shm") == tmp_path / "shm" / "climate_ref.db"
+
+
+def test_uri_database_is_reopened_as_uri(settings, tmp_path):
+    source = tmp_path / "source" / "climate_ref.db"
+    _example_database(source)
+
+    database = Database(f"sqlite:///file:{source}?mode=ro&uri=true", connect_args={"uri": True})
+    configure_database(database, settings)
+
+    _, connect_args = database._engine.dialect.create_connect_args(database._engine.url)
+    assert connect_args["uri"] is True
+    with database.session_scope() as session:
+        assert session.execute(text("SELECT id FROM example")).scalar_one() == 1
+    assert database._session_factory.kw["bind"] is database._engine
+    database.close()
+
+
+def test_read_only_sqlite_path_is_decoded():
+    # As written by `configure_database` for a copy, SQLite decodes the path when opening it
+    url = make_url("sqlite://").set(database="file:/data/ref%20db/climate_ref.db", query={"mode": "ro"})
+
+    assert _read_only_sqlite_path(url) == Path("/data/ref db/climate_ref.db")
+    assert _read_only_sqlite_path(make_url("sqlite:////data/climate_ref.db")) is None
+
+
+def test_concurrent_copies_are_made_once(tmp_path, monkeypatch):
+    source = tmp_path / "source" / "climate_ref.db"
+    _example_database(source)
+    replaced = []
+    monkeypatch.setattr(
+        database_module.os, "replace", lambda src, dst: replaced.append(dst) or os.rename(src, dst)
+    )
+
+    with ThreadPoolExecutor(4) as pool:
+        copies = list(pool.map(lambda _: copy_sqlite_database(source, tmp_path / "shm"), range(4)))
+
+    assert copies == [tmp_path / "shm" / "climate_ref.db"] * 4
+    assert len(replaced) == 1
@@ -0,0 +1,163 @@
+"""Tests for the in-memory CMIP6 dataset facet index."""
+
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+from climate_ref.models.dataset import CMIP6Dataset
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core import dataset_index
+from ref_backend.core.dataset_index import (
+    DatasetFacetIndex,
+    IdSet,
+    _dataset_rows,
+    _facet_values,
+    _latest_dataset_ids,
+    get_dataset_index,
+    load_dataset_index,
+    resolve_dataset_ids,
+)
+from ref_backend.core.execution_filters import INDEXED_FACETS
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def _row(dataset_id: int, source_id: str, variable_id: str) -> tuple:
+    values = {facet: "x" for facet in INDEXED_FACETS} | {"source_id": source_id, "variable_id": variable_id}
+    return (dataset_id, *(values[facet] for facet in INDEXED_FACETS))
+
+
+def test_id_set_operations_match_python_sets():
+    rng = random.Random(0)  # noqa: S311
+    universe = 10_000
+    sets = [set(rng.sample(range(universe), size)) for size in (10, 100, 1_000, 5_000)]
+    id_sets = [IdSet.from_ids(ids, universe) for ids in sets]
+
+    assert [s.is_dense for s in id_sets] == [False, False, True, True]
+    for a, ida in zip(sets, id_sets):
+        assert list(ida) == sorted(a)
+        for b, idb in zip(sets, id_sets):
+            assert list(ida & idb) == sorted(a & b)
+            assert list(ida | idb) == sorted(a | b)
+            assert len(ida & idb) == len(a & b)
+
+
+def test_id_set_membership():
+    dense = IdSet.from_ids(range(0, 100, 2), universe=100)
+
+    assert 4 in dense
+    assert 5 not in dense
+    assert 1_000 not in dense
+    assert -1 not in dense
+
+
+def test_resolve_ands_facets_and_ors_values():
+    index = DatasetFacetIndex.build(
+        [_row(1, "A", "tas"), _row(2, "A", "pr"), _row(3, "B", "tas"), _row(4, "C", "tas")],
+        latest_ids=[1, 2, 3, 4],
+    )
+
+    assert list(index.resolve({"source_id": ["A"]})) == [1, 2]
+    assert list(index.resolve({"source_id": ["A", "B"], "variable_id": ["tas"]})) == [1, 3]
+    assert list(index.resolve({"source_id": ["missing"]})) == []
+    assert index.resolve({"version": ["v1"]}) is None
+
+
+def test_extend_adds_rows_to_existing_postings():
+    index = DatasetFacetIndex.build([_row(1, "A", "tas")], latest_ids=[1])
+    extended = index.extend([_row(2, "A", "pr"), _row(3, "B", "tas")], latest_ids=[2, 3])
+
+    assert list(extended.resolve({"source_id": ["A"]})) == [1, 2]
+    assert list(extended.latest) == [2, 3]
+    assert (extended.max_id, extended.count) == (3, 3)
+    # The original index is unchanged
+    assert list(index.resolve({"source_id": ["A"]})) == [1]
+
+
+def test_extend_only_replaces_the_latest_versions_of_matching_datasets():
+    index = DatasetFacetIndex.build([_row(1, "A", "tas"), _row(2, "B", "tas")], latest_ids=[1, 2])
+    # A new version of A/tas, with the latest versions of the datasets matching its values
+    extended = index.extend([_row(3, "A", "tas")], latest_ids=[3])
+
+    assert list(extended.latest) == [2, 3]
+
+
+def test_index_matches_database(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        index = load_dataset_index(session)
+
+        for facet in ("source_id", "variable_id"):
+            for value, ids in index.postings[facet].items():
+                expected = session.scalars(
+                    select(CMIP6Dataset.id).where(getattr(CMIP6Dataset, facet) == value)
+                ).all()
+                assert list(ids) == sorted(expected)
+
+        # Refreshing an up to date index reads nothing new
+        refreshed = load_dataset_index(session, previous=index)
+        assert (refreshed.max_id, refreshed.count) == (index.max_id, index.count)
+
+
+def test_latest_ids_can_be_loaded_for_some_datasets(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        index = load_dataset_index(session)
+        source_id = next(iter(index.postings["source_id"]))
+        position = 1 + INDEXED_FACETS.index("source_id")
+        facets = _facet_values(row for row in _dataset_rows(session, 0) if row[position] == source_id)
+
+        latest = _latest_dataset_ids(session, facets)
+
+        assert sorted(latest) == list(index.latest & index.resolve(facets))
+
+
+def test_refreshing_index_is_not_waited_for(settings, monkeypatch):
+    generation = ["1"]
+    first = DatasetFacetIndex.build([_row(1, "A", "tas")], latest_ids=[1])
+    second = first.extend([_row(2, "A", "tas")], latest_ids=[2])
+    loading, loaded = threading.Event(), threading.Event()
+
+    def slow_load(session, previous=None):
+        if previous is None:
+            return first
+        loading.set()
+        loaded.wait(5)
+        return second
+
+    monkeypatch.setattr(dataset_index, "_indexes", {})
+    monkeypatch.setattr(dataset_index, "load_dataset_index", slow_load)
+    monkeypatch.setattr(
+        dataset_index, "get_database_generation", lambda session, max_age_seconds: generation[0]
+    )
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        assert get_dataset_index(session, settings) is first
+
+        generation[0] = "2"
+        with ThreadPoolExecutor(1) as pool:
+            refresh = pool.submit(get_dataset_index, session, settings)
+            assert loading.wait(5)
+            # Other requests keep using the previous index in the meantime
+            assert get_dataset_index(session, settings) is first
+            loaded.set()
+            assert refresh.result() is second
+
+        assert get_dataset_index(session, settings) is second
+
+
+def test_resolve_dataset_ids_falls_back_to_sql(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        index = get_dataset_index(session, settings)
+        source_id = next(iter(index.postings["source_id"]))
+
+        assert resolve_dataset_ids(session, settings, {"source_id": [source_id]}) is not None
+        assert resolve_dataset_ids(session, settings, {"version": ["v1"]}) is None
+
+        limited = settings.model_copy(update={"DATASET_INDEX_MAX_IDS": 0})
+        assert resolve_dataset_ids(session, limited, {"source_id": [source_id]}) is None
+
+        disabled = settings.model_copy(update={"DATASET_INDEX_ENABLED": False})
+        assert get_dataset_index(session, disabled) is None
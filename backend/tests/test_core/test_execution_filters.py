@@ -0,0 +1,47 @@
+"""Tests for filtering the executions of a diagnostic by dataset facets."""
+
+from sqlalchemy import select
+
+from climate_ref import models
+from climate_ref.models.dataset import CMIP6Dataset
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core.execution_filters import (
+    INDEXED_FACETS,
+    build_execution_facet_index,
+    parse_dataset_filters,
+)
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def test_parse_dataset_filters_keeps_dataset_columns():
+    filters = parse_dataset_filters(
+        {"source_id": "MIROC6", "limit": "10", "__tablename__": "evil", "instance_id": "x"}
+    )
+
+    assert filters == {"source_id": "MIROC6", "instance_id": "x"}
+
+
+def test_facet_index_matches_dataset_join(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        diagnostic_id = session.scalars(
+            select(models.ExecutionGroup.diagnostic_id).join(models.Execution)
+        ).first()
+        index = build_execution_facet_index(session, diagnostic_id)
+
+        for facet in INDEXED_FACETS:
+            for value, execution_ids in index[facet].items():
+                expected = set(
+                    session.scalars(
+                        select(models.Execution.id)
+                        .join(models.ExecutionGroup)
+                        .join(CMIP6Dataset, models.Execution.datasets)
+                        .where(
+                            models.ExecutionGroup.diagnostic_id == diagnostic_id,
+                            getattr(CMIP6Dataset, facet) == value,
+                        )
+                    )
+                )
+                assert execution_ids == expected
+
+    assert index["source_id"]
@@ -0,0 +1,100 @@
+"""Tests for the precomputed data of the explorer cards."""
+
+from climate_ref.models.execution import ResultOutputType
+from ref_backend.core.collections import AFTCollectionCardContent, AFTCollectionFilterControl
+from ref_backend.core.explorer_cards import (
+    _card_queries,
+    _match_figures,
+    downsample_series,
+)
+from ref_backend.core.output_catalog import CatalogEntry, OutputCatalog
+from ref_backend.models import SeriesValue
+
+
+def _series(n: int, index: bool = True) -> SeriesValue:
+    return SeriesValue(
+        id=1,
+        dimensions={},
+        values=[float(i) for i in range(n)],
+        index=list(range(n)) if index else None,
+        execution_group_id=1,
+        execution_id=1,
+    )
+
+
+def test_downsample_series_keeps_short_series():
+    series = _series(10)
+    assert downsample_series(series, 10) is series
+
+
+def test_downsample_series_keeps_endpoints():
+    thinned = downsample_series(_series(1000), 11)
+
+    assert len(thinned.values) == 11
+    assert thinned.values[0] == 0
+    assert thinned.values[-1] == 999
+    assert thinned.index == [int(v) for v in thinned.values]
+
+
+def test_downsample_series_without_index():
+    thinned = downsample_series(_series(100, index=False), 5)
+
+    assert thinned.values == [0, 25, 50, 74, 99]
+    assert thinned.index is None
+
+
+def _content(**kwargs) -> AFTCollectionCardContent:
+    return AFTCollectionCardContent(provider="pmp", diagnostic="annual-cycle", title="Card", **kwargs)
+
+
+def test_card_queries_apply_control_defaults():
+    content = _content(
+        type="series-chart",
+        other_filters={"statistic": "rmse", "season": "ann", "isolate_ids": "1,2"},
+        filter_controls=[AFTCollectionFilterControl(filter_key="season", default_value="djf")],
+    )
+
+    values, options = _card_queries(content)
+
+    assert values.value_type == "series"
+    assert values.filters == {"statistic": "rmse", "season": "djf"}
+    assert values.isolate_ids == [1, 2]
+    assert values.limit == 500
+    assert options.filters == {"statistic": "rmse"}
+    assert options.isolate_ids == [1, 2]
+    assert options.limit == 1
+
+
+def test_card_queries_skip_galleries_and_placeholders():
+    assert _card_queries(_content(type="figure-gallery")) == []
+    assert _card_queries(_content(type="box-whisker-chart", placeholder=True)) == []
+
+
+def _entry(output_id: int, filename: str, description: str | None = None, output_type=ResultOutputType.Plot):
+    return CatalogEntry(
+        output_id=output_id,
+        execution_id=1,
+        execution_group_id=1,
+        output_type=output_type,
+        filename=filename,
+        short_name=None,
+        long_name=None,
+        description=description,
+        size=None,
+        mtime=None,
+    )
+
+
+def test_match_figures_is_a_case_insensitive_search_of_plots():
+    catalog = OutputCatalog(
+        [
+            _entry(1, "a_DJF.png"),
+            _entry(2, "b.png", description="djf map"),
+            _entry(3, "c_jja.png"),
+            _entry(4, "djf.nc", output_type=ResultOutputType.Data),
+        ]
+    )
+
+    assert [e.output_id for e in _match_figures(catalog, "djf")] == [1, 2]
+    assert [e.output_id for e in _match_figures(catalog, "[")] == [1, 2, 3]
+    assert [e.output_id for e in _match_figures(catalog, None)] == [1, 2, 3]
@@ -1,6 +1,9 @@
-"""Tests for chunked file reading used by the log-download endpoint."""
+"""Tests for reading and looking up the files of the results directory."""
 
-from ref_backend.core.file_handling import file_iterator
+import pytest
+
+from ref_backend.core.file_handling import FileMetadataCache, file_iterator
+from ref_backend.core.file_handling import _list_files as list_files
 
 
 class TestFileIterator:
@@ -25,3 +28,110 @@ class TestFileIterator:
         assert len(chunks) == 3
         assert [len(c) for c in chunks] == [1024, 1024, 452]
         assert b"".join(chunks) == content
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestFileMetadataCache:
+    """Test the cached lookups of the results directory."""
+
+    def test_stat_describes_files(self, tmp_path):
+        (tmp_path / "plot.png").write_bytes(b"x" * 10)
+        (tmp_path / "subdir").mkdir()
+        cache = FileMetadataCache(max_entries=10)
+
+        info = cache.stat(tmp_path / "plot.png")
+        assert info is not None
+        assert info.size == 10
+        assert info.mime_type == "image/png"
+        assert info.mtime == (tmp_path / "plot.png").stat().st_mtime
+        assert cache.stat(tmp_path / "missing.png") is None
+        assert cache.stat(tmp_path / "subdir") is None
+
+    def test_prefetch_lists_the_directory_once(self, tmp_path, monkeypatch):
+        (tmp_path / "a.png").write_bytes(b"a")
+        (tmp_path / "plots").mkdir()
+        (tmp_path / "plots" / "b.png").write_bytes(b"bb")
+        cache = FileMetadataCache(max_entries=10)
+
+        assert cache.stat(tmp_path / "a.png", prefetch=tmp_path).size == 1
+        # Every other file of the directory is now answered without touching the filesystem
+        monkeypatch.setattr("pathlib.Path.stat", lambda *args, **kwargs: pytest.fail("stat called"))
+        assert cache.stat(tmp_path / "plots" / "b.png", prefetch=tmp_path).size == 2
+        assert sorted(info.path.name for info in cache.listing(tmp_path)) == ["a.png", "b.png"]
+
+    def test_entries_expire(self, tmp_path):
+        clock = FakeClock()
+        cache = FileMetadataCache(max_entries=10, ttl_seconds=60, clock=clock)
+        path = tmp_path / "plot.png"
+        path.write_bytes(b"x")
+
+        assert cache.stat(path).size == 1
+        path.write_bytes(b"xx")
+        # A file is cached until its entry expires
+        assert cache.stat(path).size == 1
+        clock.now = 61
+        assert cache.stat(path).size == 2
+
+    def test_missing_files_are_not_cached(self, tmp_path):
+        cache = FileMetadataCache(max_entries=10, ttl_seconds=60)
+        path = tmp_path / "late.png"
+
+        assert cache.stat(path) is None
+        assert cache.stat(path, prefetch=tmp_path) is None
+        assert cache.listing(tmp_path / "late") is None
+        path.write_bytes(b"x")
+        (tmp_path / "late").mkdir()
+        # Written after the lookups, e.g. by a new execution
+        assert cache.stat(path) is not None
+        assert cache.listing(tmp_path / "late") == []
+
+    def test_each_lookup_counts_once(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"a")
+        (tmp_path / "b.png").write_bytes(b"b")
+        cache = FileMetadataCache(max_entries=10)
+
+        cache.stat(tmp_path / "a.png", prefetch=tmp_path)
+        cache.stat(tmp_path / "b.png", prefetch=tmp_path)
+        cache.listing(tmp_path)
+
+        assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+    def test_listing_of_a_missing_directory(self, tmp_path):
+        cache = FileMetadataCache(max_entries=10)
+
+        assert cache.listing(tmp_path / "missing") is None
+        assert cache.listing(tmp_path) == []
+
+    def test_large_directories_keep_their_listing(self, tmp_path, monkeypatch):
+        for i in range(10):
+            (tmp_path / f"{i}.png").write_bytes(b"x")
+        cache = FileMetadataCache(max_entries=4)
+        listed = []
+        monkeypatch.setattr(
+            "ref_backend.core.file_handling._list_files",
+            lambda directory: listed.append(directory) or list_files(directory),
+        )
+
+        for i in range(10):
+            assert cache.stat(tmp_path / f"{i}.png", prefetch=tmp_path) is not None
+        # Too many files to cache each one, but the listing is kept and the directory is only listed once
+        assert listed == [tmp_path]
+        assert len(cache.listing(tmp_path)) == 10
+
+    def test_disabled_cache_looks_up_every_time(self, tmp_path, monkeypatch):
+        cache = FileMetadataCache(max_entries=0)
+        path = tmp_path / "late.png"
+        monkeypatch.setattr(
+            "ref_backend.core.file_handling._list_files", lambda directory: pytest.fail("directory listed")
+        )
+
+        assert cache.stat(path, prefetch=tmp_path) is None
+        path.write_bytes(b"x")
+        assert cache.stat(path, prefetch=tmp_path) is not None
@@ -1,8 +1,13 @@
 """Tests for shared utilities for parsing multi-value query parameters."""
 
-from sqlalchemy import Column, MetaData, String, Table
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
 
-from ref_backend.core.filter_utils import _normalize_list_from_value, build_filter_clause
+from ref_backend.core.filter_utils import (
+    _normalize_list_from_value,
+    build_filter_clause,
+    build_id_clause,
+    parse_filter_values,
+)
 
 
 class TestNormalizeListFromValue:
@@ -120,3 +125,43 @@ class TestBuildFilterClause:
         clause = build_filter_clause(self.column, None)
         sql = self._compile_clause(clause)
         assert "test.name IS NULL" in sql or "test.name = NULL" in sql
+
+
+class TestParseFilterValues:
+    """Test the parse_filter_values function."""
+
+    def test_single_value(self):
+        assert parse_filter_values("a") == ["a"]
+
+    def test_comma_separated_values(self):
+        assert parse_filter_values("a, b") == ["a", "b"]
+
+    def test_list_values(self):
+        assert parse_filter_values(["a", None, "b"]) == ["a", "b"]
+
+
+class TestBuildIdClause:
+    """Test the build_id_clause function."""
+
+    def setup_method(self):
+        self.metadata = MetaData()
+        self.test_table = Table("test", self.metadata, Column("id", Integer, primary_key=True))
+        self.engine = create_engine("sqlite://")
+        self.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.execute(self.test_table.insert(), [{"id": i} for i in range(1, 6)])
+
+    def _select_ids(self, ids):
+        statement = select(self.test_table.c.id).where(build_id_clause(self.test_table.c.id, ids))
+        with self.engine.connect() as connection:
+            return sorted(connection.scalars(statement))
+
+    def test_matches_ids(self):
+        assert self._select_ids({2, 4, 99}) == [2, 4]
+
+    def test_empty_ids_match_nothing(self):
+        assert self._select_ids(set()) == []
+
+    def test_more_ids_than_bound_parameters(self):
+        """Ids are rendered inline, so SQLite's limit on bound parameters does not apply."""
+        assert self._select_ids(set(range(100_000))) == [1, 2, 3, 4, 5]
@@ -0,0 +1,122 @@
+"""Tests for the in-memory lookup of the latest execution of each execution group."""
+
+import datetime
+
+from sqlalchemy import func, select
+
+from climate_ref import models
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core.latest_executions import (
+    RUNNING,
+    LatestExecutions,
+    build_latest_successful_clause,
+    count_successful_groups,
+    get_latest_execution_id,
+    get_latest_execution_ids,
+    load_latest_executions,
+    pick_latest_execution,
+)
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def _lookup(groups, executions) -> LatestExecutions:
+    return LatestExecutions.empty().extend(
+        groups, executions, execution_count=len(executions), max_execution_id=0, max_updated_at=None
+    )
+
+
+def test_extend_keeps_the_latest_execution_of_each_group():
+    lookup = _lookup([(1, 10), (2, 10), (3, 20), (5, 20)], [(1, 1, True), (2, 1, False), (3, 2, True)])
+
+    assert lookup.latest_execution_id(1) == 2
+    assert lookup.latest_execution_id(3) is None
+    assert lookup.latest_execution_id(100) is None
+    assert lookup.group_ids(successful=True) == [2]
+    assert lookup.group_ids(successful=False) == [1]
+
+    # A rerun of group 3, an update of an older execution of group 1 and a new group
+    lookup = lookup.extend(
+        [(6, 20)],
+        [(4, 3, None), (1, 1, True), (5, 6, True)],
+        execution_count=5,
+        max_execution_id=5,
+        max_updated_at=None,
+    )
+
+    assert lookup.latest_execution_id(3) == 4
+    assert lookup.successful[3] == RUNNING
+    assert lookup.group_ids(successful=True) == [2, 6]
+    assert lookup.group_ids(successful=False) == [1]
+    assert lookup.successful_group_counts == {10: 1, 20: 1}
+
+
+def test_lookup_matches_database(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        lookup = load_latest_executions(session)
+        expected = dict(
+            session.execute(
+                select(models.Execution.execution_group_id, func.max(models.Execution.id)).group_by(
+                    models.Execution.execution_group_id
+                )
+            ).all()
+        )
+        group_ids = session.scalars(select(models.ExecutionGroup.id)).all()
+
+        assert expected
+        for group_id in group_ids:
+            assert lookup.latest_execution_id(group_id) == expected.get(group_id)
+
+        # Refreshing an unchanged database reads nothing new
+        refreshed = load_latest_executions(session, previous=lookup)
+        assert refreshed.execution_ids == lookup.execution_ids
+        assert refreshed.successful == lookup.successful
+
+
+def test_lookup_and_sql_agree(settings):
+    sql_settings = settings.model_copy(update={"LATEST_EXECUTIONS_ENABLED": False})
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        assert count_successful_groups(session, settings) == count_successful_groups(session, sql_settings)
+        diagnostic_id = next(iter(count_successful_groups(session, settings)))
+        assert count_successful_groups(session, settings, [diagnostic_id]) == count_successful_groups(
+            session, sql_settings, [diagnostic_id]
+        )
+
+        for successful in (True, False):
+            from_lookup, from_sql = (
+                set(
+                    session.scalars(
+                        select(models.ExecutionGroup.id).where(
+                            build_latest_successful_clause(session, s, successful)
+                        )
+                    )
+                )
+                for s in (settings, sql_settings)
+            )
+            assert from_lookup == from_sql
+
+        group_ids = list(session.scalars(select(models.ExecutionGroup.id)))
+        assert get_latest_execution_id(session, settings, group_ids[0]) == get_latest_execution_id(
+            session, sql_settings, group_ids[0]
+        )
+        from_lookup = get_latest_execution_ids(session, settings, group_ids)
+        assert from_lookup
+        assert from_lookup == get_latest_execution_ids(session, sql_settings, group_ids)
+        assert from_lookup == {
+            group_id: get_latest_execution_id(session, settings, group_id)
+            for group_id in group_ids
+            if group_id in from_lookup
+        }
+
+
+def test_pick_latest_execution_uses_the_largest_id():
+    # The latest execution is the last one written, even if its clock was behind
+    executions = [
+        models.Execution(id=2, created_at=datetime.datetime(2024, 1, 2)),
+        models.Execution(id=3, created_at=datetime.datetime(2024, 1, 1)),
+        models.Execution(id=1, created_at=datetime.datetime(2024, 1, 3)),
+    ]
+
+    assert pick_latest_execution(executions).id == 3
+    assert pick_latest_execution([]) is None
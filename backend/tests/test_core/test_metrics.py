@@ -0,0 +1,102 @@
+"""Tests for the OpenMetrics endpoint."""
+
+import json
+import os
+import sys
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from ref_backend.core.metrics import (
+    CONTENT_TYPE,
+    MetricsExporter,
+    MetricsRegistry,
+    _route,
+    merge_snapshots,
+    render,
+)
+
+# Far above any real pid, so never a running process
+DEAD_PID = 2**22 + 1
+
+
+def test_render_openmetrics():
+    metrics = MetricsRegistry()
+    metrics.inc("ref_http_requests", route="/a", method="GET", status="200")
+    metrics.inc("ref_http_requests", route="/a", method="GET", status="200")
+    metrics.observe("ref_http_request_duration_seconds", 0.02, route="/a")
+    metrics.observe("ref_http_request_duration_seconds", 100, route="/a")
+
+    text = render(metrics)
+
+    assert 'ref_http_requests_total{method="GET",route="/a",status="200"} 2' in text
+    assert 'ref_http_request_duration_seconds_bucket{route="/a",le="0.01"} 0' in text
+    assert 'ref_http_request_duration_seconds_bucket{route="/a",le="0.025"} 1' in text
+    assert 'ref_http_request_duration_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'ref_http_request_duration_seconds_count{route="/a"} 2' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_merge_drops_gauges_of_exited_workers():
+    worker = MetricsRegistry()
+    worker.inc("ref_db_queries", 3, route="/a")
+    worker.set("ref_streaming_responses_in_progress", 1, route="/a")
+    live = {**worker.snapshot(), "pid": 1}
+    exited = {**worker.snapshot(), "pid": 2}
+
+    merged = render(merge_snapshots([live, exited], live_pids={1}))
+
+    assert 'ref_db_queries_total{route="/a"} 6' in merged
+    assert 'ref_streaming_responses_in_progress{route="/a"} 1' in merged
+
+
+def test_workers_share_metrics_through_a_directory(tmp_path):
+    other = MetricsRegistry()
+    other.inc("ref_http_requests", 5, route="/shared", method="GET", status="200")
+    other.set("ref_streaming_responses_in_progress", 1, route="/shared")
+    (tmp_path / f"worker-{DEAD_PID}.json").write_text(json.dumps({**other.snapshot(), "pid": DEAD_PID}))
+    (tmp_path / "worker-live.json").write_text(json.dumps({**other.snapshot(), "pid": os.getppid()}))
+
+    text = render(MetricsExporter(engines=dict, directory=tmp_path).gather())
+
+    assert 'ref_http_requests_total{method="GET",route="/shared",status="200"} 10' in text
+    assert 'ref_streaming_responses_in_progress{route="/shared"} 1' in text
+    assert (tmp_path / f"worker-{os.getpid()}.json").exists()
+
+
+def test_metrics_endpoint(client, settings):
+    client.get(f"{settings.API_V1_STR}/executions/statistics")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert '/executions/statistics",status="200"' in response.text
+    assert 'ref_db_pool_connections{database="primary",state="in_use"}' in response.text
+
+
+def test_metrics_not_modified_response(client, settings):
+    path = f"{settings.API_V1_STR}/executions/statistics"
+    etag = client.get(path).headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.get("/metrics")
+
+    assert '/executions/statistics",status="304"' in response.text
+    assert 'route="unmatched",status="304"' not in response.text
+    assert 'ref_streaming_response_bytes_count{route="/executions/statistics"}' not in response.text
+
+
+@pytest.mark.parametrize("with_route_contexts", [True, False])
+def test_unrouted_requests_are_matched_to_routes(monkeypatch, with_route_contexts):
+    if not with_route_contexts:
+        # As on FastAPI versions without `fastapi.routing.iter_route_contexts`
+        monkeypatch.setitem(sys.modules, "fastapi.routing", None)
+    app = Starlette(routes=[Route("/items/{item_id}", lambda request: None)])
+
+    def scope(path):
+        return {"type": "http", "method": "GET", "path": path, "root_path": "", "app": app}
+
+    assert _route(scope("/items/42")) == "/items/{item_id}"
+    assert _route(scope("/missing")) == "unmatched"
@@ -0,0 +1,79 @@
+"""Tests for the in-memory catalog of diagnostic outputs."""
+
+import pytest
+
+from climate_ref.models.execution import ResultOutputType
+from ref_backend.core.output_catalog import CatalogEntry, OutputCatalog, compile_filter
+
+
+@pytest.mark.parametrize(
+    ("pattern", "mode", "text", "expected"),
+    [
+        ("djf", "regex", "ts/ts_DJF_basicTest.png", True),
+        ("^djf", "regex", "ts/ts_DJF_basicTest.png", False),
+        ("*.png", "glob", "ts/ts_DJF_basicTest.PNG", True),
+        ("djf", "glob", "ts/ts_DJF_basicTest.png", False),
+        ("ts/*_djf_*", "glob", "ts/ts_DJF_basicTest.png", True),
+    ],
+)
+def test_compile_filter(pattern, mode, text, expected):
+    assert bool(compile_filter(pattern, mode)(text)) is expected
+
+
+def test_compile_filter_invalid_regex():
+    with pytest.raises(ValueError, match="Invalid regular expression"):
+        compile_filter("[", "regex")
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "(.*)(.*)(.*)(.*)(.*)(.*)#",
+        ".*a.*b.*c",
+        "(a+)+b",
+        "(?:a*b?)*c",
+        "(a|ab)*c",
+        "(x{2,})+",
+        "a?b?c?d?e?f?g?h?#",
+        "a{1,50}b{1,50}c{1,50}",
+        "a" * 201,
+    ],
+)
+def test_compile_filter_rejects_slow_patterns(pattern):
+    with pytest.raises(ValueError):
+        compile_filter(pattern, "regex")
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "ts_.*_djf.*\\.png",
+        "(djf|jja)_.*",
+        "[(*+)]+x+",
+        "\\(a+\\)+",
+        "(?P<season>djf){2}x{3}y{4}",
+        ".*?_djf_.+?",
+    ],
+)
+def test_compile_filter_accepts_simple_patterns(pattern):
+    compile_filter(pattern, "regex")
+
+
+def test_match_time_budget():
+    entry = CatalogEntry(
+        output_id=1,
+        execution_id=1,
+        execution_group_id=1,
+        output_type=ResultOutputType.Plot,
+        filename="a.png",
+        short_name=None,
+        long_name=None,
+        description=None,
+        size=None,
+        mtime=None,
+    )
+    catalog = OutputCatalog([entry] * 10)
+
+    assert len(catalog.match("png", time_budget_seconds=10)) == 10
+    with pytest.raises(TimeoutError):
+        catalog.match("png", time_budget_seconds=-1)
@@ -0,0 +1,63 @@
+"""Tests for the sampling profiler."""
+
+import threading
+import time
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from ref_backend.core.profiling import ProfilerBusy, RequestProfilerMiddleware, StackSampler, token_matches
+
+TOKEN = "secret"  # noqa: S105
+
+
+def _spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_records_busy_threads():
+    thread = threading.Thread(target=_spin, args=(0.2,), name="busy worker")
+    with StackSampler(0.001) as sampler:
+        thread.start()
+        thread.join()
+
+    stacks = sampler.folded().splitlines()
+    assert any(line.startswith("busy_worker;") and "test_profiling:_spin" in line for line in stacks)
+
+
+def test_only_one_sampler_runs_at_a_time():
+    with StackSampler(0.01):
+        try:
+            with StackSampler(0.01):
+                raise AssertionError("A second sampler started")
+        except ProfilerBusy:
+            pass
+
+
+def test_token_matches():
+    assert token_matches("secret", "secret")
+    assert not token_matches("secret", "guess")
+    assert not token_matches("secret", None)
+    assert not token_matches(None, None)
+
+
+def test_profile_a_request():
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow(n: int) -> int:
+        _spin(0.1)
+        return n
+
+    app.add_middleware(RequestProfilerMiddleware, token=TOKEN, interval_seconds=0.001)
+    client = TestClient(app)
+
+    assert client.get("/slow?n=1").json() == 1
+    assert client.get("/slow?n=1&__profile=1").status_code == 403
+
+    r = client.get("/slow?n=1&__profile=1", headers={"X-Profile-Token": TOKEN})
+    assert r.status_code == 200
+    assert r.headers["X-Profiled-Status"] == "200"
+    assert "test_profiling:_spin" in r.text
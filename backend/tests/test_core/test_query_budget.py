@@ -0,0 +1,108 @@
+"""Tests for the query budgets of requests."""
+
+import time
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy import exc as sa_exc
+from starlette.responses import StreamingResponse
+from starlette.testclient import TestClient
+
+from ref_backend.core.config import get_settings
+from ref_backend.core.query_budget import (
+    EXCEPTION_HANDLERS,
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    install_query_budget,
+    query_budget,
+)
+
+# Counts far enough to run for minutes if it is not interrupted
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10000000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    install_query_budget(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_slow_query_is_interrupted(engine):
+    with engine.connect() as conn, query_budget(0.05), pytest.raises(QueryBudgetExceeded, match=r"0\.05 s"):
+        conn.execute(SLOW_QUERY)
+
+
+def test_queries_without_a_budget_are_unaffected(engine):
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        with query_budget(0):
+            assert conn.execute(text("SELECT 2")).scalar() == 2
+
+
+def test_cancelled_budget_stops_the_next_query(engine):
+    with engine.connect() as conn, query_budget(30) as budget:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        budget.cancelled = True
+        with pytest.raises(QueryBudgetExceeded, match="disconnected"):
+            conn.execute(text("SELECT 1"))
+
+
+@pytest.mark.usefixtures("without_compression_cache")
+def test_route_over_budget_returns_504(app, client, settings):
+    over_budget = settings.model_copy(
+        update={"QUERY_BUDGET_SECONDS": 1e-9, "QUERY_BUDGET_ROUTE_SECONDS": {}, "QUERY_CACHE_MAX_ENTRIES": 0}
+    )
+    previous = app.dependency_overrides[get_settings]
+    app.dependency_overrides[get_settings] = lambda: over_budget
+    try:
+        response = client.get(f"{settings.API_V1_STR}/datasets/")
+    finally:
+        app.dependency_overrides[get_settings] = previous
+
+    assert response.status_code == 504
+    assert response.json()["code"] == "query_budget_exceeded"
+    assert response.json()["budget_seconds"] == 1e-9
+
+    assert client.get(f"{settings.API_V1_STR}/datasets/").status_code == 200
+
+
+def test_streamed_body_is_not_cut_off_by_the_budget(engine):
+    app = FastAPI()
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        def rows():
+            for i in range(3):
+                # Well past the budget by the last row, which has already been answered with a 200
+                time.sleep(0.05)
+                with engine.connect() as conn:
+                    yield f"{conn.execute(text('SELECT :i'), {'i': i}).scalar()}\n"
+
+        return StreamingResponse(rows(), media_type="text/plain")
+
+    response = TestClient(QueryBudgetMiddleware(app, seconds=0.05)).get("/stream")
+
+    assert response.status_code == 200
+    assert response.text == "0\n1\n2\n"
+
+
+def test_pool_timeout_returns_503():
+    app = FastAPI()
+    for exception, handler in EXCEPTION_HANDLERS.items():
+        app.add_exception_handler(exception, handler)
+
+    @app.get("/busy")
+    def busy() -> None:
+        raise sa_exc.TimeoutError("QueuePool limit reached")
+
+    response = TestClient(app).get("/busy")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["code"] == "database_busy"
@@ -6,15 +6,18 @@ import math
 from starlette.responses import StreamingResponse
 
 from climate_ref import models
+from climate_ref.results import MetricValueFilter, OutlierPolicy
 from climate_ref.results.values import (
     ScalarValue,
     ScalarValueCollection,
     SeriesValue,
     SeriesValueCollection,
 )
+from ref_backend.core.metric_values import MetricValueType
 from ref_backend.core.reader_values import (
     generate_csv_response_scalar,
     generate_csv_response_series,
+    metric_values_cache_key,
     parse_dimension_filters,
 )
 
@@ -179,3 +182,38 @@ class TestGenerateCsvResponseSeries:
         collection = _series_collection([])
         response = generate_csv_response_series(collection, filename="out.csv")
         assert _read_body(response) == ""
+
+
+class TestMetricValuesCacheKey:
+    """Test that equivalent metric value queries share a cache key."""
+
+    @staticmethod
+    def _key(metric_filter, **overrides):
+        kwargs = {
+            "outlier_policy": OutlierPolicy(method="iqr"),
+            "include_unverified": False,
+            "offset": 0,
+            "limit": 50,
+        }
+        kwargs.update(overrides)
+        return metric_values_cache_key(MetricValueType.SCALAR, metric_filter, **kwargs)
+
+    def test_dimension_and_id_order_is_ignored(self):
+        first = MetricValueFilter(
+            dimensions={"source_id": "A", "metric": "rmse"},
+            isolate_ids=[3, 1, 2],
+        )
+        second = MetricValueFilter(
+            dimensions={"metric": "rmse", "source_id": "A"},
+            isolate_ids=[1, 2, 3],
+        )
+        assert self._key(first) == self._key(second)
+
+    def test_paging_and_outlier_policy_change_the_key(self):
+        metric_filter = MetricValueFilter(diagnostic_slug="d", provider_slug="p")
+        base = self._key(metric_filter)
+
+        assert self._key(metric_filter, offset=50) != base
+        assert self._key(metric_filter, limit=None) != base
+        assert self._key(metric_filter, outlier_policy=OutlierPolicy(method="off")) != base
+        assert self._key(metric_filter, include_unverified=True) != base
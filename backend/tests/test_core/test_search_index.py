@@ -0,0 +1,122 @@
+"""Tests for the trigram search index over names."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+from climate_ref import models
+from ref_backend.api.deps import _get_database_dependency
+from ref_backend.core import search_index
+from ref_backend.core.search_index import SearchIndex, get_search_index, resolve_name_contains, suggest_names
+from ref_backend.testing import test_ref_config as _load_test_ref_config
+
+
+def test_like_matches_substrings_ignoring_case():
+    index = SearchIndex()
+    index.add("datasets", [(1, "CMIP6.CMIP.NCAR.CESM2.historical"), (2, "obs4MIPs.NASA-JPL.AIRS"), (3, "x")])
+
+    assert index.like("datasets", "%cesm2%") == [1]
+    assert sorted(index.like("datasets", "%mip%")) == [1, 2]
+    assert index.like("datasets", "%ai%") == [2]
+    # Wildcards in the pattern behave as they do in SQL
+    assert index.like("datasets", "%cesm_.hist%") == [1]
+
+
+def test_replace_drops_previous_rows():
+    index = SearchIndex()
+    index.add("providers", [(1, "PMP"), (2, "ILAMB")])
+    index.replace("providers", [(3, "ESMValTool")])
+
+    assert index.like("providers", "%pmp%") == []
+    assert index.like("providers", "%tool%") == [3]
+
+
+def test_rebuild_keeps_serving_the_current_index():
+    index = SearchIndex()
+    index.add("datasets", [(1, "old.dataset")])
+    index.add("providers", [(1, "PMP")])
+    seen_during_rebuild = []
+
+    def new_rows():
+        seen_during_rebuild.append(index.like("datasets", "%old%"))
+        yield (2, "new.dataset")
+
+    index.rebuild({"datasets": new_rows(), "providers": [(1, "PMP")]})
+
+    assert seen_during_rebuild == [[1]]
+    assert index.like("datasets", "%dataset%") == [2]
+    assert index.like("providers", "%pmp%") == [1]
+
+
+def test_suggest_ranks_prefix_matches_first():
+    index = SearchIndex()
+    index.add(
+        "diagnostics", [(1, "Annual cycle of sea ice"), (2, "Sea ice area"), (3, "Sea ice"), (4, "Ozone")]
+    )
+
+    assert [row_id for row_id, _ in index.suggest("diagnostics", "sea ice", limit=10)] == [3, 2, 1]
+    assert [row_id for row_id, _ in index.suggest("diagnostics", "oz", limit=10)] == [4]
+    assert len(index.suggest("diagnostics", "ice", limit=2)) == 2
+    assert index.suggest("diagnostics", 'sea "ice', limit=10) == []
+
+
+def test_name_contains_matches_ilike(settings):
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        diagnostic_name = session.scalars(select(models.Diagnostic.name)).first()
+        text = diagnostic_name[1:5].upper()
+
+        ids = resolve_name_contains(session, settings, "diagnostics", text)
+        expected = session.scalars(
+            select(models.Diagnostic.id).where(models.Diagnostic.name.ilike(f"%{text}%"))
+        ).all()
+
+        assert sorted(ids) == sorted(expected)
+
+
+def test_suggest_without_index_uses_sql(settings):
+    disabled = settings.model_copy(update={"SEARCH_INDEX_ENABLED": False})
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        provider_name = session.scalars(select(models.Provider.name)).first()
+
+        indexed = suggest_names(session, settings, "providers", provider_name[:3], limit=5)
+        unindexed = suggest_names(session, disabled, "providers", provider_name[:3], limit=5)
+
+        assert indexed == unindexed
+        assert provider_name in [name for _, name in indexed]
+
+
+def test_refreshing_index_keeps_serving_searches(settings, monkeypatch):
+    generation = ["1"]
+    refreshing, refreshed = threading.Event(), threading.Event()
+
+    def slow_refresh(self, session):
+        if generation[0] == "1":
+            self.add("datasets", [(1, "first")])
+            return
+        refreshing.set()
+        refreshed.wait(5)
+        self.add("datasets", [(2, "second")])
+
+    monkeypatch.setattr(search_index, "_indexes", {})
+    monkeypatch.setattr(SearchIndex, "refresh", slow_refresh)
+    monkeypatch.setattr(
+        search_index, "get_database_generation", lambda session, max_age_seconds: generation[0]
+    )
+    database = _get_database_dependency(settings, _load_test_ref_config())
+    with database.session_scope() as session:
+        index = get_search_index(session, settings)
+        assert index.like("datasets", "%") == [1]
+
+        generation[0] = "2"
+        with ThreadPoolExecutor(1) as pool:
+            refresh = pool.submit(get_search_index, session, settings)
+            assert refreshing.wait(5)
+            # Other requests search the current contents in the meantime
+            assert get_search_index(session, settings).like("datasets", "%") == [1]
+            refreshed.set()
+            assert refresh.result() is index
+
+        assert index.like("datasets", "%") == [1, 2]
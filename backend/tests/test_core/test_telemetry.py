@@ -0,0 +1,46 @@
+"""Tests for the per-request performance telemetry."""
+
+from fastapi_sqlalchemy_monitor import SQLAlchemyMonitor
+
+from ref_backend.core.cache import GenerationalCache, LRUCache
+from ref_backend.core.telemetry import RequestTimings, timed, track_request
+
+
+def test_server_timing_header_format():
+    timings = RequestTimings()
+    timings.record("db", 1.234)
+    timings.record("db", 2.0)
+    timings.count("cache_hit")
+
+    header = timings.server_timing()
+
+    assert header.startswith('db;dur=3.2;desc="2 queries", cache;desc="1 hits, 0 misses", total;dur=')
+
+
+def test_phases_are_only_recorded_while_tracking():
+    with timed("file"):
+        pass
+
+    with track_request() as timings:
+        with timed("file"):
+            pass
+        cache = GenerationalCache(LRUCache(max_entries=8))
+        cache.get_or_compute("key", "1", lambda: 1)
+        cache.get_or_compute("key", "1", lambda: 1)
+
+    assert timings.counts == {"file": 1, "cache_miss": 1, "cache_hit": 1}
+    assert timings.log_fields()["cache_hits"] == 1
+
+
+def test_response_reports_timings(client, settings):
+    response = client.get(f"{settings.API_V1_STR}/executions/statistics")
+
+    assert response.status_code == 200
+    phases = {metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")}
+    assert {"db", "app", "serialize", "total"} <= phases
+
+
+def test_query_monitor_runs_locally_by_default(app, settings):
+    assert settings.ENVIRONMENT == "local"
+    assert settings.QUERY_MONITOR_ENABLED is None
+    assert SQLAlchemyMonitor in [middleware.cls for middleware in app.user_middleware]